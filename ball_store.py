@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+# structure of arrays storage for balls state - all balls are moved and checked with single numpy operations
+#
+# pip install numpy
+
+import transform_decart_ang as tda
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FLOAT_FIELDS = ('x', 'y', 'vx', 'vy', 'radius')
+INT_FIELDS = ('speedValue', 'speedDirection', 'tillRemove', 'red', 'green', 'blue', 'width', 'isRemovable')
+
+
+class BallStore:
+    """ keeps coordinates, speed, radius, lifetime and look of all balls in contiguous arrays
+    slot - index of ball data in arrays, slots 0..size-1 are in use
+    vx, vy - displacement per tick, counted from speed value and direction when speed is set"""
+
+    def __init__(self, capacity: int = 64):
+        if np is None:
+            raise ImportError('numpy is required for array ball store: pip install numpy')
+        self.size = 0
+        self.capacity = capacity
+        self.balls = []
+        for name in FLOAT_FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.float64))
+        for name in INT_FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.int64))
+
+    def __len__(self):
+        return self.size
+
+    def grow(self):
+        self.capacity *= 2
+        for name in FLOAT_FIELDS + INT_FIELDS:
+            oldArray = getattr(self, name)
+            newArray = np.zeros(self.capacity, dtype=oldArray.dtype)
+            newArray[:self.size] = oldArray[:self.size]
+            setattr(self, name, newArray)
+
+    def attach(self, ball) -> int:
+        """ reserves slot for the ball and returns it """
+        if self.size == self.capacity:
+            self.grow()
+        slot = self.size
+        for name in FLOAT_FIELDS + INT_FIELDS:
+            getattr(self, name)[slot] = 0
+        self.balls.append(ball)
+        self.size += 1
+        return slot
+
+    def attach_many(self, balls: list, fields: dict):
+        """ reserves slots for the balls at once and fills them with fields values
+        fields - store field name: sequence of values in order of balls, vx and vy are counted from speed
+        :return: first reserved slot, the balls get the next slots in their order """
+        first = self.size
+        size = first + len(balls)
+        while self.capacity < size:
+            self.grow()
+        for name in FLOAT_FIELDS + INT_FIELDS:
+            getattr(self, name)[first:size] = fields.get(name, 0)
+        self.vx[first:size], self.vy[first:size] = tda.angular_to_decart_batch(self.speedValue[first:size],
+                                                                               self.speedDirection[first:size])
+        self.balls.extend(balls)
+        self.size = size
+        return first
+
+    def detach(self, ball):
+        """ frees ball slot, the last ball is moved to the freed slot """
+        slot = ball.slot
+        last = self.size - 1
+        if slot != last:
+            for name in FLOAT_FIELDS + INT_FIELDS:
+                array = getattr(self, name)
+                array[slot] = array[last]
+            movedBall = self.balls[last]
+            movedBall.slot = slot
+            self.balls[slot] = movedBall
+        self.balls.pop()
+        self.size -= 1
+        ball.slot = None
+
+    def reorder(self, balls: list):
+        """ slots of the balls become their places in the list, the other balls of the store are freed """
+        size = len(balls)
+        slots = np.fromiter((ball.slot for ball in balls), dtype=np.int64, count=size)
+        for name in FLOAT_FIELDS + INT_FIELDS:
+            array = getattr(self, name)
+            array[:size] = array[slots]
+        kept = set(map(id, balls))
+        for ball in self.balls:
+            if id(ball) not in kept:
+                ball.slot = None
+        for slot, ball in enumerate(balls):
+            ball.slot = slot
+        self.balls = list(balls)
+        self.size = size
+
+    def set_speed(self, slot: int, value: int, direction: int):
+        self.speedValue[slot] = value
+        self.speedDirection[slot] = direction
+        self.vx[slot], self.vy[slot] = tda.angular_to_decart_fast(distance=value, angle=direction)
+
+    def set_color(self, slot: int, color):
+        self.red[slot], self.green[slot], self.blue[slot] = color
+
+    def move(self, fractions=None):
+        """ fractions - part of the tick displacement for every ball, None - full displacement """
+        size = self.size
+        if fractions is None:
+            self.x[:size] += self.vx[:size]
+            self.y[:size] += self.vy[:size]
+            return
+        fractions = np.asarray(fractions, dtype=np.float64)
+        self.x[:size] += np.round(self.vx[:size] * fractions)
+        self.y[:size] += np.round(self.vy[:size] * fractions)
+
+    def out_of_window(self, limit: int):
+        """ :return: slots of balls which centers are out of square with side = limit """
+        size = self.size
+        distance = np.maximum(np.abs(self.x[:size]), np.abs(self.y[:size]))
+        return np.flatnonzero(distance > limit)
+
+    def stopped(self):
+        """ :return: slots of balls with zero speed """
+        return np.flatnonzero(self.speedValue[:self.size] < 1)
+
+
+def store_field(name: str, fieldType=int):
+    """ property of ball object mapped to its slot in the store array """
+
+    def getter(ball):
+        return fieldType(getattr(ball.store, name)[ball.slot])
+
+    def setter(ball, value):
+        getattr(ball.store, name)[ball.slot] = value
+
+    return property(getter, setter)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# runs many headless simulations in parallel processes and collects their statistics into one file
+#
+# sample:
+#     python batch_runner.py --runs 8 --ticks 1000 --balls 10 30 --blocks 2 4 --output sweep.json
+#     python batch_runner.py --runs 4 --scene SCENE_01.csv SCENE_02.csv
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import broad_phase as bp
+import bubbles
+import screen_backends as sb
+
+STATS = ('ticks', 'blockCollisions', 'ballCollisions', 'blocksRemoved', 'blocksMoved', 'ballsDied',
+         'ballsReturned')
+
+
+def make_jobs(runs: int, ticks: int, seed: int = 0, balls=(30,), blocks=(4,), scenes=(), **screenOptions) -> list:
+    """ one job for every run of every parameter set: random scene for every balls and blocks combination
+    (no random scenes if balls is empty), then every scene file
+    runs of the same parameter set get seeds seed, seed + 1, ...
+    :return: list of job dicts for run_simulation """
+    parameterSets = [{'balls': ballsN, 'blocks': blocksN, 'scene': None}
+                     for ballsN, blocksN in itertools.product(balls, blocks)]
+    parameterSets += [{'balls': None, 'blocks': None, 'scene': scene} for scene in scenes]
+    return [dict(parameters, seed=seed + run, ticks=ticks, **screenOptions)
+            for parameters in parameterSets for run in range(runs)]
+
+
+def run_simulation(job: dict) -> dict:
+    """ runs one headless simulation, screen prints are dropped
+    job keys: seed, ticks, balls and blocks for random scene or scene - file name,
+    x_size, y_size, broadPhase, useArrays, continuousCollision, sceneCache (optional)
+    :return: job with stats of the run and its duration in seconds """
+    startTime = time.perf_counter()
+    with open(os.devnull, 'w') as devNull, contextlib.redirect_stdout(devNull):
+        window = bubbles.Screen(x_size=job.get('x_size', 1200), y_size=job.get('y_size', 800),
+                                backend=sb.HeadlessBackend(), broadPhase=job.get('broadPhase', bp.SPATIALHASH),
+                                useArrays=job.get('useArrays', False),
+                                continuousCollision=job.get('continuousCollision', False),
+                                sceneCache=job.get('sceneCache'), seed=job['seed'])
+        if job.get('scene'):
+            window.screen_scene_init(job['scene'])
+        else:
+            window.screen_rnd_init(balls=job['balls'], blocks=job['blocks'], wallWidth=4)
+        for tick in range(job['ticks']):
+            window.step()
+    result = dict(job)
+    result.update({name: window.stats[name] for name in STATS})
+    result['seconds'] = time.perf_counter() - startTime
+    return result
+
+
+def summarize(results: list) -> list:
+    """ mean, min and max of every statistic for runs with the same parameters except seed """
+    groups = {}
+    for result in results:
+        key = tuple((name, value) for name, value in sorted(result.items())
+                    if name not in STATS and name not in ('seed', 'seconds'))
+        groups.setdefault(key, []).append(result)
+    summary = []
+    for key, group in groups.items():
+        line = dict(key, runs=len(group))
+        for name in STATS:
+            values = [result[name] for result in group]
+            line[name] = {'mean': statistics.mean(values), 'min': min(values), 'max': max(values)}
+        summary.append(line)
+    return summary
+
+
+def run_batch(jobs: list, workers: int = None, resultFile: str = None) -> dict:
+    """ runs jobs in worker processes, workers=1 runs them in this process
+    :return: dict with runs results in order of jobs and their summary, written to resultFile as json if given """
+    startTime = time.perf_counter()
+    if workers == 1:
+        results = [run_simulation(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_simulation, jobs))
+    report = {'workers': workers or os.cpu_count(), 'seconds': time.perf_counter() - startTime,
+              'summary': summarize(results), 'runs': results}
+    if resultFile:
+        with open(resultFile, 'w') as reportFile:
+            json.dump(report, reportFile, indent=1)
+        print(f'{len(results)} runs are written to {resultFile}')
+    return report
+
+
+def parserDefinition():
+    parser = argparse.ArgumentParser(description='parallel headless simulations with statistics')
+    parser.add_argument('--runs', help='runs with different seeds for every parameter set', type=int, default=4)
+    parser.add_argument('--ticks', help='ticks of each run', type=int, default=1000)
+    parser.add_argument('--seed', help='seed of the first run', type=int, default=0)
+    parser.add_argument('--balls', help='numbers of balls in random scenes', type=int, nargs='+', default=[30])
+    parser.add_argument('--blocks', help='numbers of blocks in random scenes', type=int, nargs='+', default=[4])
+    parser.add_argument('--scene', help='scene files, random scenes are not run if given', nargs='+', default=[])
+    parser.add_argument('--scene-cache', help='directory for compiled scene files', default=None)
+    parser.add_argument('-x', '--xres', help='screen x resolution', type=int, default=1200)
+    parser.add_argument('-y', '--yres', help='screen y resolution', type=int, default=800)
+    parser.add_argument('--broad-phase', help='collision pairs selection', choices=bp.BROADPHASES,
+                        default=bp.SPATIALHASH)
+    parser.add_argument('--arrays', help='keep balls in numpy arrays', action='store_true')
+    parser.add_argument('--ccd', help='continuous collision detection', action='store_true')
+    parser.add_argument('--workers', help='worker processes, default - number of cores', type=int, default=None)
+    parser.add_argument('--output', help='result file', default='batch_results.json')
+    return parser
+
+
+def main():
+    args = parserDefinition().parse_args()
+    jobs = make_jobs(args.runs, args.ticks, seed=args.seed, balls=() if args.scene else args.balls,
+                     blocks=args.blocks, scenes=args.scene, x_size=args.xres, y_size=args.yres,
+                     broadPhase=args.broad_phase, useArrays=args.arrays, continuousCollision=args.ccd,
+                     sceneCache=args.scene_cache)
+    report = run_batch(jobs, workers=args.workers, resultFile=args.output)
+    print(f"{len(jobs)} runs took {report['seconds']:.2f} s with {report['workers']} workers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+#
+# benchmarks of hot paths: physics, contact checks, math functions, scene loading and trees generation
+# all cases run headless with fixed seeds, results are written as json to compare two versions of the code
+#
+# sample:
+#     python bubbles.py bench --sizes 10 100 1000 --output before.json
+#     python bubbles.py bench --sizes 10 100 1000 --output after.json --baseline before.json
+
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import bubbles
+import fractal_tree_draw as fd
+import narrow_phase as nph
+import scene_loader as sl
+import screen_backends as sb
+import snapshot
+import transform_decart_ang as tda
+
+RESULTS_VERSION = 2  # physics cases time PHYSICS_TICKS ticks of the same scene since version 2
+SIZES = (10, 100, 1000, 10000)
+BALL_AREA = 40000  # screen area per ball, screen grows with balls number to keep their density
+MIN_TIME = 0.2
+REPEAT = 3
+PHYSICS_TICKS = 10
+
+
+def screen_for_balls(ballsNum: int, blocksNum: int, seed: int, useArrays: bool = False):
+    side = max(800, int(math.sqrt(ballsNum * BALL_AREA)))
+    window = bubbles.Screen(x_size=side * 3 // 2, y_size=side, backend=sb.HeadlessBackend(), useArrays=useArrays,
+                            seed=seed)
+    window.screen_rnd_init(balls=ballsNum, blocks=blocksNum, wallWidth=4)
+    return window
+
+
+def write_scene(fileName: str, blocksNum: int, seed: int):
+    """ scene file with birth place without balls and blocksNum small mortal blocks at random places """
+    rnd = random.Random(seed)
+    with open(fileName, 'w') as sceneFile:
+        sceneFile.write(';'.join(sl.SCENE_COLUMNS) + '\n')
+        sceneFile.write(f'1;{bubbles.BALLBIRTHPLACE};0.1000;0.1000;0.9000;0.9000;0;0;0\n')
+        for objId in range(2, blocksNum + 2):
+            x, y = rnd.random() * 0.99, rnd.random() * 0.99
+            sceneFile.write(f'{objId};{bubbles.BLOCKMORTALTYPE};{x:.4f};{y:.4f};{x + 0.005:.4f};{y + 0.005:.4f};'
+                            f'{objId % 4};1;20\n')
+
+
+# cases: function(size, seed, workDir) makes everything the case needs and returns function to time
+# or (function, reset) if the function changes what it works with: reset restores it before every call
+# results of setup functions and resets are not timed
+
+def physics_case(method: str, useArrays: bool = False):
+    """ method of the screen is called PHYSICS_TICKS times in a row, every timed call starts from the same
+    freshly seeded scene loaded from its snapshot, so all measures and all runs with the seed time the same ticks """
+    def setup(size: int, seed: int, workDir: str):
+        fileName = os.path.join(workDir, f'physics_{size}_{seed}_{useArrays}.bin')
+        snapshot.save_snapshot(screen_for_balls(size, 4, seed, useArrays), fileName)
+        windows = []
+
+        def reset():
+            windows[:] = [snapshot.load_snapshot(fileName, backend=sb.HeadlessBackend(), useArrays=useArrays)]
+
+        def run_ticks():
+            tick = getattr(windows[0], method)
+            for tickNum in range(PHYSICS_TICKS):
+                tick()
+        run_ticks.windows = windows  # the screen of the last call, for tests
+        return run_ticks, reset
+    return setup
+
+
+def contact_pairs_case(kind: str):
+    """ balls close to other balls, block edges or block vertices: about half of pairs are in contact """
+    def setup(size: int, seed: int, workDir: str):
+        rnd = random.Random(seed)
+        window = bubbles.Screen(x_size=1200, y_size=800, backend=sb.HeadlessBackend(), seed=seed)
+        block = bubbles.Block([500, 300], [200, 200], parent=window)
+        pairs = []
+        for pairNum in range(size):
+            ball = bubbles.Ball([0, 0], rnd.randint(16, 50), parent=window)
+            radius = ball.get_radius()
+            if kind == 'ball':
+                other = bubbles.Ball([600, 400], rnd.randint(16, 50), parent=window)
+                distance = rnd.uniform(0, 2) * (radius + other.get_radius())
+                angle = rnd.uniform(0, 2 * math.pi)
+                ball.set_position([int(600 + distance * math.cos(angle)), int(400 + distance * math.sin(angle))])
+            elif kind == 'edge':
+                other = block
+                ball.set_position([rnd.randint(500, 700), 300 - rnd.randint(0, 2 * radius)])
+            else:
+                other = block
+                ball.set_position([500 - rnd.randint(1, radius), 300 - rnd.randint(1, radius)])
+            pairs.append((ball, other))
+
+        def check_pairs():
+            for ball, other in pairs:
+                ball.check_contact(other)
+        return check_pairs
+    return setup
+
+
+def narrow_phase_case(size: int, seed: int, workDir: str):
+    rnd = random.Random(seed)
+    x = nph.np.array([rnd.randint(0, 1000) for ballNum in range(size)], dtype=nph.np.int64)
+    y = nph.np.array([rnd.randint(0, 1000) for ballNum in range(size)], dtype=nph.np.int64)
+    radius = nph.np.array([rnd.randint(16, 50) for ballNum in range(size)], dtype=nph.np.int64)
+    first = nph.np.array([rnd.randrange(size) for pairNum in range(size)], dtype=nph.np.int64)
+    second = nph.np.array([rnd.randrange(size) for pairNum in range(size)], dtype=nph.np.int64)
+    return lambda: nph.ball_ball_contacts(x, y, radius, first, second)
+
+
+def balls_case(function):
+    """ function(ball) is called for every of size balls of random scene """
+    def setup(size: int, seed: int, workDir: str):
+        balls = screen_for_balls(size, 4, seed).mobile_objects
+
+        def call_all():
+            for ball in balls:
+                function(ball)
+        return call_all
+    return setup
+
+
+def read_ball_attributes(ball):
+    return ball.xPosition, ball.yPosition, ball.xRelation, ball.speedValue, ball.speedDirection, ball.tillRemove
+
+
+def tda_case(function, arguments):
+    """ function is called size times, arguments(rnd) makes random arguments of one call """
+    def setup(size: int, seed: int, workDir: str):
+        rnd = random.Random(seed)
+        callArguments = [arguments(rnd) for callNum in range(size)]
+
+        def call_all():
+            for callArgs in callArguments:
+                function(*callArgs)
+        return call_all
+    return setup
+
+
+def tda_batch_case(function, arguments):
+    """ function is called once for size random arguments in numpy arrays """
+    def setup(size: int, seed: int, workDir: str):
+        rnd = random.Random(seed)
+        columns = [tda.np.array(column) for column in zip(*[arguments(rnd) for callNum in range(size)])]
+        return lambda: function(*columns)
+    return setup
+
+
+def random_vector(rnd):
+    return rnd.randint(-100, 100), rnd.randint(-100, 100)
+
+
+def random_polar(rnd):
+    return rnd.randint(1, 50), rnd.randint(0, 359)
+
+
+def random_angles(rnd):
+    return rnd.randint(0, 359), rnd.randint(0, 359)
+
+
+def random_point_line(rnd):
+    return [random_vector(rnd), random_vector(rnd), random_vector(rnd)]
+
+
+def scene_read_case(useCache: bool):
+    """ rows of scene file parsed from CSV or read from compiled cache, screen is not made """
+    def setup(size: int, seed: int, workDir: str):
+        fileName = os.path.join(workDir, f'scene_{size}.csv')
+        write_scene(fileName, size, seed)
+        if not useCache:
+            return lambda: sum(len(chunk) for chunk in sl.parse_scene(fileName))
+        cacheDir = os.path.join(workDir, 'cache')
+        list(sl.scene_chunks(fileName, cacheDir))
+        return lambda: sum(len(chunk) for chunk in sl.scene_chunks(fileName, cacheDir))
+    return setup
+
+
+def scene_init_case(useCache: bool):
+    def setup(size: int, seed: int, workDir: str):
+        fileName = os.path.join(workDir, f'scene_{size}.csv')
+        write_scene(fileName, size, seed)
+        cacheDir = os.path.join(workDir, 'cache') if useCache else None
+        if useCache:
+            list(sl.scene_chunks(fileName, cacheDir))
+
+        def scene_init():
+            window = bubbles.Screen(x_size=1200, y_size=800, backend=sb.HeadlessBackend(), sceneCache=cacheDir,
+                                    seed=seed)
+            window.screen_scene_init(fileName)
+        return scene_init
+    return setup
+
+
+def tree_case(size: int, seed: int, workDir: str):
+    return lambda: fd.fractal_tree_segments((600, 0), length=200, direction=90, tilt=30, scale=0.6)
+
+
+def background_case(size: int, seed: int, workDir: str):
+    trees = [((360, 720), 200, 275, 40, 0.6, (0, 100, 0)), ((960, 80), 150, 120, 30, 0.65, (255, 140, 0))]
+    return lambda: fd.render_background((1200, 800), trees)
+
+
+# name: (setup, is setup sized, is numpy required)
+CASES = {
+    'collisions': (physics_case('manage_mobile_items_collisions'), True, False),
+    'collisions_arrays': (physics_case('manage_mobile_items_collisions', useArrays=True), True, True),
+    'move': (physics_case('move_mobile_items'), True, False),
+    'move_arrays': (physics_case('move_mobile_items', useArrays=True), True, True),
+    'step': (physics_case('step'), True, False),
+    'make_movement': (balls_case(bubbles.Ball.make_movement), True, False),
+    'attribute_access': (balls_case(read_ball_attributes), True, False),
+    'check_contact_ball': (contact_pairs_case('ball'), True, False),
+    'check_contact_edge': (contact_pairs_case('edge'), True, False),
+    'check_contact_vertex': (contact_pairs_case('vertex'), True, False),
+    'ball_ball_contacts_batch': (narrow_phase_case, True, True),
+    'tda.angular_to_decart': (tda_case(tda.angular_to_decart, random_polar), True, False),
+    'tda.angular_to_decart_fast': (tda_case(tda.angular_to_decart_fast, random_polar), True, False),
+    'tda.angular_to_decart_batch': (tda_batch_case(tda.angular_to_decart_batch, random_polar), True, True),
+    'tda.vector_angle': (tda_case(tda.vector_angle, random_vector), True, False),
+    'tda.vector_angle_fast': (tda_case(tda.vector_angle_fast, random_vector), True, False),
+    'tda.vector_angle_batch': (tda_batch_case(tda.vector_angle_batch, random_vector), True, True),
+    'tda.vector_length': (tda_case(tda.vector_length, random_vector), True, False),
+    'tda.reflectance_angle': (tda_case(tda.reflectance_angle, random_angles), True, False),
+    'tda.reflectance_angle_batch': (tda_batch_case(tda.reflectance_angle_batch, random_angles), True, True),
+    'tda.distance_point_line': (tda_case(tda.distance_point_line, random_point_line), True, False),
+    'sl.parse_scene': (scene_read_case(useCache=False), True, False),
+    'sl.read_compiled': (scene_read_case(useCache=True), True, False),
+    'screen_scene_init': (scene_init_case(useCache=False), True, False),
+    'screen_scene_init_cached': (scene_init_case(useCache=True), True, False),
+    'fractal_tree_segments': (tree_case, False, False),
+    'render_background': (background_case, False, False),
+}
+
+
+def measure(function, repeat: int = REPEAT, minTime: float = MIN_TIME, reset=None) -> dict:
+    """ calls function number times in a row, number grows until the calls take minTime like timeit autorange does
+    reset - function called before every call of function, it is not timed, calls are timed one by one then
+    :return: number of calls in a row and best and median time of one call in seconds of repeat measures """
+    def calls_time(number: int) -> float:
+        if reset is None:
+            startTime = time.perf_counter()
+            for callNum in range(number):
+                function()
+            return time.perf_counter() - startTime
+        duration = 0.0
+        for callNum in range(number):
+            reset()
+            startTime = time.perf_counter()
+            function()
+            duration += time.perf_counter() - startTime
+        return duration
+
+    number = 1
+    while True:
+        duration = calls_time(number)
+        if duration >= minTime or number >= 1 << 20:
+            break
+        number *= 2 if duration * 10 >= minTime else 10
+    times = [duration / number]
+    for measureNum in range(repeat - 1):
+        times.append(calls_time(number) / number)
+    return {'number': number, 'repeat': repeat, 'best': min(times), 'median': statistics.median(times)}
+
+
+def object_memory(objectsNum: int = 1000, seed: int = 1) -> dict:
+    """ :return: bytes allocated for one ball and one block with their attributes, screen is not counted """
+    with open(os.devnull, 'w') as devNull, contextlib.redirect_stdout(devNull):
+        window = bubbles.Screen(x_size=1200, y_size=800, backend=sb.HeadlessBackend(), seed=seed)
+        memory = {}
+        for name, make_item in (('Ball', lambda: bubbles.Ball([100, 100], 20, parent=window)),
+                                ('Block', lambda: bubbles.Block([100, 100], [50, 50], parent=window))):
+            tracemalloc.start()
+            items = [make_item() for itemNum in range(objectsNum)]
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            memory[name] = size / len(items)
+    return memory
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def run_benchmarks(sizes=SIZES, cases=None, seed: int = 1, repeat: int = REPEAT, minTime: float = MIN_TIME,
+                   verbose: bool = True) -> dict:
+    """ cases - names of CASES or their prefixes, all cases if not given
+    screen prints of setup and timed calls are dropped
+    :return: dict with environment description, bytes per object (see object_memory)
+    and list of results: case, size, number, repeat, best, median """
+    selected = [name for name in CASES if not cases or any(name.startswith(prefix) for prefix in cases)]
+    results = []
+    with tempfile.TemporaryDirectory() as workDir:
+        for name in selected:
+            setup, isSized, isNumpyRequired = CASES[name]
+            if isNumpyRequired and tda.np is None:
+                continue
+            for size in sizes if isSized else (None,):
+                with open(os.devnull, 'w') as devNull, contextlib.redirect_stdout(devNull):
+                    function = setup(size, seed, workDir)
+                    function, reset = function if isinstance(function, tuple) else (function, None)
+                    result = measure(function, repeat, minTime, reset)
+                results.append(dict(case=name, size=size, **result))
+                if verbose:
+                    print(f"{name:30} {size if size else '':>6} {result['best'] * 1000:12.4f} ms")
+    memory = object_memory(seed=seed)
+    if verbose:
+        print('bytes per object: ' + ', '.join(f'{name} {size:.0f}' for name, size in memory.items()))
+    return {'version': RESULTS_VERSION, 'revision': git_revision(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'seed': seed, 'memory': memory, 'results': results}
+
+
+class BenchmarkError(ValueError):
+    pass
+
+
+def compare_results(baseline: dict, current: dict) -> list:
+    """ results of other versions time other work under the same case names, they are not compared
+    :return: list of (case, size, baseline best, current best, current / baseline) for cases of both runs """
+    if baseline.get('version') != current.get('version'):
+        raise BenchmarkError(f"baseline results version {baseline.get('version')} differs from "
+                             f"{current.get('version')}, their cases time different work")
+    baselineBest = {(result['case'], result['size']): result['best'] for result in baseline['results']}
+    return [(result['case'], result['size'], baselineBest[result['case'], result['size']], result['best'],
+             result['best'] / baselineBest[result['case'], result['size']])
+            for result in current['results'] if (result['case'], result['size']) in baselineBest]
+
+
+def main(args):
+    """ bench subcommand of bubbles.py, see its parserDefinition """
+    report = run_benchmarks(sizes=args.sizes, cases=args.cases, seed=args.seed, repeat=args.repeat,
+                            minTime=args.min_time)
+    with open(args.output, 'w') as reportFile:
+        json.dump(report, reportFile, indent=1)
+    print(f"{len(report['results'])} results are written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+        try:
+            comparison = compare_results(baseline, report)
+        except BenchmarkError as error:
+            print(f"{args.baseline} is not compared: {error}")
+            return
+        print(f"compared with {args.baseline} ({baseline.get('revision', '')}):")
+        for name, size, baselineTime, currentTime, ratio in comparison:
+            print(f"{name:30} {size if size else '':>6} {baselineTime * 1000:12.4f} ms {currentTime * 1000:12.4f} ms "
+                  f"x{ratio:.2f}")
@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+#
+# broad phase of collision detection: selects pairs of screen items close enough to be checked for contact
+#
+# every broad phase returns list of index pairs (i, j), i < j sorted in the same order as
+# brute force double loop over the items list does, so contact handling order is not changed
+# block indexes return candidate blocks of a ball in order the blocks were added
+# pairs are found for the places items have when they are asked for, the screen queries the pairs again for items
+# it moves during the tick, so simulation with any broad phase gives the same results as brute force does
+
+import heapq
+from operator import itemgetter
+
+BRUTEFORCE = 'brute'
+SPATIALHASH = 'grid'
+SWEEPANDPRUNE = 'sap'
+BROADPHASES = (BRUTEFORCE, SPATIALHASH, SWEEPANDPRUNE)
+
+# neighbour cells to the right and above - each pair of neighbour cells is visited once
+FORWARD_CELLS = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def create_broad_phase(name: str):
+    """ :return: ball pairs broad phase and block index, sweep and prune is used as both of them """
+    if name == BRUTEFORCE:
+        return BruteForcePairs(), BlockList()
+    if name == SPATIALHASH:
+        return SpatialHash(), BlockGrid()
+    if name == SWEEPANDPRUNE:
+        sweepAndPrune = SweepAndPrune()
+        return sweepAndPrune, sweepAndPrune
+    raise ValueError(f'unknown broad phase {name}, expected one of {BROADPHASES}')
+
+
+class BruteForcePairs:
+    """ every item is paired with every other item - O(n*n) """
+    isExhaustive = True
+
+    def pairs(self, items) -> list:
+        return self.coordinate_pairs([0] * len(items), None, None)
+
+    def coordinate_pairs(self, xList, yList, radiusList, ordered: bool = True) -> list:
+        itemsNum = len(xList)
+        return [(i, j) for i in range(0, itemsNum - 1) for j in range(i + 1, itemsNum)]
+
+
+class SpatialHash:
+    """ uniform grid keyed by cell coordinates, rebuilt every tick
+    cell size is not less than the biggest ball diameter, so contacting balls
+    are always in the same or neighbour cells
+    cellSize - fixed cell size, if None then it is counted from the biggest ball each tick"""
+    isExhaustive = False
+
+    def __init__(self, cellSize: int = None):
+        self.cellSize = cellSize
+        self.cells = {}
+
+    def rebuild(self, xList, yList, radiusList):
+        cellSize = self.cellSize
+        if cellSize is None:
+            cellSize = 2 * max(radiusList)
+        cellSize = max(cellSize, 1)
+        self.cells = {}
+        for index, (x, y) in enumerate(zip(xList, yList)):
+            key = (int(x // cellSize), int(y // cellSize))
+            cell = self.cells.get(key)
+            if cell is None:
+                self.cells[key] = [index]
+            else:
+                cell.append(index)
+
+    def pairs(self, items) -> list:
+        return self.coordinate_pairs([item.xPosition for item in items],
+                                     [item.yPosition for item in items],
+                                     [item.xRelation for item in items])  # xRelation is radius
+
+    def coordinate_pairs(self, xList, yList, radiusList, ordered: bool = True) -> list:
+        """ the same as pairs, but items are given by lists of their centers and radii
+        ordered - if False the pairs are not sorted, the caller sorts what it needs itself"""
+        if len(xList) < 2:
+            return []
+        self.rebuild(xList, yList, radiusList)
+        result = []
+        for (xCell, yCell), members in self.cells.items():
+            membersNum = len(members)
+            for a in range(0, membersNum - 1):
+                for b in range(a + 1, membersNum):
+                    result.append((members[a], members[b]))
+            for dx, dy in FORWARD_CELLS:
+                neighbours = self.cells.get((xCell + dx, yCell + dy))
+                if neighbours is None:
+                    continue
+                for i in members:
+                    for j in neighbours:
+                        result.append((i, j) if i < j else (j, i))
+        if ordered:
+            result.sort()
+        return result
+
+
+class BlockList:
+    """ every block is candidate for every ball - O(n*m)
+    blocks are keys of dict: it keeps the order they were added in and removes them in O(1) """
+    isExhaustive = True
+
+    def __init__(self):
+        self.blocks = {}
+
+    def add(self, block):
+        self.blocks[block] = None
+
+    def add_many(self, blocks):
+        self.blocks.update(dict.fromkeys(blocks))
+
+    def remove(self, block):
+        self.blocks.pop(block, None)
+
+    def update(self, block):
+        pass
+
+    def prepare(self, balls):
+        pass
+
+    def candidates(self, index: int, ball) -> list:
+        return list(self.blocks)
+
+    def query(self, limits) -> list:
+        return list(self.blocks)
+
+
+class BlockGrid:
+    """ static uniform grid over blocks, each block is registered in all cells its limits overlap
+    the grid is updated incrementally when block is added, removed or moved
+    query returns blocks in order they were added, like the static objects list of the screen"""
+    isExhaustive = False
+
+    def __init__(self, cellSize: int = 128):
+        self.cellSize = cellSize
+        self.cells = {}
+        self.blockCells = {}
+        self.blockOrder = {}
+        self.lastOrder = 0
+
+    def limits_to_cells(self, limits):
+        (x1, y1), (x2, y2) = limits
+        size = self.cellSize
+        return [(xCell, yCell)
+                for xCell in range(int(x1 // size), int(x2 // size) + 1)
+                for yCell in range(int(y1 // size), int(y2 // size) + 1)]
+
+    def add(self, block):
+        if block in self.blockOrder:
+            return
+        self.lastOrder += 1
+        self.blockOrder[block] = self.lastOrder
+        self.insert(block)
+
+    def add_many(self, blocks):
+        for block in blocks:
+            self.add(block)
+
+    def insert(self, block):
+        keys = self.limits_to_cells(block.get_limits())
+        self.blockCells[block] = keys
+        for key in keys:
+            cell = self.cells.get(key)
+            if cell is None:
+                self.cells[key] = [block]
+            else:
+                cell.append(block)
+
+    def remove(self, block):
+        if block not in self.blockOrder:
+            return
+        self.extract(block)
+        del self.blockOrder[block]
+
+    def extract(self, block):
+        for key in self.blockCells.pop(block):
+            cell = self.cells[key]
+            cell.remove(block)
+            if not cell:
+                del self.cells[key]
+
+    def update(self, block):
+        """ block limits are changed - moves it to new cells"""
+        if block not in self.blockOrder:
+            return
+        self.extract(block)
+        self.insert(block)
+
+    def prepare(self, balls):
+        pass
+
+    def candidates(self, index: int, ball) -> list:
+        """ blocks close to the area ball can cover during next movement """
+        return self.query(ball.get_swept_limits())
+
+    def order_of(self, block) -> int:
+        return self.blockOrder.get(block, 0)
+
+    def candidates_after(self, ball, order: int) -> list:
+        """ blocks close to the ball at its current place which were added after the block of order """
+        return [block for block in self.query(ball.get_swept_limits()) if self.blockOrder[block] > order]
+
+    def query(self, limits) -> list:
+        found = set()
+        for key in self.limits_to_cells(limits):
+            cell = self.cells.get(key)
+            if cell is not None:
+                found.update(cell)
+        return sorted(found, key=self.blockOrder.__getitem__)
+
+
+class SweepAndPrune:
+    """ sorted list of x limits of balls and blocks kept between ticks
+    balls move a little per tick, so the list is almost sorted and insertion sort restores its order
+    in about linear time, then one sweep along x finds all pairs of boxes overlapping in both axes
+    endpoint - [x, isMax, isBlock, key], key is ball index or block object
+    used both as ball pairs broad phase and as block index
+    prepare sweeps boxes extended by speed, ball pairs of the same tick are taken from that sweep while balls
+    are at the same places, so balls are sorted and swept once per tick"""
+    isExhaustive = False
+
+    def __init__(self):
+        self.endpoints = []
+        self.ballBoxes = []
+        self.blockBoxes = {}
+        self.blockOrder = {}
+        self.lastOrder = 0
+        self.ballPairs = []
+        self.ballBlocks = []
+        self.preparedBalls = None  # x, y and swept radius lists of the last prepare
+        self.movedBlocks = set()  # blocks added or moved after the last sweep, ballBlocks are out of date for them
+
+    # blocks -------------------------------------------------------------------------
+    def add(self, block):
+        if block in self.blockOrder:
+            return
+        self.lastOrder += 1
+        self.blockOrder[block] = self.lastOrder
+        self.blockBoxes[block] = self.block_box(block)
+        x1, y1, x2, y2 = self.blockBoxes[block]
+        self.endpoints.append([x1, False, True, block])
+        self.endpoints.append([x2, True, True, block])
+        self.insertion_sort()
+        self.movedBlocks.add(block)
+
+    def add_many(self, blocks):
+        """ many blocks at random places would take insertion sort O(n*n) time, stable sort by the same order
+        gives the same list as adding them one by one """
+        for block in blocks:
+            if block in self.blockOrder:
+                continue
+            self.lastOrder += 1
+            self.blockOrder[block] = self.lastOrder
+            x1, y1, x2, y2 = self.blockBoxes[block] = self.block_box(block)
+            self.endpoints.append([x1, False, True, block])
+            self.endpoints.append([x2, True, True, block])
+            self.movedBlocks.add(block)
+        self.endpoints.sort(key=itemgetter(0, 1))
+
+    def remove(self, block):
+        if block not in self.blockOrder:
+            return
+        del self.blockOrder[block]
+        x1, y1, x2, y2 = self.blockBoxes.pop(block)
+        # the endpoints are found by binary search, their places are the same as the box values give
+        for value, isMax in ((x2, True), (x1, False)):
+            place = self.endpoint_place(value, isMax)
+            while self.endpoints[place][3] is not block:
+                place += 1
+            del self.endpoints[place]
+
+    def endpoint_place(self, value, isMax: bool) -> int:
+        """ :return: place of the first endpoint with (x, isMax) not less than (value, isMax) """
+        points = self.endpoints
+        low, high = 0, len(points)
+        while low < high:
+            middle = (low + high) // 2
+            if (points[middle][0], points[middle][1]) < (value, isMax):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def update(self, block):
+        if block not in self.blockOrder:
+            return
+        x1, y1, x2, y2 = self.blockBoxes[block] = self.block_box(block)
+        for point in self.endpoints:
+            if point[3] is block:
+                point[0] = x2 if point[1] else x1
+        self.insertion_sort()
+        self.movedBlocks.add(block)
+
+    @staticmethod
+    def block_box(block):
+        (x1, y1), (x2, y2) = block.get_limits()
+        return x1, y1, x2, y2
+
+    # balls --------------------------------------------------------------------------
+    def set_balls(self, xList, yList, radiusList):
+        """ refreshes ball endpoints by current coordinates and restores the sorting
+        balls are indexes, so if their number is changed endpoints of the last indexes are removed or added,
+        added ones are sorted and merged, the other ones are almost sorted still """
+        ballsNum, oldBallsNum = len(xList), len(self.ballBoxes)
+        if ballsNum < oldBallsNum:
+            self.endpoints = [point for point in self.endpoints if point[2] or point[3] < ballsNum]
+        self.ballBoxes = boxes = [(x - radius, y - radius, x + radius, y + radius)
+                                  for x, y, radius in zip(xList, yList, radiusList)]
+        for point in self.endpoints:
+            if not point[2]:
+                point[0] = boxes[point[3]][2 if point[1] else 0]
+        self.insertion_sort()
+        if ballsNum > oldBallsNum:
+            newPoints = [[boxes[index][2 if isMax else 0], isMax, False, index]
+                         for index in range(oldBallsNum, ballsNum) for isMax in (False, True)]
+            newPoints.sort(key=itemgetter(0, 1))
+            self.endpoints = list(heapq.merge(self.endpoints, newPoints, key=itemgetter(0, 1)))
+
+    def insertion_sort(self):
+        """ minimum limit goes before maximum one with the same x, so touching boxes overlap """
+        points = self.endpoints
+        for k in range(1, len(points)):
+            point = points[k]
+            value, isMax = point[0], point[1]
+            m = k - 1
+            while m >= 0 and (points[m][0] > value or (points[m][0] == value and points[m][1] and not isMax)):
+                points[m + 1] = points[m]
+                m -= 1
+            points[m + 1] = point
+
+    def sweep(self):
+        """ finds ball-ball and ball-block pairs which boxes overlap """
+        ballBoxes, blockBoxes = self.ballBoxes, self.blockBoxes
+        activeBalls, activeBlocks = set(), set()
+        self.ballPairs = ballPairs = []
+        self.ballBlocks = ballBlocks = [[] for box in ballBoxes]
+        self.movedBlocks = set()
+        for value, isMax, isBlock, key in self.endpoints:
+            active = activeBlocks if isBlock else activeBalls
+            if isMax:
+                active.discard(key)
+                continue
+            y1, y2 = (blockBoxes[key] if isBlock else ballBoxes[key])[1::2]
+            for other in activeBalls:
+                otherBox = ballBoxes[other]
+                if otherBox[1] <= y2 and y1 <= otherBox[3]:
+                    if isBlock:
+                        ballBlocks[other].append(key)
+                    else:
+                        ballPairs.append((other, key) if other < key else (key, other))
+            if not isBlock:
+                for block in activeBlocks:
+                    blockBox = blockBoxes[block]
+                    if blockBox[1] <= y2 and y1 <= blockBox[3]:
+                        ballBlocks[key].append(block)
+            active.add(key)
+
+    # broad phase interfaces ---------------------------------------------------------
+    def prepare(self, balls):
+        """ ball boxes are extended by speed to cover the area ball can reach during next movement """
+        self.preparedBalls = ([ball.xPosition for ball in balls], [ball.yPosition for ball in balls],
+                              [ball.xRelation + ball.speedValue for ball in balls])
+        self.set_balls(*self.preparedBalls)
+        self.sweep()
+
+    def candidates(self, index: int, ball) -> list:
+        """ blocks removed after prepare (died during the tick) are not candidates,
+        blocks moved after prepare (died and put to new places) are checked against the swept box of the ball,
+        ball moved after prepare (covered by moved block) gets blocks of its new place """
+        x, y, radius = ball.xPosition, ball.yPosition, ball.xRelation + ball.speedValue
+        if self.ballBoxes[index] != (x - radius, y - radius, x + radius, y + radius):
+            return self.query(ball.get_swept_limits())
+        blockOrder, movedBlocks = self.blockOrder, self.movedBlocks
+        found = [block for block in self.ballBlocks[index] if block in blockOrder and block not in movedBlocks]
+        if movedBlocks:
+            x1, y1, x2, y2 = self.ballBoxes[index]
+            found.extend(block for block in movedBlocks if block in blockOrder and self.overlaps(block, x1, y1, x2, y2))
+        return sorted(found, key=blockOrder.__getitem__)
+
+    def overlaps(self, block, x1, y1, x2, y2) -> bool:
+        box = self.blockBoxes[block]
+        return box[0] <= x2 and x1 <= box[2] and box[1] <= y2 and y1 <= box[3]
+
+    def order_of(self, block) -> int:
+        return self.blockOrder.get(block, 0)
+
+    def candidates_after(self, ball, order: int) -> list:
+        """ blocks close to the ball at its current place which were added after the block of order,
+        the ball was moved after prepare, so all blocks are checked """
+        return [block for block in self.query(ball.get_swept_limits()) if self.blockOrder[block] > order]
+
+    def query(self, limits) -> list:
+        """ blocks overlapping the limits, checks all blocks - used out of tick loop only """
+        (x1, y1), (x2, y2) = limits
+        found = [block for block, box in self.blockBoxes.items()
+                 if box[0] <= x2 and x1 <= box[2] and box[1] <= y2 and y1 <= box[3]]
+        return sorted(found, key=self.blockOrder.__getitem__)
+
+    def pairs(self, items) -> list:
+        return self.coordinate_pairs([item.xPosition for item in items],
+                                     [item.yPosition for item in items],
+                                     [item.xRelation for item in items])
+
+    def coordinate_pairs(self, xList, yList, radiusList, ordered: bool = True) -> list:
+        if not self.reuse_prepared(xList, yList, radiusList):
+            self.set_balls(xList, yList, radiusList)
+            self.sweep()
+        if ordered:
+            self.ballPairs.sort()
+        return self.ballPairs
+
+    def reuse_prepared(self, xList, yList, radiusList) -> bool:
+        """ balls at the places of the last prepare and not bigger than its swept boxes have their pairs among
+        the prepared ones, pairs which boxes do not overlap any more are dropped
+        :return: True if ballPairs are the pairs of the balls """
+        prepared, self.preparedBalls = self.preparedBalls, None
+        if prepared is None or prepared[0] != xList or prepared[1] != yList:
+            return False
+        if prepared[2] == radiusList:
+            return True
+        if any(radius > sweptRadius for radius, sweptRadius in zip(radiusList, prepared[2])):
+            return False
+        self.ballBoxes = boxes = [(x - radius, y - radius, x + radius, y + radius)
+                                  for x, y, radius in zip(xList, yList, radiusList)]
+        self.ballPairs = [(i, j) for i, j in self.ballPairs
+                          if boxes[i][0] <= boxes[j][2] and boxes[j][0] <= boxes[i][2]
+                          and boxes[i][1] <= boxes[j][3] and boxes[j][1] <= boxes[i][3]]
+        return True
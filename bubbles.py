@@ -1,21 +1,32 @@
 # pip install simple-draw
 # pip install split
-# pip install pywin32
+# pip install pywin32  (optional, windows only)
 # --------------------
 # pip install -r requirements.txt
 
 
 import argparse
-import csv
+import collections
+import heapq
 import random
-import time
-from operator import itemgetter
+from operator import attrgetter, itemgetter
 
 import simple_draw as sd
 import split as split
-from win32api import GetSystemMetrics
 
+import ball_store as bs
+import broad_phase as bp
+import contact_cache as cc
+import events as ev
 import fractal_tree_draw as fd
+import narrow_phase as nph
+import profiler as pf
+import registry as reg
+import scene_loader as sl
+import scheduler
+import screen_backends as sb
+import swept_collision as swc
+import telemetry as tm
 import transform_decart_ang as tda
 
 # todo move screen class definition to another module
@@ -30,30 +41,99 @@ BLOCKMORTALTYPE = 25
 WALLTYPE = 30
 VOIDTYPE = 0
 BALLBIRTHPLACE = 40
+BLOCKTYPES = (BLOCKTYPE, BLOCKMORTALTYPE, WALLTYPE)
+
+CONTACT_DEPTH = 2  # continuous collision stops balls this deeper than touch point to be sure contact is found
+BIRTH_ATTEMPTS = 10
+PALETTE = (sd.COLOR_YELLOW, sd.COLOR_PURPLE, sd.COLOR_CYAN, sd.COLOR_GREEN)  # colors of scene file blocks
+TELEMETRY_GETTER = attrgetter('objectId', 'xPosition', 'yPosition', 'xRelation', 'yRelation', 'xDimension',
+                              'yDimension', 'speedValue', 'speedDirection')
 
 
 def main():
     parser = parserDefinition()
     args = parser.parse_args()
+    if args.mode == 'bench':
+        import benchmark  # benchmark module imports this one
+        benchmark.main(args)
+        return
     x_resolution = args.xres
     y_resolution = args.yres
-    window = Screen(x_size=x_resolution, y_size=y_resolution)
+    seed = args.seed
+    isHeadless = args.headless or args.replay
+    if args.replay:
+        backend = sb.ReplayBackend(args.replay)
+        seed = backend.seed if seed is None else seed
+    elif args.headless:
+        backend = sb.HeadlessBackend()
+    elif args.full_redraw:
+        backend = sb.SdBackend(frameDelay=0)
+    else:
+        backend = sb.DirtyRectBackend(frameDelay=0)
+    if args.record_input:
+        if seed is None:
+            seed = random.randrange(2 ** 32)  # recorded run must be repeatable
+        backend = sb.MouseRecorder(backend, args.record_input, seed=seed)
+    if seed is not None:
+        print(f'seed {seed}')
+    screenOptions = dict(backend=backend, broadPhase=args.broad_phase, useArrays=args.arrays,
+                         continuousCollision=args.ccd, background=args.background,
+                         backgroundCache=args.background_cache, sceneCache=args.scene_cache)
+    if args.load_snapshot:
+        import snapshot  # snapshot module imports this one
+        window = snapshot.load_snapshot(args.load_snapshot, **screenOptions)
+        print(f'{args.load_snapshot} snapshot is loaded, tick {window.stats["ticks"]}')
+    else:
+        window = Screen(x_size=x_resolution, y_size=y_resolution, seed=seed, **screenOptions)
+    if args.telemetry:
+        window.start_telemetry(tm.TelemetryWriter(directory=args.telemetry, prefix=tm.time_prefix(),
+                                                  fileFormat=args.telemetry_format,
+                                                  maxFileSize=args.telemetry_size * 1024 * 1024))
+    if args.profile or args.hud:
+        window.start_profiler(pf.PhaseProfiler(isHudShown=args.hud))
+    if args.events_rate:
+        window.events.subscribe(ev.ConsoleLog(maxPerSecond=args.events_rate))
+    if args.events_log:
+        window.events.subscribe(ev.EventLog(args.events_log))
     ballsN = 30
     blocksN = 4
-    if args.mode == 'r':
+    if args.load_snapshot:
+        pass
+    elif args.mode == 'r':
         ballsN = args.nba
         blocksN = args.nbr
         window.screen_rnd_init(balls=ballsN, blocks=blocksN, wallWidth=4)
-    if args.mode == 'd':
+    elif args.mode == 'd':
         sceneFile = args.file.name
         print(sceneFile)
         window.screen_scene_init(sceneFile)
-    if args.mode == None:
+    elif args.mode == None:
         print('activate default random scene')
         window.screen_rnd_init(balls=ballsN, blocks=blocksN, wallWidth=4)
-    while not sd.user_want_exit():
-        window.do()
-    sd.quit()
+    if args.control:
+        import control  # asyncio loop is used with control socket only
+        control.run(window, args.control, tickRate=None if isHeadless or args.uncapped else args.tps,
+                    frameRate=args.fps, isFinished=backend.user_want_exit, maxTicks=args.ticks)
+    elif isHeadless or args.uncapped:
+        ticksDone = 0
+        while not backend.user_want_exit():
+            window.do()
+            ticksDone += 1
+            if args.ticks and ticksDone >= args.ticks:
+                break
+    else:
+        loop = scheduler.FixedStepScheduler(step=window.step, render=window.draw_items,
+                                            tickRate=args.tps, frameRate=args.fps)
+        loop.run(isFinished=backend.user_want_exit, maxTicks=args.ticks)
+    window.stop_telemetry()
+    window.stop_profiler(args.profile)
+    if args.save_snapshot:
+        import snapshot
+        snapshot.save_snapshot(window, args.save_snapshot)
+        print(f'{args.save_snapshot} snapshot is saved, tick {window.stats["ticks"]}')
+    window.flush_events()
+    window.events.close()
+    backend.quit()
 
 
 def parserDefinition():
@@ -68,6 +148,33 @@ def parserDefinition():
 
     parser.xres : int  - screen resolution
     parser.yres : int  - screen resolution
+    parser.headless : bool  - run simulation without window and drawing at full speed
+    parser.uncapped : bool  - no pause between frames in window mode, one tick per frame
+    parser.full_redraw : bool  - draw all items every frame instead of changed areas only
+    parser.tps : float  - physics ticks per second in window mode
+    parser.fps : float  - frames per second limit in window mode
+    parser.ticks : int  - number of ticks to run, 0 - until user exits
+    parser.broad_phase : 'grid' | 'sap' | 'brute'  - collision pairs selection
+    parser.arrays : bool  - keep balls state in numpy arrays and move them in one operation
+    parser.ccd : bool  - continuous collision detection, balls do not jump through blocks at any speed
+    parser.background : bool  - draw fractal trees background
+    parser.background_cache : str  - directory to keep rendered background between runs
+    parser.scene_cache : str  - directory to keep compiled scene files between runs
+    parser.seed : int  - seed of random generator of the screen, the same seed gives the same run
+    parser.record_input : str  - file to write mouse states of every tick to
+    parser.replay : str  - mouse states file to replay the run headless at full speed with its seed,
+        the scene and other options must be the same as in recorded run
+    parser.telemetry : str  - directory to stream balls state of every tick to, right click starts it too
+    parser.telemetry_format : 'csv' | 'npy'  - telemetry files format
+    parser.telemetry_size : int  - telemetry file size in megabytes to start the next file
+    parser.profile : str  - file to write json report of phases timings and counters to at exit
+    parser.hud : bool  - show phases timings and counters of the last tick over the items
+    parser.load_snapshot : str  - snapshot file to go on from instead of new scene, resolution and seed are its own
+    parser.save_snapshot : str  - file to save snapshot of the whole state to at exit
+    parser.events_rate : int  - events printed per second at most, 0 - events are not printed
+    parser.events_log : str  - file to write all events to as json lines
+    parser.control : str  - 'host:port' or Unix socket path to control the running simulation from,
+        the loop is run by asyncio then, see control module for commands
     parser.mode : 'r' | 'd'
     'r' - random mode:
         parser.nba : int  - balls number
@@ -76,116 +183,299 @@ def parserDefinition():
             python bubbles.py -x 1000 -y 600 r -nba 20 -nbr 4
     'd' - random mode:
         parser.file : str  - configuration file name
+    'bench' - benchmarks of hot paths, screen arguments are not used:
+        parser.sizes : list of int  - balls, blocks or calls numbers of cases
+        parser.cases : list of str  - case names or prefixes, see benchmark.CASES
+        parser.seed : int  - random generator seed of cases setup
+        parser.repeat : int  - measures of every case
+        parser.min_time : float  - minimum time of one measure, the function is called many times in a row
+        parser.output : str  - json results file
+        parser.baseline : str  - results file of other run, time ratios are printed
+        sample:
+            python bubbles.py bench --sizes 10 100 --cases collisions tda. --output after.json --baseline before.json
     """
     parser = argparse.ArgumentParser()
     parser.add_argument('-x', '--xres', help='window x resolution', type=int, default=1600)
     parser.add_argument('-y', '--yres', help='window y resolution', type=int, default=950)
+    parser.add_argument('--headless', help='run without window', action='store_true')
+    parser.add_argument('--uncapped', help='do not pause between frames', action='store_true')
+    parser.add_argument('--full-redraw', help='draw whole window every frame', action='store_true')
+    parser.add_argument('--tps', help='physics ticks per second', type=float, default=scheduler.TICK_RATE)
+    parser.add_argument('--fps', help='frames per second limit', type=float, default=scheduler.FRAME_RATE)
+    parser.add_argument('--ticks', help='number of ticks to run, 0 - endless', type=int, default=0)
+    parser.add_argument('--broad-phase', help='collision pairs selection', choices=bp.BROADPHASES,
+                        default=bp.SPATIALHASH)
+    parser.add_argument('--arrays', help='keep balls in numpy arrays', action='store_true')
+    parser.add_argument('--ccd', help='continuous collision detection', action='store_true')
+    parser.add_argument('--background', help='draw fractal trees background', action='store_true')
+    parser.add_argument('--background-cache', help='directory for rendered background images', default=None)
+    parser.add_argument('--scene-cache', help='directory for compiled scene files', default=None)
+    parser.add_argument('--seed', help='random generator seed', type=int, default=None)
+    parser.add_argument('--record-input', help='file to record mouse states to', default=None)
+    parser.add_argument('--replay', help='replay recorded mouse states file without window', default=None)
+    parser.add_argument('--telemetry', help='directory for balls state stream', default=None)
+    parser.add_argument('--telemetry-format', help='telemetry files format', choices=tm.FORMATS, default=tm.CSV)
+    parser.add_argument('--telemetry-size', help='telemetry file size limit, MB', type=int,
+                        default=tm.MAX_FILE_SIZE // (1024 * 1024))
+    parser.add_argument('--profile', help='file for phases timings report', default=None)
+    parser.add_argument('--hud', help='show phases timings in window', action='store_true')
+    parser.add_argument('--load-snapshot', help='snapshot file to start from', default=None)
+    parser.add_argument('--save-snapshot', help='file to save snapshot to at exit', default=None)
+    parser.add_argument('--events-rate', help='events printed per second, 0 - none', type=int,
+                        default=ev.CONSOLE_RATE)
+    parser.add_argument('--events-log', help='file for events log', default=None)
+    parser.add_argument('--control', help='control socket: host:port or Unix socket path', default=None)
     subparsers = parser.add_subparsers(dest='mode')
     randParser = subparsers.add_parser('r')
     randParser.add_argument('-nba', help='number of balls', type=int, required=True)
     randParser.add_argument('-nbr', help='number of bricks', type=int, required=True)
     defParser = subparsers.add_parser('d')
     defParser.add_argument('-file', type=argparse.FileType('r'), help='scene config file path', required=True)
+    benchParser = subparsers.add_parser('bench', help='time hot paths headless, see benchmark module')
+    benchParser.add_argument('--sizes', help='balls, blocks or calls numbers of cases', type=int, nargs='+',
+                             default=[10, 100, 1000, 10000])
+    benchParser.add_argument('--cases', help='case names or their prefixes, default - all cases', nargs='+',
+                             default=None)
+    benchParser.add_argument('--seed', help='random generator seed of cases setup', type=int, default=1)
+    benchParser.add_argument('--repeat', help='measures of every case', type=int, default=3)
+    benchParser.add_argument('--min-time', help='minimum time of one measure, s', type=float, default=0.2)
+    benchParser.add_argument('--output', help='results file', default='bench_results.json')
+    benchParser.add_argument('--baseline', help='results file of other run to compare with', default=None)
     return parser
 
 
-def scene_file_read(fileName):
-    """
-    Generator reads raws of CSV and transforms them to the dictionary
-    :returns
-    dict of read raw with keys from first raw"""
-    with open(fileName, 'r') as sceneFile:
-        rowReader = csv.reader(sceneFile, delimiter=';')
-        rowsNum = 0
-        dictKeys = []
-        for row in rowReader:
-            rowsNum += 1
-            if rowsNum == 1:
-                dictKeys = row
-                continue
-            # rowPre = map(str.replace(r, __old=',', __new='.'), r for r in row)
-            # resultDict = dict(zip(dictKeys, rowPre))
-            resultDict = dict(zip(dictKeys, row))
-            # print(resultDict)
-            yield resultDict
-
-
 class Screen:
     """Keeps list of all screen objects and resolution ond manages all its items
     provides movement, drawing, checking collisions and user interaction
+    all output and user input goes through display backend (see screen_backends)
+    random is own random generator of the screen, so runs with the same seed are the same
+    stats counts events of the simulation: ticks, blockCollisions, ballCollisions, blocksRemoved, blocksMoved,
+    ballsDied, ballsReturned (runaway balls returned to the birth place),
+    ballsReset (balls found inside blocks or covered by moved ones), dieCalls,
+    blockPairTests and ballPairTests (contact checks of candidate pairs)
+    contacts keeps contacting pairs of items from tick to tick, see contact_cache
+    events delivers events of the simulation to subscribers at the end of every tick, see events module
+    profiler measures phases of ticks and frames if it is started, see start_profiler
     """
 
-    def __init__(self, x_size=800, y_size=600):
-        width = GetSystemMetrics(0)
-        height = GetSystemMetrics(1)
-        print(f"Screen resolution = {width} x {height}")
-        self.x_resolution = x_size if x_size < width else width
-        self.y_resolution = y_size if y_size < height else height
-        self.mobile_objects = []
-        self.static_objects = []
+    def __init__(self, x_size=800, y_size=600, backend=None, broadPhase=bp.SPATIALHASH, useArrays=False,
+                 continuousCollision=False, background=False, backgroundCache=None, sceneCache=None, seed=None):
+        self.backend = backend if backend is not None else sb.SdBackend()
+        self.random = random.Random(seed)  # all random choices of the screen and its items, seed repeats the run
+        self.continuousCollision = continuousCollision
+        self.sceneCache = sceneCache
+        self.ballStore = bs.BallStore() if useArrays else None
+        self.ballBroadPhase, self.blockIndex = bp.create_broad_phase(broadPhase)
+        self.x_resolution = x_size
+        self.y_resolution = y_size
+        screenSize = self.backend.get_screen_size()
+        if screenSize:
+            width, height = screenSize
+            print(f"Screen resolution = {width} x {height}")
+            self.x_resolution = x_size if x_size < width else width
+            self.y_resolution = y_size if y_size < height else height
+        self.mobileItems = reg.ItemRegistry()
+        self.staticItems = reg.ItemRegistry()
+        self.mobile_objects = self.mobileItems.items
+        self.static_objects = self.staticItems.items
         self.lastObjectId = 0
+        self.stats = collections.Counter()
+        self.contacts = cc.ContactCache()
+        self.events = ev.EventBus()
+        self.telemetry = None
+        self.profiler = None
         self.ballBirthPlace = [[int(0.1 * self.x_resolution),
                                 int(0.1 * self.y_resolution)],
                                [int(0.9 * self.x_resolution),
                                 int(0.9 * self.y_resolution)]]
         # self.contacting_items = {}
-        sd.resolution = (self.x_resolution, self.y_resolution)
-        # self.draw_screen_background()
-        sd.take_background()
+        self.backend.setup(self.x_resolution, self.y_resolution)
+        if background and self.backend.isRendering:
+            self.draw_screen_background(cacheDir=backgroundCache)
         print(self.ballBirthPlace)
 
-    def draw_screen_background(self):
-        fd.fractal_tree(sd.get_point(int(self.x_resolution * 0.3),
-                                     int(self.y_resolution * 0.9)),
-                        200, 275, 40, 0.6, )
-        fd.fractal_tree(sd.get_point(int(self.x_resolution * 0.8),
-                                     int(self.y_resolution * 0.1)),
-                        150, 120, 30, 0.65, sd.COLOR_DARK_ORANGE)
+    def draw_screen_background(self, cacheDir=None):
+        trees = [((int(self.x_resolution * 0.3), int(self.y_resolution * 0.9)),
+                  200, 275, 40, 0.6, sd.COLOR_DARK_GREEN),
+                 ((int(self.x_resolution * 0.8), int(self.y_resolution * 0.1)),
+                  150, 120, 30, 0.65, sd.COLOR_DARK_ORANGE)]
+        self.backend.set_background(fd.cached_background(self.get_resolution(), trees, cacheDir=cacheDir))
 
     def add_mobile_item(self, mov_item):
         if isinstance(mov_item, MobileObject):
-            self.mobile_objects.append(mov_item)
+            self.mobileItems.add(mov_item)
+
+    def add_mobile_items(self, mov_items: list):
+        self.mobileItems.add_many(mov_items)
 
     def add_stationary_item(self, stat_item):
         if isinstance(stat_item, ScreenObject) and not isinstance(stat_item, MobileObject):
-            self.static_objects.append(stat_item)
+            if self.staticItems.add(stat_item):
+                self.blockIndex.add(stat_item)
+                self.backend.invalidate_static_layer()
+
+    def add_stationary_items(self, stat_items: list):
+        """ adds many stationary items at once, static layer is rebuilt once """
+        self.staticItems.add_many(stat_items)
+        self.blockIndex.add_many(stat_items)
+        self.backend.invalidate_static_layer()
 
     def remove_mobile_item(self, item):
-        if isinstance(item, MobileObject):
-            itemName = id(item)
-            self.mobile_objects.remove(item)
-            print(f'Mobile item {itemName} removed')
+        """ during a tick the item is removed at the end of it """
+        if isinstance(item, MobileObject) and self.mobileItems.remove(item):
+            if not self.mobileItems.isDeferred:
+                self.mobile_item_removed(item)
+
+    def mobile_item_removed(self, item):
+        if isinstance(item, ArrayBall):
+            self.ballStore.detach(item)
+        if self.events.isActive:
+            self.events.emit(ev.BallRemoved(item.objectId))
 
     def remove_stationary_item(self, item):
-        if isinstance(item, Block):
-            itemName = id(item)
-            if item in self.static_objects:
-                self.static_objects.remove(item)
-                print(f'Static item {itemName} removed')
+        """ block index forgets the item at once, so it is not found by the next balls of the tick,
+        during a tick the item is removed from static objects at the end of it """
+        if isinstance(item, Block) and self.staticItems.remove(item):
+            self.blockIndex.remove(item)
+            self.backend.invalidate_static_layer()
+            if self.events.isActive:
+                self.events.emit(ev.BlockDestroyed(item.objectId, item.xPosition, item.yPosition))
+
+    def defer_items_changes(self):
+        """ items lists are not changed till commit_items_changes, additions and removals are queued """
+        self.mobileItems.defer()
+        self.staticItems.defer()
+
+    def commit_items_changes(self):
+        self.staticItems.commit()
+        isBorn = bool(self.mobileItems.addQueue)
+        for item in self.mobileItems.commit():
+            self.mobile_item_removed(item)
+        store = self.ballStore
+        if store is not None and (isBorn or len(store) != len(self.mobile_objects)) \
+                and store.balls != self.mobile_objects:
+            # balls born during the tick got store slots at once and their registry places at commit,
+            # the store follows the registry order, slots of balls which were removed before commit are freed
+            store.reorder(self.mobile_objects)
+
+    def stationary_item_moved(self, item):
+        """ static item limits are changed - keeps block index up to date """
+        self.blockIndex.update(item)
+        self.backend.invalidate_static_layer()
+        if self.continuousCollision:
+            self.release_covered_balls(item)
+
+    def release_covered_balls(self, block):
+        """ with continuous collision there is no check for balls inside blocks, so balls the block lands on
+        at its new place would stay trapped there - they are returned to the birth place """
+        (x1, y1), (x2, y2) = block.get_limits()
+        for ball in self.mobile_objects:
+            (ballX1, ballY1), (ballX2, ballY2) = ball.get_limits()
+            if ballX1 <= x2 and x1 <= ballX2 and ballY1 <= y2 and y1 <= ballY2 and self.ball_touches(ball, block):
+                ball.ball_reset_position()
+                self.stats['ballsReset'] += 1
+
+    def stationary_item_changed(self, item):
+        """ static item looks different - it is drawn again """
+        self.backend.invalidate_static_layer()
 
     def move_mobile_items(self):
-        for dinObj in self.mobile_objects:
-            dinObj.make_movement()
+        fractions = self.impact_limited_movements() if self.continuousCollision else None
+        if self.ballStore is not None:
+            self.ballStore.move(fractions)
+            return
+        for index, dinObj in enumerate(self.mobile_objects):
+            dinObj.make_movement(1.0 if fractions is None else fractions[index])
+
+    def impact_limited_movements(self) -> list:
+        """ continuous collision: part of the tick movement every ball does before it touches a block or a ball
+        the ball stops CONTACT_DEPTH pixels deeper than the touch point, so the next tick finds the contact
+        :return: list of movement parts 0..1 in order of mobile objects list (of ball store slots in array mode)
+        """
+        balls = self.ballStore.balls if self.ballStore is not None else self.mobile_objects
+        centers = [ball.get_position() for ball in balls]
+        moves = [tda.angular_to_decart_fast(distance=ball.speedValue, angle=ball.speedDirection) for ball in balls]
+        radii = [ball.get_radius() for ball in balls]
+        fractions = [1.0] * len(balls)
+        self.blockIndex.prepare(balls)
+        for index, ball in enumerate(balls):
+            for block in self.blockIndex.candidates(index, ball):
+                toi = swc.circle_block_toi(centers[index], moves[index], radii[index] - CONTACT_DEPTH,
+                                           block.get_limits())
+                if toi is not None and toi < fractions[index]:
+                    fractions[index] = toi
+        sweptRadii = [radius + ball.speedValue for radius, ball in zip(radii, balls)]
+        ballPairs = self.ballBroadPhase.coordinate_pairs([center[0] for center in centers],
+                                                         [center[1] for center in centers], sweptRadii,
+                                                         ordered=False)
+        for i, j in ballPairs:
+            toi = swc.circle_circle_toi(centers[i], moves[i], radii[i], centers[j], moves[j],
+                                        radii[j] - CONTACT_DEPTH)
+            if toi is not None:
+                fractions[i] = min(fractions[i], toi)
+                fractions[j] = min(fractions[j], toi)
+        return fractions
+
+    def touches_block(self, item) -> bool:
+        """ :return: True if the ball overlaps a block """
+        return any(self.ball_touches(item, block) for block in self.blockIndex.query(item.get_limits()))
+
+    @staticmethod
+    def ball_touches(ball, block) -> bool:
+        """ circle of the ball overlaps the block rectangle, check_contact misses balls which centers
+        are inside the block """
+        x, y = ball.get_position()
+        (x1, y1), (x2, y2) = block.get_limits()
+        dx = x - min(max(x, x1), x2)
+        dy = y - min(max(y, y1), y2)
+        return dx * dx + dy * dy <= ball.get_radius() ** 2
 
     def export_mobile_items(self):
-        headLine = "Xpos, Ypos, Xref, Yref, Xsize, Ysize, Speed Value, Speed Direction, Was Contact,"
-        logTimeTuple = time.localtime(time.time())
-        logTimeStr = f"{logTimeTuple.tm_year}-{logTimeTuple.tm_mon:}-{logTimeTuple.tm_mday} {logTimeTuple.tm_hour}-" \
-                     f"{logTimeTuple.tm_min}-{logTimeTuple.tm_sec}"
-        logFileName = f"balls log {logTimeStr}.csv"
-        print(logFileName)
-        try:
-            logFile = open(logFileName, 'w')
-            logFile.write(headLine + '\n')
-            for dinObj in self.mobile_objects:
-                data = dinObj.export_data()
-                logFile.write(data + '\n')
-
-        except OSError as errorMessage:
-            print(errorMessage)
-        finally:
-            logFile.close()
-            print(f"log file {logFileName} is closed")
+        """ starts telemetry stream of balls state to CSV files named with current time if it is not running """
+        if self.telemetry is None:
+            self.start_telemetry(tm.TelemetryWriter(prefix=tm.time_prefix()))
+
+    def start_telemetry(self, writer: tm.TelemetryWriter):
+        """ balls state is submitted to the writer after every tick till stop_telemetry """
+        self.stop_telemetry()
+        self.telemetry = writer
+
+    def stop_telemetry(self):
+        if self.telemetry is not None:
+            self.telemetry.close()
+            print(f"telemetry: {self.telemetry.writtenRows} rows written, "
+                  f"{self.telemetry.droppedBatches} ticks dropped")
+            self.telemetry = None
+
+    def start_profiler(self, profiler=None):
+        """ phases of every tick and frame are measured from now on, see profiler module
+        :return: the profiler """
+        self.profiler = profiler if profiler is not None else pf.PhaseProfiler()
+        self.profiler.end_tick(self.stats)
+        return self.profiler
+
+    def stop_profiler(self, fileName: str = None):
+        """ stops measuring, the report with screen stats is written to fileName as json if given """
+        if self.profiler is not None:
+            if fileName:
+                self.profiler.dump(fileName, self.stats)
+                print(f'profile is written to {fileName}')
+            self.profiler = None
+
+    def telemetry_rows(self):
+        """ balls state in telemetry FIELDS order without tick: list of tuples or numpy array in array mode
+        wasContact is the number of items the ball is in contact with """
+        contactsOf = self.contacts.contacts_of
+        if self.ballStore is None:
+            return [(*TELEMETRY_GETTER(ball), contactsOf(ball.objectId)) for ball in self.mobile_objects]
+        store = self.ballStore
+        size = len(store)
+        radius = store.radius[:size]
+        ids = bs.np.fromiter((ball.objectId for ball in store.balls), dtype=bs.np.float64, count=size)
+        contacts = bs.np.fromiter((contactsOf(ball.objectId) for ball in store.balls), dtype=bs.np.float64,
+                                  count=size)
+        return bs.np.column_stack((ids, store.x[:size], store.y[:size], radius, radius, 2 * radius, 2 * radius,
+                                   store.speedValue[:size], store.speedDirection[:size], contacts))
 
     def manage_mobile_items_collisions(self):
         IMPULSE_COEF = 1.00
@@ -195,7 +485,6 @@ class Screen:
             """ count a reflection angle"""
             [speedValue, direction] = item.get_speed()
             direction = tda.reflectance_angle(normalToSurface=normalVector, angle=direction)
-            item.set_contact()
             item.set_speed(value=speedValue, direction=direction)
 
         def mobObjectDispersion(item: MobileObject, normalVector):
@@ -212,89 +501,311 @@ class Screen:
             item1.set_speed(item1NewSpeed, item1SpeedDir)
             item2.set_speed(item2NewSpeed, item2SpeedDir)
 
-        x_resolution, y_resolution = self.get_resolution()
-        for statObj in self.static_objects:
-            for mobObj in self.mobile_objects:
+        # contact cache tells if the contact is new or it goes on since the previous tick,
+        # new contact changes the speed, ongoing one disperses items which are still in contact
+        touch = self.contacts.touch
+        events = self.events
+        blockIndex = self.blockIndex
+        blockIndex.prepare(self.mobile_objects)
+        blockPairTests = 0
+        for index, mobObj in enumerate(self.mobile_objects):
+            # only blocks close to the ball can be in contact with it
+            nearBlocks = blockIndex.candidates(index, mobObj)
+            blockPairTests += len(nearBlocks)
+            place = 0
+            while place < len(nearBlocks):
+                statObj = nearBlocks[place]
+                place += 1
+                isMoved = False
                 [isContact, normalVector] = mobObj.check_contact(statObj)
                 if isContact:
-                    if mobObj.was_contact() == 0:
+                    if touch(mobObj.objectId, statObj.objectId) == cc.BEGIN:
+                        self.stats['blockCollisions'] += 1
+                        if events.isActive:
+                            events.emit(ev.Collision(mobObj.objectId, statObj.objectId, normalVector))
                         mobObjectChangeSpeedDirection(item=mobObj, normalVector=normalVector)
                         mobObj.speedValue = int(round(mobObj.speedValue * 1.02))
-                        mobObj.set_contact()
+                        order = blockIndex.order_of(statObj) if not blockIndex.isExhaustive else 0
+                        # the ball is moved if it dies or the moved block covers it
+                        placeBefore = (mobObj.get_position(), mobObj.speedValue)
                         if mobObj.is_to_die_now():
                             mobObj.die()
                         if statObj.is_to_die_now():
                             statObj.die()
-                else:
-                    mobObj.lost_contact()
-                if mobObj.was_contact() > 2:
-                    mobObjectDispersion(mobObj, normalVector)
-                    # mobObjectChangeSpeed(item=mobObj, normalVector=normalVector)
-                if mobObj.is_inside(statObj):
+                        isMoved = (mobObj.get_position(), mobObj.speedValue) != placeBefore
+                    else:
+                        # ball did not leave the block after reflection - it goes along the block side
+                        mobObjectDispersion(mobObj, normalVector)
+                if not self.continuousCollision and mobObj.is_inside(statObj):
+                    if not isMoved and not blockIndex.isExhaustive:
+                        order = blockIndex.order_of(statObj)
                     mobObj.ball_reset_position()
-        for i in range(0, len(self.mobile_objects) - 1):
-            for j in range(i + 1, len(self.mobile_objects)):
-                mobObj1 = self.mobile_objects[i]
-                mobObj2 = self.mobile_objects[j]
-                [isContact, normalVector] = mobObj1.check_contact(mobObj2)
-                if isContact:
-                    if mobObj1.was_contact() == 0 and mobObj2.was_contact() == 0:
-                        mobObjectChangeSpeedValue(mobObj1, mobObj2)
-                    if mobObj1.was_contact() == 0:
-                        mobObjectChangeSpeedDirection(item=mobObj1, normalVector=normalVector)
-                        mobObj1.set_contact()
-                        if mobObj1.is_to_die_now():
-                            mobObj1.die()
-                    if mobObj2.was_contact() == 0:
-                        mobObjectChangeSpeedDirection(item=mobObj2, normalVector=normalVector)
-                        mobObj2.set_contact()
-                        if mobObj2.is_to_die_now():
-                            mobObj2.die()
-                else:
-                    mobObj1.lost_contact()
-                    mobObj2.lost_contact()
-                if mobObj1.was_contact() > 1:
-                    mobObjectDispersion(mobObj1, normalVector + 90)
-                if mobObj2.was_contact() > 1:
-                    mobObjectDispersion(mobObj2, normalVector + 270)
+                    self.stats['ballsReset'] += 1
+                    isMoved = True
+                if isMoved and not blockIndex.isExhaustive:
+                    # the ball is at a new place: the rest of its candidates are the blocks near it,
+                    # the same blocks the list of all blocks gives after the current one
+                    newBlocks = blockIndex.candidates_after(mobObj, order)
+                    blockPairTests += len(newBlocks)
+                    nearBlocks = nearBlocks[:place] + newBlocks
+        self.stats['blockPairTests'] += blockPairTests
+        if self.ballStore is not None:
+            balls = self.ballStore.balls
+            checkedPairs = self.ball_contacts_in_bulk()
+        else:
+            balls = self.mobile_objects
+            checkedPairs = self.ball_contacts_one_by_one()
+        for i, j, isContact, normalVector in checkedPairs:
+            if not isContact:
+                continue
+            mobObj1 = balls[i]
+            mobObj2 = balls[j]
+            if touch(mobObj1.objectId, mobObj2.objectId) == cc.BEGIN:
+                self.stats['ballCollisions'] += 1
+                if events.isActive:
+                    events.emit(ev.Collision(mobObj1.objectId, mobObj2.objectId, normalVector))
+                mobObjectChangeSpeedValue(mobObj1, mobObj2)
+                for mobObj in (mobObj1, mobObj2):
+                    mobObjectChangeSpeedDirection(item=mobObj, normalVector=normalVector)
+                    if mobObj.is_to_die_now():
+                        mobObj.die()
+            else:
+                # balls still overlap - they go away from each other along the line of their centers
+                mobObjectDispersion(mobObj1, normalVector + 90)
+                mobObjectDispersion(mobObj2, normalVector + 270)
+        # pairs without contact at this tick are not touched - their contacts end
+        self.contacts.end_tick()
+
+    def ball_contacts_one_by_one(self):
+        """ generates candidate pairs of mobile items with the result of contact check for each of them
+        ball moved or resized by handling of its contact gets the pairs of its new place, so any broad phase
+        visits the contacting pairs the brute force double loop does
+        :return: (i, j, isContact, normalVector), i, j - indexes in mobile objects list
+        """
+        balls = self.mobile_objects
+        pairs = self.ballBroadPhase.pairs(balls)
+        self.stats['ballPairTests'] += len(pairs)
+        isExhaustive = self.ballBroadPhase.isExhaustive
+        place = 0
+        while place < len(pairs):
+            i, j = pairs[place]
+            place += 1
+            [isContact, normalVector] = balls[i].check_contact(balls[j])
+            if not isContact or isExhaustive:
+                yield i, j, isContact, normalVector
+                continue
+            shapesBefore = self.pair_shapes(balls, i, j)
+            yield i, j, isContact, normalVector
+            moved = self.changed_balls(balls, i, j, shapesBefore)
+            if moved:
+                newPairs = self.near_pairs(moved, (i, j))
+                self.stats['ballPairTests'] += len(newPairs)
+                pairs = sorted([pair for pair in pairs[place:] if pair[0] not in moved and pair[1] not in moved]
+                               + newPairs)
+                place = 0
+
+    @staticmethod
+    def pair_shapes(balls, i: int, j: int) -> tuple:
+        return balls[i].get_position(), balls[i].get_radius(), balls[j].get_position(), balls[j].get_radius()
+
+    def changed_balls(self, balls, i: int, j: int, shapesBefore) -> set:
+        """ :return: indexes of the pair balls which were moved or resized since shapesBefore """
+        shapesAfter = self.pair_shapes(balls, i, j)
+        changed = set()
+        if shapesAfter[:2] != shapesBefore[:2]:
+            changed.add(i)
+        if shapesAfter[2:] != shapesBefore[2:]:
+            changed.add(j)
+        return changed
+
+    def near_pairs(self, indexes, lastPair) -> list:
+        """ pairs of balls of indexes with balls which boxes overlap theirs at their current places,
+        only pairs the double loop over balls visits after lastPair
+        indexes - places in mobile objects list or slots of ball store in array mode """
+        found = set()
+        if self.ballStore is not None:
+            store = self.ballStore
+            size = len(store)
+            # integer coordinates and radii the same way ball objects give them
+            x, y = store.x[:size].astype(bs.np.int64), store.y[:size].astype(bs.np.int64)
+            radius = store.radius[:size].astype(bs.np.int64)
+            for index in indexes:
+                reach = radius + radius[index]
+                near = bs.np.flatnonzero((bs.np.abs(x - x[index]) <= reach) & (bs.np.abs(y - y[index]) <= reach))
+                found.update((index, other) if index < other else (other, index)
+                             for other in near.tolist() if other != index)
+        else:
+            balls = self.mobile_objects
+            for index in indexes:
+                x, y, radius = balls[index].xPosition, balls[index].yPosition, balls[index].xRelation
+                for other, ball in enumerate(balls):
+                    reach = radius + ball.xRelation
+                    if other != index and abs(ball.xPosition - x) <= reach and abs(ball.yPosition - y) <= reach:
+                        found.add((index, other) if index < other else (other, index))
+        return [pair for pair in found if pair > lastPair]
+
+    def ball_contacts_in_bulk(self):
+        """ checks all candidate pairs of ball store in one numpy pass and generates only contacting ones
+        :return: (i, j, True, normalVector), i, j - slots in ball store
+        """
+        store = self.ballStore
+        size = len(store)
+        ballPairs = self.ballBroadPhase.coordinate_pairs(store.x[:size].tolist(), store.y[:size].tolist(),
+                                                         store.radius[:size].tolist(), ordered=False)
+        self.stats['ballPairTests'] += len(ballPairs)
+        first, second = nph.pairs_to_arrays(ballPairs)
+        contact, normalX, normalY, depth = nph.ball_ball_contacts(store.x, store.y, store.radius, first, second)
+        order = nph.visit_order(first, second)
+        first, second, contact = first[order].tolist(), second[order].tolist(), contact[order]
+        balls = store.balls
+        changed = set()
+        # pairs of changed balls at their new places which are not candidates, heap in visit order
+        extraPairs = []
+        candidatePairs = None
+
+        def track_changes(i, j, shapesBefore):
+            """ balls moved or resized by handling of the contact make bulk results of their pairs out of date,
+            broad phase which is not exhaustive has not given the pairs of their new places """
+            nonlocal candidatePairs
+            moved = self.changed_balls(balls, i, j, shapesBefore)
+            changed.update(moved)
+            if moved and not self.ballBroadPhase.isExhaustive:
+                if candidatePairs is None:
+                    candidatePairs = set(zip(first, second))
+                newPairs = self.near_pairs(moved, (i, j))
+                self.stats['ballPairTests'] += len(newPairs)
+                for pair in newPairs:
+                    if pair not in candidatePairs:
+                        heapq.heappush(extraPairs, pair)
+
+        def check_again(i, j):
+            [isContact, normalVector] = balls[i].check_contact(balls[j])
+            if isContact:
+                shapesBefore = self.pair_shapes(balls, i, j)
+                yield i, j, True, normalVector
+                track_changes(i, j, shapesBefore)
+
+        def check_extra(lastPair):
+            """ extra pairs the double loop visits before lastPair """
+            while extraPairs and extraPairs[0] < lastPair:
+                pair = heapq.heappop(extraPairs)
+                while extraPairs and extraPairs[0] == pair:
+                    heapq.heappop(extraPairs)
+                yield from check_again(*pair)
+
+        start = 0
+        for place in bs.np.flatnonzero(contact).tolist() + [len(first)]:
+            if changed:
+                # ball was shrunk or reinitialized by previous contact - bulk results of its pairs are out of date,
+                # pairs without contact before it are checked again too
+                for i, j in zip(first[start:place], second[start:place]):
+                    yield from check_extra((i, j))
+                    if i in changed or j in changed:
+                        yield from check_again(i, j)
+            start = place + 1
+            if place == len(first):
+                yield from check_extra((size, size))
+                break
+            i, j = first[place], second[place]
+            yield from check_extra((i, j))
+            if i in changed or j in changed:
+                yield from check_again(i, j)
+                continue
+            # integer angle the same way as check_ball_ball_contact does
+            dx = int(store.x[j] - store.x[i])
+            dy = int(store.y[j] - store.y[i])
+            shapesBefore = self.pair_shapes(balls, i, j)
+            yield i, j, True, 90 + tda.vector_angle_fast(dx, dy)
+            track_changes(i, j, shapesBefore)
 
     def check_mobile_items_in_window(self):
-        for mobObj in self.mobile_objects:
-            if mobObj.is_out_of_window(self):
-                # if mobObj is Ball:
-                if type(mobObj) == Ball:
-                    mobObj.ball_init()
-                    print(" Runaway ball is returned ")
+        if self.ballStore is not None:
+            runawaySlots = self.ballStore.out_of_window(self.get_max_coordinate())
+            runawayBalls = [self.ballStore.balls[slot] for slot in runawaySlots]
+        else:
+            runawayBalls = [mobObj for mobObj in self.mobile_objects if mobObj.is_out_of_window(self)]
+        for mobObj in runawayBalls:
+            if mobObj.objectType == BALLTYPE:
+                if self.events.isActive:
+                    self.events.emit(ev.BallEscaped(mobObj.objectId, *mobObj.get_position()))
+                if not mobObj.ball_init():
+                    self.remove_mobile_item(mobObj)
+                self.stats['ballsReturned'] += 1
 
     def check_mobile_item_is_immovable(self):
-        for mobObj in self.mobile_objects:
+        if self.ballStore is not None:
+            stoppedBalls = [self.ballStore.balls[slot] for slot in self.ballStore.stopped()]
+        else:
+            stoppedBalls = self.mobile_objects
+        for mobObj in stoppedBalls:
             if mobObj.is_immovable():
+                if self.events.isActive:
+                    self.events.emit(ev.BallStopped(mobObj.objectId, *mobObj.get_position()))
                 mobObj.die()
-                print(" Stopped ball is initialized ")
 
     def draw_items(self):
-        sd.start_drawing()  # removes  blinking
-        for statObj in self.static_objects:
-            statObj.draw_item()
+        profiler = self.profiler
+        if profiler is not None:
+            startTime = profiler.clock()
+        self.backend.start_frame()
+        if self.backend.start_static_layer():
+            for statObj in self.static_objects:
+                statObj.draw_item()
+            self.backend.finish_static_layer()
         for dinObj in self.mobile_objects:
             dinObj.draw_item()
-        sd.finish_drawing()  # removes  blinking
-        sd.sleep(0.06)
-        sd.draw_background()
+        if profiler is not None and profiler.isHudShown:
+            self.backend.draw_text(profiler.hud_lines())
+        self.backend.finish_frame()
+        self.backend.restore_background()
+        if profiler is not None:
+            profiler.add('draw', profiler.clock() - startTime)
 
     # def __del__(self):
     #     pass
 
     def do(self):
-        self.draw_items()
-        self.manage_mobile_items_collisions()
-        self.move_mobile_items()
-        self.check_mobile_items_in_window()
-        self.check_mobile_item_is_immovable()
-        [cursorPos, mouseState] = sd.get_mouse_state()
+        """ one frame and one physics tick, paced by backend frame delay """
+        if self.backend.isRendering:
+            self.draw_items()
+            self.backend.sleep(self.backend.frameDelay)
+        self.step()
+
+    def step(self):
+        """ one physics tick without drawing, its phases are measured if profiler is started
+        items added or removed during the tick are added or removed at the end of it """
+        self.stats['ticks'] += 1
+        self.defer_items_changes()
+        profiler = self.profiler if self.profiler is not None else pf.NO_PROFILER
+        for phase, function in self.tick_phases():
+            profiler.measure(phase, function)
+        profiler.end_tick(self.stats)
+        self.commit_items_changes()
+        if self.events.batch:
+            profiler.measure('events', self.flush_events)
+
+    def tick_phases(self) -> list:
+        """ :return: (profiler phase, method) of every phase of the tick in their order """
+        phases = [('collisions', self.manage_mobile_items_collisions), ('move', self.move_mobile_items)]
+        if not self.continuousCollision:
+            # fast balls can jump through walls between ticks - they are returned to the birth place
+            phases.append(('window', self.check_mobile_items_in_window))
+        phases += [('immovable', self.check_mobile_item_is_immovable), ('mouse', self.check_mouse)]
+        if self.telemetry is not None:
+            phases.append(('telemetry', self.submit_telemetry))
+        return phases
+
+    def check_mouse(self):
+        [cursorPos, mouseState] = self.backend.get_mouse_state()
         if mouseState[2] != 0:
             self.export_mobile_items()
 
+    def submit_telemetry(self):
+        self.telemetry.submit(self.stats['ticks'], self.telemetry_rows())
+
+    def flush_events(self):
+        self.events.flush(self.stats['ticks'])
+
     def screen_rnd_init(self, balls=3, blocks=1, wallWidth=3):
         x_lim, y_lim = self.get_resolution()
         wallBlocks = [[[0, 0], [wallWidth, y_lim - 1]],
@@ -317,57 +828,38 @@ class Screen:
         self.screen_balls_init(balls)
 
     def screen_scene_init(self, fileName: str):
-        def block_coords_count(rowDict: dict):
-            x_lim, y_lim = self.get_resolution()
-            left = int(x_lim * float(rowDict['LEFT']))
-            right = int(x_lim * float(rowDict['RIGHT']))
-            bottom = int(y_lim * float(rowDict['BOTTOM']))
-            top = int(y_lim * float(rowDict['TOP']))
-            return [left, bottom], [right, top]
-
+        """ creates blocks and balls of scene file, see scene_loader for its format and cache
+        file rows are read by chunks, blocks are added at once when the whole file is read """
+        x_lim, y_lim = self.get_resolution()
         ballsNum = 5
-        sceneFile = scene_file_read(fileName)
-        for rowData in sceneFile:
-            objType = int(rowData['TYPE'])
-            objId = int(rowData['ID'])
-            bottomLeft, topRight = block_coords_count(rowData)
-            colorId = int(rowData['COLOR'])
-            thickness = int(rowData['THICKNESS'])
-            lives = int(rowData['LIVES'])
-            print(objType, rowData)
-            if objType == BALLBIRTHPLACE:
-                self.set_birth_place(bottomLeft, topRight)
-                ballsNum = lives
-                continue
-            topRight[0] -= bottomLeft[0]
-            topRight[1] -= bottomLeft[1]
-            if objType == WALLTYPE:
-                blockTemp = Block(bottomLeft, topRight, parent=self)
-                blockTemp.set_width(thickness)
-                blockTemp.set_color(blockTemp.get_palette_color(colorId))
-                blockTemp.set_obj_type(WALLTYPE)
-                self.add_stationary_item(blockTemp)
-                print(objId, bottomLeft, topRight)
-                print('wall block', id(blockTemp), 'added')
-                continue
-            if objType == BLOCKMORTALTYPE:
-                print(objId, bottomLeft, topRight)
-                blockTemp = Block(bottomLeft, topRight, parent=self)
-                blockTemp.set_width(thickness)
-                blockTemp.set_color(blockTemp.get_palette_color(colorId))
-                blockTemp.set_obj_type(BLOCKMORTALTYPE)
-                blockTemp.set_lifetime(lives)
-                self.add_stationary_item(blockTemp)
-                print('block', id(blockTemp), 'added')
-                continue
+        blocks = []
+        for chunk in sl.scene_chunks(fileName, cacheDir=self.sceneCache):
+            for objId, objType, left, bottom, right, top, colorId, thickness, lives in zip(
+                    *[iter(chunk)] * len(sl.SCENE_COLUMNS)):
+                bottomLeft = [int(x_lim * left), int(y_lim * bottom)]
+                topRight = [int(x_lim * right), int(y_lim * top)]
+                if objType == BALLBIRTHPLACE:
+                    self.set_birth_place(bottomLeft, topRight)
+                    ballsNum = int(lives)
+                    continue
+                if objType == WALLTYPE or objType == BLOCKMORTALTYPE:
+                    blocks.append(Block.scene_block(self, bottomLeft, topRight, int(objType), int(colorId),
+                                                    int(thickness), int(lives)))
+        self.add_stationary_items(blocks)
+        print(f'{fileName}: {len(blocks)} blocks added')
         self.screen_balls_init(ballsNum=ballsNum)
 
     def screen_balls_init(self, ballsNum):
+        ballClass = ArrayBall if self.ballStore is not None else Ball
         while ballsNum > 0:
-            ball1 = Ball(parent=self)
-            ball1.ball_init()
-            self.add_mobile_item(ball1)
-            print('balls', ballsNum, 'added')
+            ball1 = ballClass(parent=self)
+            if ball1.ball_init():
+                self.add_mobile_item(ball1)
+                print('balls', ballsNum, 'added')
+            else:
+                if self.ballStore is not None:
+                    self.ballStore.detach(ball1)
+                print('ball', ballsNum, 'is not added: birth place is covered by blocks')
             ballsNum -= 1
 
     def stat_items_issue(self, ignore=None):
@@ -402,10 +894,19 @@ class Screen:
         self.ballBirthPlace[1] = list(topRight)
 
 
+def palette_color(colorId: int):
+    colorNumber = colorId % (len(PALETTE) - 1)
+    color = PALETTE[colorNumber]
+    return color
+
+
 class ScreenObject:
     """ Has initial point coordinates, reference of own center and dimensions
     can be drawn with defined color and width
-    parent field is stored to require window resolution and balls birthplace coordinates"""
+    parent field is stored to require window resolution and balls birthplace coordinates
+    items have no __dict__: all their fields are slots, so they are smaller and faster to access"""
+    __slots__ = ('parent', 'xPosition', 'yPosition', 'xRelation', 'yRelation', 'xDimension', 'yDimension', 'color',
+                 'width', 'isRemovable', 'tillRemove', 'objectId', 'objectType')
     BALLTYPE = BALLTYPE
     BLOCKTYPE = BLOCKTYPE
     BLOCKMORTALTYPE = BLOCKMORTALTYPE
@@ -414,13 +915,13 @@ class ScreenObject:
     BALLBIRTHPLACE = BALLBIRTHPLACE
 
     def __init__(self, reference: list, relation: list, dimensions: list, parent: object = None):
+        self.parent = parent
         self.set_position(reference)
         self.set_dimensions(relation, dimensions)
         self.set_color(sd.COLOR_YELLOW)
         self.set_width(1)
         self.isRemovable = False
         self.tillRemove = 10
-        self.parent = parent
         self.objectId = parent.get_new_object_id()
         self.objectType = self.VOIDTYPE
 
@@ -487,17 +988,11 @@ class ScreenObject:
                    sd.COLOR_CYAN,
                    sd.COLOR_GREEN]
         color_count = len(palette) - 1
-        color = palette[random.randint(0, color_count)]
+        color = palette[self.parent.random.randint(0, color_count)]
         return color
 
     def get_palette_color(self, colorId: int):
-        palette = [sd.COLOR_YELLOW,
-                   sd.COLOR_PURPLE,
-                   sd.COLOR_CYAN,
-                   sd.COLOR_GREEN]
-        colorNumber = colorId % (len(palette) - 1)
-        color = palette[colorNumber]
-        return color
+        return palette_color(colorId)
 
     def get_obj_type(self):
         return self.objectType
@@ -506,8 +1001,8 @@ class ScreenObject:
         return self.objectId
 
     def screen_object_init(self, x0=0, y0=0, x_lim=200, y_lim=200):
-        x = random.randint(x0, x_lim)
-        y = random.randint(y0, y_lim)
+        x = self.parent.random.randint(x0, x_lim)
+        y = self.parent.random.randint(y0, y_lim)
         self.set_position(reference=[x, y])
         self.set_color(self.get_random_color())
         self.set_width(2)
@@ -524,7 +1019,7 @@ class ScreenObject:
         if self.isRemovable:
             if self.tillRemove < 6:
                 self.set_color(sd.COLOR_RED)
-                if type(self) is Ball:
+                if self.objectType == BALLTYPE:
                     self.set_radius(int(0.9 * self.get_radius()))
                     if self.get_radius() < 5:
                         self.set_radius(5)
@@ -536,27 +1031,32 @@ class ScreenObject:
         return False
 
     def die(self):
+        self.parent.stats['dieCalls'] += 1
         x, y = self.get_position()
         dimension = 40
         if self.get_obj_type() == self.BLOCKMORTALTYPE:
             dimension = 60
+            self.parent.stats['blocksRemoved'] += 1
             self.parent.remove_stationary_item(self)
         if self.get_obj_type() == self.BLOCKTYPE:
             dimension = 80
+            self.parent.stats['blocksMoved'] += 1
             self.block_init(*(self.parent.get_resolution()))
         if self.get_obj_type() == self.BALLTYPE:
-            self.ball_init()
-        sd.snowflake(sd.get_point(x, y), dimension)
+            self.parent.stats['ballsDied'] += 1
+            if not self.ball_init():
+                self.parent.remove_mobile_item(self)
+        self.parent.backend.draw_snowflake(center=(x, y), length=dimension)
 
 
 class MobileObject(ScreenObject):
     """Any screen item that changes its coordinates, checks collision
     draws itself"""
+    __slots__ = ('speedValue', 'speedDirection')
 
     def __init__(self, reference: list, relation: list, dimensions: list, parent: object = None):
         super().__init__(reference, relation, dimensions, parent)
         self.set_speed(value=0, direction=0)
-        self.wasContactBefore = 0
 
     def get_speed(self) -> (int, int):
         return self.speedValue, self.speedDirection
@@ -566,15 +1066,13 @@ class MobileObject(ScreenObject):
         self.speedDirection = direction if value > 0 else 0
 
     def was_contact(self) -> int:
-        return self.wasContactBefore
-
-    def set_contact(self):
-        self.wasContactBefore += 1
+        """ :return: number of items the item was in contact with at the last tick """
+        return self.parent.contacts.contacts_of(self.objectId)
 
     def export_data(self) -> str:
         export = f" {self.xPosition}, {self.yPosition}, {self.xRelation}, {self.yRelation}," \
                  f" {self.xDimension}, {self.yDimension}, {self.speedValue}, {self.speedDirection}," \
-                 f" {self.wasContactBefore}"
+                 f" {self.was_contact()}"
         return export
 
     # def import_data(self, data: str):
@@ -585,12 +1083,6 @@ class MobileObject(ScreenObject):
     #     self.set_speed(speedVal, speedDir)
     #     self.wasContactBefore = wasContactBefore
 
-    def lost_contact(self):
-        if self.wasContactBefore > 0:
-            self.wasContactBefore -= 1
-        if self.wasContactBefore < 0:
-            self.wasContactBefore = 0
-
     def check_contact(self, opponent: ScreenObject) -> [bool, int]:
         def check_ball_block_contact(ball: Ball, block: Block) -> [bool, int]:
             def check_ball_vertex_contact(centre, vertex, radius) -> bool:
@@ -623,7 +1115,7 @@ class MobileObject(ScreenObject):
                                                               linePoint2=blockVertex[0]))
                 if contactDetected:
                     [x, y] = tda.vectorize(point1=blockVertex[0], point2=blockVertex[1])
-                    normalToSurface = tda.vector_angle(x=x, y=y)
+                    normalToSurface = tda.vector_angle_fast(x=x, y=y)
                     return [True, normalToSurface]
             elif referencePoint[1] <= center[1] <= oppositePoint[1]:
                 contactDetected = (check_ball_edge_contact(centre=center,
@@ -636,13 +1128,13 @@ class MobileObject(ScreenObject):
                                                               linePoint2=blockVertex[2]))
                 if contactDetected:
                     [x, y] = tda.vectorize(point1=blockVertex[1], point2=blockVertex[2])
-                    normalToSurface = tda.vector_angle(x=x, y=y)
+                    normalToSurface = tda.vector_angle_fast(x=x, y=y)
                     return [True, normalToSurface]
             else:
                 for point in blockVertex:
                     if check_ball_vertex_contact(centre=center, vertex=point, radius=ballRadius):
                         [x, y] = tda.vectorize(point1=center, point2=point)
-                        normalToSurface = 90 + tda.vector_angle(x=x, y=y)
+                        normalToSurface = 90 + tda.vector_angle_fast(x=x, y=y)
                         return [True, normalToSurface]
             return [contactDetected, normalToSurface]
 
@@ -651,18 +1143,29 @@ class MobileObject(ScreenObject):
             [x, y] = tda.vectorize(point1=ball1.get_position(), point2=ball2.get_position())
             ballDistance = tda.vector_length(x, y)
             if not ballDistance > contactDistance:
-                return [True, 90 + tda.vector_angle(x, y)]
+                return [True, 90 + tda.vector_angle_fast(x, y)]
             return [False, 0]
 
-        if isinstance(self, Ball) and not self.wasContactBefore:
-            if isinstance(opponent, Block):
+        if self.objectType == BALLTYPE:
+            opponentType = opponent.objectType
+            if opponentType in BLOCKTYPES:
                 return check_ball_block_contact(self, opponent)
-            elif isinstance(opponent, Ball):
+            elif opponentType == BALLTYPE:
                 return check_ball_ball_contact(self, opponent)
         return [False, 0]
 
-    def make_movement(self):
-        [x, y] = tda.angular_to_decart(distance=self.speedValue, angle=self.speedDirection)
+    def get_swept_limits(self):
+        """ limits of area that can be covered by the item during next movement """
+        (x1, y1), (x2, y2) = self.get_limits()
+        margin = self.speedValue
+        return [x1 - margin, y1 - margin], [x2 + margin, y2 + margin]
+
+    def make_movement(self, fraction: float = 1.0):
+        """ fraction - part of the tick movement to do """
+        [x, y] = tda.angular_to_decart_fast(distance=self.speedValue, angle=self.speedDirection)
+        if fraction < 1.0:
+            x = int(round(x * fraction))
+            y = int(round(y * fraction))
         self.xPosition += x
         self.yPosition += y
         return
@@ -675,8 +1178,8 @@ class MobileObject(ScreenObject):
     def mobile_object_init(self):
         x = self.parent.get_max_coordinate()
         speed_limit = (int(x * 0.005), int(x * 0.008))
-        speed_value = random.randint(*speed_limit)  # star before list unpacks the arguments
-        speed_direction = random.randint(0, 360)
+        speed_value = self.parent.random.randint(*speed_limit)  # star before list unpacks the arguments
+        speed_direction = self.parent.random.randint(0, 360)
         self.set_speed(speed_value, speed_direction)
         return
 
@@ -693,6 +1196,7 @@ class MobileObject(ScreenObject):
 
 class Block(ScreenObject):
     """ rectangular static blocks """
+    __slots__ = ('referencePoint', 'oppositePoint')
 
     def __init__(self, reference=[0, 0], dimensions=[1, 1], parent: object = None):
         relation = [0, 0]
@@ -700,32 +1204,64 @@ class Block(ScreenObject):
         self.init_points()
         self.set_obj_type(self.BLOCKTYPE)
 
+    @classmethod
+    def scene_block(cls, parent, bottomLeft: list, topRight: list, objType: int, colorId: int, thickness: int,
+                    lives: int):
+        """ block of scene file row: the same block as made by init and setters, but parent is not notified,
+        the block is added by add_stationary_items """
+        block = cls.__new__(cls)
+        block.parent = parent
+        block.xPosition, block.yPosition = bottomLeft
+        block.xRelation = block.yRelation = 0
+        block.xDimension = topRight[0] - bottomLeft[0]
+        block.yDimension = topRight[1] - bottomLeft[1]
+        block.color = palette_color(colorId)
+        block.width = thickness or 1
+        block.isRemovable = objType == BLOCKMORTALTYPE
+        block.tillRemove = lives if block.isRemovable else 10
+        block.objectId = parent.get_new_object_id()
+        block.objectType = objType
+        block.init_points()
+        return block
+
+    def set_color(self, color=sd.COLOR_YELLOW):
+        if color and color != getattr(self, 'color', None):
+            super().set_color(color)
+            self.parent.stationary_item_changed(self)
+
+    def set_width(self, width=None):
+        if width and width != getattr(self, 'width', None):
+            super().set_width(width)
+            self.parent.stationary_item_changed(self)
+
     def draw_item(self):
-        sd.rectangle(left_bottom=self.referencePoint, right_top=self.oppositePoint, color=self.color,
-                     width=self.width)
+        self.parent.backend.draw_rectangle(leftBottom=self.referencePoint, rightTop=self.oppositePoint,
+                                           color=self.color, width=self.width)
 
     def init_points(self):
-        self.referencePoint = sd.get_point(x=self.xPosition, y=self.yPosition)
-        self.oppositePoint = sd.get_point(x=self.xPosition + self.xDimension, y=self.yPosition + self.yDimension)
+        self.referencePoint = (self.xPosition, self.yPosition)
+        self.oppositePoint = (self.xPosition + self.xDimension, self.yPosition + self.yDimension)
 
     def block_init(self, x_lim=200, y_lim=200):
         wall_thickness = 5
-        x_size = random.randint(int(x_lim * 0.05), int(x_lim * 0.3))
-        y_size = random.randint(int(y_lim * 0.05), int(y_lim * 0.3))
+        x_size = self.parent.random.randint(int(x_lim * 0.05), int(x_lim * 0.3))
+        y_size = self.parent.random.randint(int(y_lim * 0.05), int(y_lim * 0.3))
         x0 = wall_thickness
         x_max = x_lim - x_size - wall_thickness
         y0 = x0
         y_max = y_lim - y_size - wall_thickness
-        self.set_lifetime(random.randint(10, 100))
+        self.set_lifetime(self.parent.random.randint(10, 100))
         self.set_dimensions(relation=[0, 0], dimensions=[x_size, y_size])
         self.screen_object_init(x0=x0, y0=y0, x_lim=x_max, y_lim=y_max)
         self.init_points()
+        self.parent.stationary_item_moved(self)
 
 
 class Ball(MobileObject):
     """ mobile balls with radius
         radius value is stored in xRelation of screenObject
     """
+    __slots__ = ()
 
     def __init__(self, reference=[0, 0], radius=1, parent: object = None):
         relation = [radius, radius]
@@ -734,14 +1270,14 @@ class Ball(MobileObject):
         self.set_obj_type(self.BALLTYPE)
 
     def draw_item(self):
-        self.referencePoint = sd.get_point(x=self.xPosition, y=self.yPosition)
-        if self.wasContactBefore > 0:
+        if self.was_contact():
             color = sd.COLOR_DARK_RED
             width = 5
         else:
             color = self.color
             width = self.width
-        sd.circle(center_position=self.referencePoint, radius=self.xRelation, color=color, width=width)
+        self.parent.backend.draw_circle(center=(self.xPosition, self.yPosition), radius=self.xRelation,
+                                        color=color, width=width)
         return
 
     def get_radius(self):
@@ -750,26 +1286,90 @@ class Ball(MobileObject):
     def ball_init(self):
         ''' define start position in birthplace coordinates received, speed and radius for bubble in window '''
         radius_limit = (16, 50)
-        radius = random.randint(*radius_limit)
+        radius = self.parent.random.randint(*radius_limit)
         self.mobile_object_init()
         self.set_radius(radius)
-        self.ball_reset_position()
-        self.set_lifetime(random.randint(20, 50))
-        print(f"Ball {self.get_obj_id()} initialized")
+        isPlaced = self.ball_reset_position()
+        self.set_lifetime(self.parent.random.randint(20, 50))
+        events = self.parent.events
+        if isPlaced and events.isActive:
+            events.emit(ev.BallSpawned(self.objectId, *self.get_position(), self.xRelation))
+        return isPlaced
 
     def set_radius(self, radius):
         diameter = 2 * radius
         self.set_dimensions([radius, radius], [diameter, diameter])
 
-    def ball_reset_position(self):
+    def ball_reset_position(self) -> bool:
+        """ random place in birth place, with continuous collision the ball does not touch blocks: if BIRTH_ATTEMPTS
+        random places touch blocks the first free one of the birth place grid is taken
+        :return: False if the whole birth place is covered by blocks, the ball stays inside a block then """
         (x0, y0), (x_lim, y_lim) = self.parent.get_birth_place()
         x0 += self.xRelation + self.speedValue  # + wall_thickness
         y0 += self.xRelation + self.speedValue  # + wall_thickness
         x_max = x_lim - self.xRelation - self.speedValue  # - wall_thickness
         y_max = y_lim - self.xRelation - self.speedValue  # - wall_thickness
-        self.screen_object_init(x0=x0, y0=y0, x_lim=x_max, y_lim=y_max)
+        isPlaced = True
+        for attempt in range(BIRTH_ATTEMPTS):
+            self.screen_object_init(x0=x0, y0=y0, x_lim=x_max, y_lim=y_max)
+            # with continuous collision there is no check for balls inside blocks, so they are not born there
+            if not self.parent.continuousCollision or not self.parent.touches_block(self):
+                break
+        else:
+            isPlaced = self.free_birth_position(x0, y0, x_max, y_max)
         self.mobile_object_init()
-        return
+        return isPlaced
+
+    def free_birth_position(self, x0, y0, x_max, y_max) -> bool:
+        """ places the ball to the first point out of blocks of the grid with radius step over the area
+        :return: False if there is no such point """
+        step = max(1, self.xRelation)
+        for y in range(y0, y_max + 1, step):
+            for x in range(x0, x_max + 1, step):
+                self.set_position([x, y])
+                if not self.parent.touches_block(self):
+                    return True
+        return False
+
+
+class ArrayBall(Ball):
+    """ ball which keeps its coordinates, radius, speed and lifetime in ball store arrays of parent screen
+        the object is a view to its slot in the store, so it is used like usual ball
+    """
+    __slots__ = ('store', 'slot')
+    xPosition = bs.store_field('x')
+    yPosition = bs.store_field('y')
+    xRelation = bs.store_field('radius')
+    yRelation = bs.store_field('radius')
+    speedValue = property(lambda self: int(self.store.speedValue[self.slot]),
+                          lambda self, value: self.store.set_speed(self.slot, value, self.speedDirection))
+    speedDirection = property(lambda self: int(self.store.speedDirection[self.slot]),
+                              lambda self, value: self.store.set_speed(self.slot, self.speedValue, value))
+    tillRemove = bs.store_field('tillRemove')
+    width = bs.store_field('width')
+    isRemovable = bs.store_field('isRemovable', bool)
+    color = property(lambda self: (int(self.store.red[self.slot]), int(self.store.green[self.slot]),
+                                   int(self.store.blue[self.slot])),
+                     lambda self, color: self.store.set_color(self.slot, color))
+
+    def __init__(self, reference=[0, 0], radius=1, parent: object = None):
+        self.store = parent.ballStore
+        self.slot = self.store.attach(self)
+        super().__init__(reference, radius, parent)
+
+    @property
+    def xDimension(self):
+        return 2 * self.xRelation
+
+    @property
+    def yDimension(self):
+        return 2 * self.xRelation
+
+    def set_dimensions(self, relation: list, dimensions: list):
+        self.xRelation = relation[0]
+
+    def set_speed(self, value: int = 0, direction: int = 0):
+        self.store.set_speed(self.slot, value if value > 0 else 0, direction if value > 0 else 0)
 
 
 # =====================================================================================
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# contacts of screen items pairs kept from tick to tick: which pairs touch each other, how long, begin and end
+
+import collections
+
+BEGIN = 1
+PERSIST = 2
+
+
+class ContactCache:
+    """ contacting pairs of items keyed by (objectId, objectId) with smaller id first
+    a pair is touched when contact check of broad phase candidate pair finds contact: the first touch begins
+    the contact, touches at the next ticks make it persist, the tick without touch of the pair ends it
+    so pairs without contact cost nothing, there are no counters to decrease for them
+    pairs - contacting pairs of the last finished tick: the number of ticks the pair is in contact
+    itemContacts - number of contacting pairs of every item in contact at the last finished tick """
+
+    def __init__(self):
+        self.pairs = {}
+        self.tickPairs = {}
+        self.itemContacts = {}
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def touch(self, firstId: int, secondId: int) -> int:
+        """ contact of the pair is found at this tick
+        :return: BEGIN if the pair was not in contact at the previous tick, else PERSIST """
+        pair = (firstId, secondId) if firstId < secondId else (secondId, firstId)
+        ticks = self.pairs.get(pair, 0) + 1
+        self.tickPairs[pair] = ticks
+        return BEGIN if ticks == 1 else PERSIST
+
+    def end_tick(self) -> list:
+        """ contacts of pairs not touched during the tick end, touched pairs become the cache contents
+        :return: pairs which contacts ended """
+        ended = [pair for pair in self.pairs if pair not in self.tickPairs]
+        self.pairs = self.tickPairs
+        self.tickPairs = {}
+        itemContacts = collections.Counter()
+        for firstId, secondId in self.pairs:
+            itemContacts[firstId] += 1
+            itemContacts[secondId] += 1
+        self.itemContacts = itemContacts
+        return ended
+
+    def contacts_of(self, objectId: int) -> int:
+        """ :return: number of items the item was in contact with at the last tick """
+        return self.itemContacts.get(objectId, 0)
+
+    def contact_ticks(self, firstId: int, secondId: int) -> int:
+        """ :return: number of ticks the pair is in contact, 0 if it is not """
+        pair = (firstId, secondId) if firstId < secondId else (secondId, firstId)
+        return self.pairs.get(pair, 0)
+
+    def restore(self, pairs):
+        """ cache contents of saved state: (firstId, secondId, ticks) of every contacting pair """
+        self.pairs = {}
+        self.tickPairs = {}
+        for firstId, secondId, ticks in pairs:
+            self.tickPairs[(firstId, secondId)] = ticks
+        self.end_tick()
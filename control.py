@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+#
+# asyncio main loop: screen ticks run as a task, local socket clients query and control the running simulation
+#
+# address - 'host:port' for TCP socket or path of Unix socket
+# protocol - one command per text line, one json line is the answer:
+#     metrics               screen stats, items numbers and profiler report of phases
+#     export                starts telemetry of balls state, the same as right click does
+#     snapshot FILE         saves snapshot of the screen state to FILE, the rest of the line is the file path
+#     add_balls N           adds N new balls
+#     pause | resume        stops and goes on ticking, paused window is still drawn
+#     step [N]              does N ticks (1 by default), it is meant for paused simulation
+#     quit                  stops the loop
+# sample:
+#     python bubbles.py --headless --control /tmp/bubbles.sock r -nba 20 -nbr 4
+#     echo metrics | nc -U /tmp/bubbles.sock
+
+import asyncio
+import json
+import os
+
+import profiler as pf
+import scheduler
+
+PAUSE_PERIOD = 1 / scheduler.FRAME_RATE  # paused loop checks its state and draws the window this often
+PATH_COMMANDS = ('snapshot',)  # their argument is the rest of the line, so paths may have spaces
+
+
+class ControlError(Exception):
+    pass
+
+
+def parse_address(address: str):
+    """ :return: (host, port) for TCP address, None and path for Unix socket one """
+    host, separator, port = address.rpartition(':')
+    if separator and port.isdigit():
+        return host or '127.0.0.1', int(port)
+    return None, address
+
+
+class ControlServer:
+    """ runs screen ticks in asyncio task and answers commands of socket clients between them
+    commands are done in the same thread as ticks, so the screen is never changed in the middle of a tick
+    tickRate - ticks per second with frames paced by scheduler, None - screen.do is called as fast as possible
+    isFinished - function, the loop stops when it returns True, backend user_want_exit for example
+    maxTicks - loop stops after this number of ticks, 0 - no limit
+    the screen gets profiler if it has none, so metrics have live phases timings """
+
+    def __init__(self, screen, tickRate: float = None, frameRate: float = scheduler.FRAME_RATE, isFinished=None,
+                 maxTicks: int = 0):
+        self.screen = screen
+        self.tickRate = tickRate
+        self.frameRate = frameRate
+        self.isFinished = isFinished if isFinished is not None else (lambda: False)
+        self.maxTicks = maxTicks
+        self.isPaused = False
+        self.isStopped = False
+        self.ticksDone = 0
+        self.server = None
+        self.socketPath = None
+        self.commands = {'metrics': self.metrics, 'export': self.export, 'snapshot': self.snapshot,
+                         'add_balls': self.add_balls, 'pause': self.pause, 'resume': self.resume,
+                         'step': self.step, 'quit': self.quit}
+        if screen.profiler is None:
+            screen.start_profiler(pf.PhaseProfiler())
+
+    async def start(self, address: str):
+        """ starts listening
+        :return: address of the socket, the port is the real one if port 0 was given """
+        host, port = parse_address(address)
+        if host is None:
+            self.server = await asyncio.start_unix_server(self.serve_client, path=port)
+            self.socketPath = port
+            return port
+        self.server = await asyncio.start_server(self.serve_client, host=host, port=port)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f'{host}:{port}'
+
+    async def run(self):
+        """ ticks till the loop is finished, then stops listening """
+        try:
+            if self.tickRate is None:
+                await self.run_uncapped()
+            else:
+                await self.run_paced()
+        finally:
+            if self.server is not None:
+                self.server.close()
+                await self.server.wait_closed()
+            if self.socketPath is not None and os.path.exists(self.socketPath):
+                os.remove(self.socketPath)
+
+    def is_done(self) -> bool:
+        return self.isStopped or self.isFinished() or bool(self.maxTicks and self.ticksDone >= self.maxTicks)
+
+    async def run_uncapped(self):
+        while not self.is_done():
+            if self.isPaused:
+                await self.wait_paused()
+                continue
+            self.screen.do()
+            self.ticksDone += 1
+            await asyncio.sleep(0)  # clients are served between ticks
+
+    async def run_paced(self):
+        delays = []
+        loop = scheduler.FixedStepScheduler(step=self.count_step, render=self.screen.draw_items,
+                                            tickRate=self.tickRate, frameRate=self.frameRate, sleep=delays.append)
+        while not self.is_done():
+            if self.isPaused:
+                await self.wait_paused()
+                loop.lastTime = None  # time of the pause is not made up by extra ticks
+                continue
+            loop.run_frame()
+            # scheduler tells how long to wait for the next frame, clients are served meanwhile
+            await asyncio.sleep(delays.pop() if delays else 0)
+
+    def count_step(self):
+        self.screen.step()
+        self.ticksDone += 1
+
+    async def wait_paused(self):
+        if self.screen.backend.isRendering:
+            self.screen.draw_items()
+        await asyncio.sleep(PAUSE_PERIOD)
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write((json.dumps(self.execute(line.decode())) + '\n').encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def execute(self, line: str) -> dict:
+        """ :return: answer to the command line, error text in 'error' if the command failed
+        any error of the command is answered, the loop and other clients go on """
+        words = line.split()
+        if not words:
+            return {'error': 'empty command'}
+        command = self.commands.get(words[0])
+        if command is None:
+            return {'error': f'unknown command {words[0]}, expected one of {sorted(self.commands)}'}
+        if words[0] in PATH_COMMANDS:
+            words = line.strip().split(maxsplit=1)
+        try:
+            return command(*words[1:])
+        except Exception as error:
+            return {'error': f'{words[0]}: {error}'}
+
+    def metrics(self) -> dict:
+        screen = self.screen
+        answer = {'ticks': screen.stats['ticks'], 'balls': len(screen.mobile_objects),
+                  'blocks': len(screen.static_objects), 'paused': self.isPaused}
+        if screen.profiler is not None:
+            answer.update(screen.profiler.report(screen.stats))
+        else:
+            answer['stats'] = dict(screen.stats)
+        return answer
+
+    def export(self) -> dict:
+        self.screen.export_mobile_items()
+        return {'telemetry': self.screen.telemetry.prefix}
+
+    def snapshot(self, fileName: str) -> dict:
+        import snapshot  # snapshot module imports bubbles
+        snapshot.save_snapshot(self.screen, fileName)
+        return {'snapshot': fileName, 'ticks': self.screen.stats['ticks']}
+
+    def add_balls(self, ballsNum: str) -> dict:
+        ballsNum = int(ballsNum)
+        if ballsNum < 1:
+            raise ControlError('number of balls must be positive')
+        self.screen.screen_balls_init(ballsNum)
+        return {'balls': len(self.screen.mobile_objects)}
+
+    def pause(self) -> dict:
+        self.isPaused = True
+        return {'paused': True}
+
+    def resume(self) -> dict:
+        self.isPaused = False
+        return {'paused': False}
+
+    def step(self, ticksNum: str = '1') -> dict:
+        ticksNum = int(ticksNum)
+        if ticksNum < 1:
+            raise ControlError('number of ticks must be positive')
+        for tick in range(ticksNum):
+            self.count_step()
+        if self.screen.backend.isRendering:
+            self.screen.draw_items()
+        return {'ticks': self.screen.stats['ticks']}
+
+    def quit(self) -> dict:
+        self.isStopped = True
+        return {'stopped': True}
+
+
+def run(screen, address: str, **loopOptions):
+    """ runs the screen with control socket at address till the loop is finished, see ControlServer """
+    async def main():
+        server = ControlServer(screen, **loopOptions)
+        print(f'control socket {await server.start(address)}')
+        await server.run()
+
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# typed events of the simulation and the bus which delivers them to subscribers in one batch per tick
+
+import collections
+import json
+import sys
+import time
+
+BallSpawned = collections.namedtuple('BallSpawned', 'objectId x y radius')  # new or reinitialized ball
+BallEscaped = collections.namedtuple('BallEscaped', 'objectId x y')  # ball out of window, it is returned
+BallStopped = collections.namedtuple('BallStopped', 'objectId x y')  # ball without speed, it is reinitialized
+BallRemoved = collections.namedtuple('BallRemoved', 'objectId')
+BlockDestroyed = collections.namedtuple('BlockDestroyed', 'objectId x y')
+Collision = collections.namedtuple('Collision', 'firstId secondId normal')  # contact begin, first is a ball
+SnapshotExported = collections.namedtuple('SnapshotExported', 'fileName ticks')  # ticks done at saving
+EVENTS = (BallSpawned, BallEscaped, BallStopped, BallRemoved, BlockDestroyed, Collision, SnapshotExported)
+
+CONSOLE_RATE = 20  # console lines per second
+
+
+class EventBus:
+    """ events emitted during a tick are kept in batch and delivered to subscribers at once by flush
+    subscriber - callable(tick, events), events - list of events of subscribed types in emission order
+    isActive is False while nobody is subscribed: emitters check it before they make an event,
+    so events cost one attribute check then """
+
+    def __init__(self):
+        self.subscribers = []
+        self.batch = []
+        self.isActive = False
+        self.tick = 0
+
+    def subscribe(self, consumer, eventTypes=None):
+        """ eventTypes - event classes the consumer gets, None - all of them
+        :return: the consumer """
+        self.subscribers.append((consumer, None if eventTypes is None else tuple(eventTypes)))
+        self.isActive = True
+        return consumer
+
+    def unsubscribe(self, consumer):
+        self.subscribers = [(subscriber, types) for subscriber, types in self.subscribers if subscriber is not consumer]
+        self.isActive = bool(self.subscribers)
+        if not self.isActive:
+            self.batch = []
+
+    def emit(self, event):
+        if self.isActive:
+            self.batch.append(event)
+
+    def flush(self, tick: int):
+        """ delivers events of the tick """
+        self.tick = tick
+        if not self.batch:
+            return
+        batch = self.batch
+        self.batch = []
+        for consumer, types in self.subscribers:
+            events = batch if types is None else [event for event in batch if isinstance(event, types)]
+            if events:
+                consumer(tick, events)
+
+    def close(self):
+        """ delivers the rest of events with the last tick number and closes consumers which can be closed """
+        self.flush(self.tick)
+        for consumer, types in self.subscribers:
+            if hasattr(consumer, 'close'):
+                consumer.close()
+        self.subscribers = []
+        self.isActive = False
+
+
+class ConsoleLog:
+    """ prints events, not more than maxPerSecond lines per second
+    events over the limit are dropped, their number is printed when the next second starts """
+
+    def __init__(self, maxPerSecond: int = CONSOLE_RATE, out=None, clock=time.monotonic):
+        self.maxPerSecond = maxPerSecond
+        self.out = out
+        self.clock = clock
+        self.secondStart = None
+        self.printed = 0
+        self.dropped = 0
+
+    def __call__(self, tick: int, events: list):
+        now = self.clock()
+        if self.secondStart is None or now - self.secondStart >= 1:
+            if self.dropped:
+                self.write(f'{self.dropped} events are not shown')
+            self.secondStart = now
+            self.printed = 0
+            self.dropped = 0
+        shownNum = max(0, min(len(events), self.maxPerSecond - self.printed))
+        for event in events[:shownNum]:
+            self.write(f'tick {tick}: {event}')
+        self.printed += shownNum
+        self.dropped += len(events) - shownNum
+
+    def write(self, line: str):
+        print(line, file=self.out if self.out is not None else sys.stdout)
+
+
+class EventLog:
+    """ writes events to file as json lines: tick, event - class name and event fields """
+
+    def __init__(self, fileName: str):
+        self.logFile = open(fileName, 'w')
+        self.writtenEvents = 0
+
+    def __call__(self, tick: int, events: list):
+        for event in events:
+            self.logFile.write(json.dumps({'tick': tick, 'event': type(event).__name__, **event._asdict()}) + '\n')
+        self.writtenEvents += len(events)
+
+    def close(self):
+        self.logFile.close()
+
+
+class EventCounter:
+    """ counts events by class name """
+
+    def __init__(self):
+        self.counts = collections.Counter()
+
+    def __call__(self, tick: int, events: list):
+        self.counts.update(type(event).__name__ for event in events)
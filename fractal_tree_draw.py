@@ -6,28 +6,45 @@
 # pip install simple_draw
 #
 
+import hashlib
+import math
+import os
+
+import pygame
 import simple_draw as sd
 
+MIN_LENGTH = 10
+MAX_DEPTH = 12
+CACHE_VERSION = 1  # change it when drawing of trees is changed to invalidate cached images
 
-def draw_branch(point,
-                angle,
-                length,
-                color):
-    branch = sd.get_vector(start_point=point, angle=angle, length=length, )
-    branch.draw(color=color)
-    return branch.end_point
+_backgrounds = {}
 
 
-def draw_fork(point,
-              angle,
-              tilt,
-              length,
-              color):
-    angle1 = angle + tilt
-    angle2 = angle - tilt
-    vertex1 = draw_branch(point, angle1, length, color)
-    vertex2 = draw_branch(point, angle2, length, color)
-    return ([vertex1, angle1], [vertex2, angle2])
+def fractal_tree_segments(point,
+                          length=100,
+                          direction=90,
+                          tilt=30,
+                          scale=0.6,
+                          minLength=MIN_LENGTH,
+                          maxDepth=MAX_DEPTH):
+    """
+    tree without recursion: fork at the root and at the end of every branch,
+    branches of every next fork are scale times shorter, forks stop when branch is not longer than minLength
+    or maxDepth forks are done from the root
+    :return: list of segments ((x1, y1), (x2, y2))
+    """
+    segments = []
+    forks = [(point[0], point[1], direction, length, 1)]
+    while forks:
+        x, y, angle, length, depth = forks.pop()
+        for branchAngle in (angle + tilt, angle - tilt):
+            radians = math.radians(branchAngle)
+            x2 = x + length * math.cos(radians)
+            y2 = y + length * math.sin(radians)
+            segments.append(((x, y), (x2, y2)))
+            if length > minLength and depth < maxDepth:
+                forks.append((x2, y2, branchAngle, length * scale, depth + 1))
+    return segments
 
 
 def fractal_tree(point,
@@ -36,9 +53,40 @@ def fractal_tree(point,
                  tilt=30,
                  scale=0.6,
                  color=sd.COLOR_DARK_GREEN):
-    vertexes = draw_fork(point, direction, tilt, length, color)
-    while length > 10:
-        length *= scale
-        for points in vertexes:
-            fractal_tree(points[0], length, points[1], tilt, scale, color)
+    for start, end in fractal_tree_segments((point.x, point.y), length, direction, tilt, scale):
+        sd.line(start_point=sd.get_point(*start), end_point=sd.get_point(*end), color=color)
     return
+
+
+def render_background(resolution, trees):
+    """
+    draws trees on offscreen surface filled with background color
+    trees - list of (point, length, direction, tilt, scale, color), point is (x, y)
+    """
+    width, height = resolution
+    surface = pygame.Surface((width, height))
+    surface.fill(sd.background_color)
+    for point, length, direction, tilt, scale, color in trees:
+        for (x1, y1), (x2, y2) in fractal_tree_segments(point, length, direction, tilt, scale):
+            pygame.draw.line(surface, color, (int(x1), height - int(y1)), (int(x2), height - int(y2)))
+    return surface
+
+
+def cached_background(resolution, trees, cacheDir=None):
+    """
+    background surface with trees, rendered once for the same trees and resolution
+    cacheDir - if given, the image is kept in this directory between program runs
+    """
+    key = hashlib.sha1(repr((CACHE_VERSION, tuple(resolution), sd.background_color, trees)).encode()).hexdigest()
+    if key in _backgrounds:
+        return _backgrounds[key]
+    fileName = os.path.join(cacheDir, f'tree_background_{key}.png') if cacheDir else None
+    if fileName and os.path.exists(fileName):
+        surface = pygame.image.load(fileName)
+    else:
+        surface = render_background(resolution, trees)
+        if fileName:
+            os.makedirs(cacheDir, exist_ok=True)
+            pygame.image.save(surface, fileName)
+    _backgrounds[key] = surface
+    return surface
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+#
+# narrow phase of collision detection: exact contact checks for many candidate pairs in one numpy pass
+#
+# pip install numpy
+
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def pairs_to_arrays(pairs):
+    """ list of (i, j) index pairs to two index arrays """
+    if not pairs:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    pairsArray = np.fromiter(chain.from_iterable(pairs), dtype=np.int64, count=2 * len(pairs))
+    return pairsArray[0::2], pairsArray[1::2]
+
+
+def visit_order(first, second):
+    """ :return: indexes of pairs sorted the way brute force double loop visits them """
+    return np.lexsort((second, first))
+
+
+def ball_ball_contacts(x, y, radius, first, second):
+    """ checks contacts of balls pairs: first[k] with second[k]
+    x, y, radius - arrays of balls centers and radii
+    first, second - index arrays of candidate pairs
+    :return:
+    contact - bool mask, True if distance between centers is not bigger than sum of radii
+    normalX, normalY - unit vector from first ball center to second one, (0, 0) if centers are the same
+    depth - penetration depth: sum of radii minus distance, negative if there is no contact
+    """
+    dx = x[second] - x[first]
+    dy = y[second] - y[first]
+    squareDistance = dx * dx + dy * dy
+    contactDistance = radius[first] + radius[second]
+    # squares are compared to keep exactly the same result as integer check_ball_ball_contact
+    contact = squareDistance <= contactDistance * contactDistance
+    distance = np.sqrt(squareDistance)
+    divider = np.where(distance > 0, distance, 1.0)
+    return contact, dx / divider, dy / divider, contactDistance - distance
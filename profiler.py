@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# per-phase profiling of screen ticks and frames: rolling timings of every phase and counters of the last tick
+# screen without profiler does not measure anything, see Screen.start_profiler
+
+import collections
+import json
+import time
+
+PHASES = ('draw', 'collisions', 'move', 'window', 'immovable', 'mouse', 'telemetry', 'events')
+COUNTERS = ('blockPairTests', 'ballPairTests', 'blockCollisions', 'ballCollisions', 'dieCalls', 'ballsReset',
+            'ballsReturned')
+PERCENTILES = (50, 90, 99)
+SAMPLES = 240
+
+
+class PhaseProfiler:
+    """ keeps the last samplesNum durations of every phase in seconds and totals of all of them
+    percentiles are taken from the last samples, so they follow the current state of the simulation
+    counters of the last tick are differences of screen stats between the ends of two ticks
+    isHudShown - screen draws profiler lines over its items every frame """
+
+    def __init__(self, samplesNum: int = SAMPLES, isHudShown: bool = False):
+        self.samples = {phase: collections.deque(maxlen=samplesNum) for phase in PHASES}
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.isHudShown = isHudShown
+        self.lastStats = {}
+        self.tickCounters = dict.fromkeys(COUNTERS, 0)
+        self.clock = time.perf_counter
+
+    def measure(self, phase: str, function):
+        """ calls function and adds its duration to the phase """
+        startTime = self.clock()
+        result = function()
+        self.add(phase, self.clock() - startTime)
+        return result
+
+    def add(self, phase: str, seconds: float):
+        self.samples[phase].append(seconds)
+        self.totals[phase] += seconds
+        self.calls[phase] += 1
+
+    def end_tick(self, stats):
+        """ counters of the tick are found from screen stats """
+        lastStats = self.lastStats
+        self.tickCounters = {name: stats[name] - lastStats.get(name, 0) for name in COUNTERS}
+        self.lastStats = {name: stats[name] for name in COUNTERS}
+
+    def percentiles(self, phase: str) -> dict:
+        """ :return: PERCENTILES of the last samples of the phase in seconds, nearest rank """
+        samples = sorted(self.samples[phase])
+        if not samples:
+            return {percent: 0.0 for percent in PERCENTILES}
+        return {percent: samples[min(len(samples) - 1, len(samples) * percent // 100)] for percent in PERCENTILES}
+
+    def report(self, stats=None) -> dict:
+        """ :return: dict of phases with calls, total, mean, percentiles and max of the last samples in seconds,
+        counters of the last tick and screen stats if given """
+        phases = {}
+        for phase in PHASES:
+            calls = self.calls[phase]
+            phases[phase] = dict(calls=calls, total=self.totals[phase],
+                                 mean=self.totals[phase] / calls if calls else 0.0,
+                                 max=max(self.samples[phase], default=0.0),
+                                 **{f'p{percent}': value for percent, value in self.percentiles(phase).items()})
+        report = {'phases': phases, 'tickCounters': dict(self.tickCounters)}
+        if stats is not None:
+            report['stats'] = dict(stats)
+        return report
+
+    def hud_lines(self) -> list:
+        lines = ['phase        ' + ''.join(f'p{percent:<6}' for percent in PERCENTILES) + 'ms']
+        for phase in PHASES:
+            if self.samples[phase]:
+                lines.append(f'{phase:12} ' + ''.join(f'{value * 1000:<7.2f}'
+                                                      for value in self.percentiles(phase).values()))
+        counters = self.tickCounters
+        lines.append(f"tests {counters['blockPairTests']}/{counters['ballPairTests']} "
+                     f"contacts {counters['blockCollisions']}/{counters['ballCollisions']} "
+                     f"die {counters['dieCalls']} resets {counters['ballsReset'] + counters['ballsReturned']}")
+        return lines
+
+    def dump(self, fileName: str, stats=None):
+        with open(fileName, 'w') as reportFile:
+            json.dump(self.report(stats), reportFile, indent=1)
+
+
+class NoProfiler:
+    """ profiler of screen which has none started: phases are called, nothing is measured """
+    isHudShown = False
+
+    def measure(self, phase: str, function):
+        return function()
+
+    def end_tick(self, stats):
+        pass
+
+
+NO_PROFILER = NoProfiler()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# registry of screen items keyed by their objectId: add, remove and membership check take O(1) time
+
+
+class ItemRegistry:
+    """ items in dense list and their places in it by objectId
+    removed item place is taken by the last item like ball store slots do, so the items order is not kept
+    while changes are deferred (during a tick) added and removed items are queued and the list is not changed,
+    loops over items are safe; commit applies the queued changes
+    items - the list itself, it is never replaced, so it can be shared as Screen mobile_objects or static_objects
+    len is the number of items after commit of queued changes """
+
+    def __init__(self):
+        self.items = []
+        self.places = {}
+        self.addQueue = {}
+        self.removeQueue = {}
+        self.isDeferred = False
+
+    def __len__(self) -> int:
+        return len(self.items) - len(self.removeQueue) + len(self.addQueue)
+
+    def __contains__(self, item) -> bool:
+        objectId = item.objectId
+        if objectId in self.addQueue:
+            return True
+        return objectId in self.places and objectId not in self.removeQueue
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def get(self, objectId: int):
+        """ :return: item with objectId or None, queued changes are taken into account """
+        item = self.addQueue.get(objectId)
+        if item is None and objectId in self.places and objectId not in self.removeQueue:
+            item = self.items[self.places[objectId]]
+        return item
+
+    def add(self, item) -> bool:
+        """ :return: True if item is added or queued to be added, False if it is registered already """
+        objectId = item.objectId
+        if objectId in self.removeQueue:
+            del self.removeQueue[objectId]  # it is not removed yet, so it stays where it is
+            return True
+        if objectId in self.places or objectId in self.addQueue:
+            return False
+        if self.isDeferred:
+            self.addQueue[objectId] = item
+        else:
+            self.places[objectId] = len(self.items)
+            self.items.append(item)
+        return True
+
+    def add_many(self, items):
+        """ new items are added at once when nothing is queued, it is several times faster than one by one """
+        items = list(items)
+        if not self.isDeferred and not self.removeQueue and not self.addQueue:
+            first = len(self.items)
+            places = dict(zip([item.objectId for item in items], range(first, first + len(items))))
+            if len(places) == len(items) and self.places.keys().isdisjoint(places):
+                self.places.update(places)
+                self.items.extend(items)
+                return
+        for item in items:
+            self.add(item)
+
+    def remove(self, item) -> bool:
+        """ :return: True if item is removed or queued to be removed, False if it is not registered """
+        objectId = item.objectId
+        if objectId in self.addQueue:
+            del self.addQueue[objectId]
+            return True
+        if objectId not in self.places or objectId in self.removeQueue:
+            return False
+        if self.isDeferred:
+            self.removeQueue[objectId] = item
+        else:
+            self.swap_remove(objectId)
+        return True
+
+    def swap_remove(self, objectId: int):
+        place = self.places.pop(objectId)
+        last = self.items.pop()
+        if place < len(self.items):
+            self.items[place] = last
+            self.places[last.objectId] = place
+
+    def defer(self):
+        """ changes are queued from now till commit """
+        self.isDeferred = True
+
+    def commit(self) -> list:
+        """ applies queued changes, removals first, and stops deferring
+        :return: removed items """
+        self.isDeferred = False
+        removed = list(self.removeQueue.values())
+        for objectId in self.removeQueue:
+            self.swap_remove(objectId)
+        added = list(self.addQueue.values())
+        self.removeQueue = {}
+        self.addQueue = {}
+        for item in added:
+            self.add(item)
+        return removed
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+# scene files loader: CSV is validated once and compiled to binary table of float64 rows,
+# the table is kept in cache directory under the key of file contents hash and read back by chunks,
+# truncated or corrupt cached table is compiled again
+#
+# compiled file layout, little endian:
+#     header: magic, cache version, rows number
+#     rows: SCENE_COLUMNS float64 values for every row of the scene file, file order
+
+import csv
+import hashlib
+import os
+import struct
+import sys
+from array import array
+
+SCENE_COLUMNS = ('ID', 'TYPE', 'LEFT', 'BOTTOM', 'RIGHT', 'TOP', 'COLOR', 'THICKNESS', 'LIVES')
+INTEGER_COLUMNS = ('ID', 'TYPE', 'COLOR', 'THICKNESS', 'LIVES')
+CACHE_VERSION = 1  # change it when compiled format or validation is changed to invalidate cached scenes
+MAGIC = b'SCENE\0\0\0'
+HEADER = struct.Struct('<8sIQ')
+CHUNK_ROWS = 4096
+HASH_BLOCK = 1024 * 1024
+ROW_ITEM_SIZE = array('d').itemsize
+
+
+class SceneError(ValueError):
+    pass
+
+
+def scene_key(fileName: str) -> str:
+    """ hash of the scene file contents, the file is read by blocks """
+    fileHash = hashlib.sha1(str(CACHE_VERSION).encode())
+    with open(fileName, 'rb') as sceneFile:
+        for block in iter(lambda: sceneFile.read(HASH_BLOCK), b''):
+            fileHash.update(block)
+    return fileHash.hexdigest()
+
+
+def parse_row(row: list, columns: list, fileName: str, lineNum: int) -> tuple:
+    try:
+        values = [float(row[column]) for column in columns]
+    except (ValueError, IndexError):
+        raise SceneError(f'{fileName}:{lineNum}: {SCENE_COLUMNS} numbers are expected, got {row}') from None
+    objId, objType, left, bottom, right, top, colorId, thickness, lives = values
+    for name, value in zip(SCENE_COLUMNS, values):
+        if name in INTEGER_COLUMNS and not value.is_integer():
+            raise SceneError(f'{fileName}:{lineNum}: {name} must be integer, got {value}')
+    if not 0 <= left <= right <= 1 or not 0 <= bottom <= top <= 1:
+        raise SceneError(f'{fileName}:{lineNum}: block is out of screen: {left} {bottom} {right} {top}')
+    return values
+
+
+def parse_scene(fileName: str, chunkRows: int = CHUNK_ROWS):
+    """ generates float64 arrays of up to chunkRows validated rows of CSV scene file, SCENE_COLUMNS order """
+    with open(fileName, 'r', newline='') as sceneFile:
+        rowReader = csv.reader(sceneFile, delimiter=';')
+        header = next(rowReader, [])
+        missing = [name for name in SCENE_COLUMNS if name not in header]
+        if missing:
+            raise SceneError(f'{fileName}: columns {missing} are missing')
+        columns = [header.index(name) for name in SCENE_COLUMNS]
+        chunk = array('d')
+        for row in rowReader:
+            if not row:
+                continue
+            chunk.extend(parse_row(row, columns, fileName, rowReader.line_num))
+            if len(chunk) >= chunkRows * len(SCENE_COLUMNS):
+                yield chunk
+                chunk = array('d')
+        if chunk:
+            yield chunk
+
+
+def check_compiled(compiledFile, fileName: str) -> int:
+    """ reads header of open compiled scene file and checks the file size, truncated or corrupt file raises
+    SceneError before any row is read
+    :return: number of rows """
+    try:
+        magic, version, rowsNum = HEADER.unpack(compiledFile.read(HEADER.size))
+    except struct.error:
+        raise SceneError(f'{fileName} is truncated') from None
+    if magic != MAGIC or version != CACHE_VERSION:
+        raise SceneError(f'{fileName} is not a compiled scene of version {CACHE_VERSION}')
+    if os.fstat(compiledFile.fileno()).st_size != HEADER.size + rowsNum * len(SCENE_COLUMNS) * ROW_ITEM_SIZE:
+        raise SceneError(f'{fileName} size does not match its {rowsNum} rows')
+    return rowsNum
+
+
+def read_compiled(fileName: str, chunkRows: int = CHUNK_ROWS):
+    """ generates float64 arrays of up to chunkRows rows of compiled scene file """
+    with open(fileName, 'rb') as compiledFile:
+        rowsNum = check_compiled(compiledFile, fileName)
+        while rowsNum > 0:
+            chunk = array('d')
+            try:
+                chunk.fromfile(compiledFile, min(rowsNum, chunkRows) * len(SCENE_COLUMNS))
+            except EOFError:
+                raise SceneError(f'{fileName} is truncated') from None
+            if sys.byteorder == 'big':
+                chunk.byteswap()
+            rowsNum -= chunkRows
+            yield chunk
+
+
+def compile_scene(fileName: str, compiledName: str, chunkRows: int = CHUNK_ROWS):
+    """ generates chunks of parse_scene and writes them to compiled file at the same time
+    the file appears under compiledName only when the whole scene is valid and written """
+    tempName = f'{compiledName}.{os.getpid()}.tmp'
+    rowsNum = 0
+    try:
+        with open(tempName, 'wb') as compiledFile:
+            compiledFile.write(HEADER.pack(MAGIC, CACHE_VERSION, rowsNum))
+            for chunk in parse_scene(fileName, chunkRows):
+                rowsNum += len(chunk) // len(SCENE_COLUMNS)
+                if sys.byteorder == 'big':
+                    swapped = array('d', chunk)
+                    swapped.byteswap()
+                    swapped.tofile(compiledFile)
+                else:
+                    chunk.tofile(compiledFile)
+                yield chunk
+            compiledFile.seek(0)
+            compiledFile.write(HEADER.pack(MAGIC, CACHE_VERSION, rowsNum))
+        os.replace(tempName, compiledName)
+    finally:
+        if os.path.exists(tempName):
+            os.remove(tempName)
+
+
+def scene_chunks(fileName: str, cacheDir: str = None, chunkRows: int = CHUNK_ROWS):
+    """
+    generates float64 arrays of up to chunkRows scene rows, SCENE_COLUMNS order
+    cacheDir - if given, compiled scene is kept in this directory and used while the scene file is the same
+    """
+    if not cacheDir:
+        yield from parse_scene(fileName, chunkRows)
+        return
+    compiledName = os.path.join(cacheDir, f'scene_{scene_key(fileName)}.bin')
+    if os.path.exists(compiledName):
+        try:
+            with open(compiledName, 'rb') as compiledFile:
+                check_compiled(compiledFile, compiledName)
+        except SceneError as error:
+            print(f'scene cache is rebuilt: {error}')
+        else:
+            yield from read_compiled(compiledName, chunkRows)
+            return
+    os.makedirs(cacheDir, exist_ok=True)
+    yield from compile_scene(fileName, compiledName, chunkRows)
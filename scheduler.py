@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+# fixed timestep loop: physics ticks with constant rate, frames are drawn with their own limited rate
+
+import time
+
+TICK_RATE = 1 / 0.06  # ticks per second, the same speed the simulation had with 0.06 s sleep per frame
+FRAME_RATE = 60
+MAX_STEPS_PER_FRAME = 5
+
+
+class FixedStepScheduler:
+    """ calls step() tickRate times per second of real time whatever drawing costs
+    and render() after steps of each frame, not more often than frameRate times per second,
+    frame is not drawn if no step was done since the previous one
+    if steps are late, several of them are done before the next frame, but not more than maxStepsPerFrame:
+    the rest of the delay is dropped (spiral of death guard) and simulation slows down instead
+    clock and sleep are replaceable for tests"""
+
+    def __init__(self, step, render, tickRate: float = TICK_RATE, frameRate: float = FRAME_RATE,
+                 maxStepsPerFrame: int = MAX_STEPS_PER_FRAME, clock=time.perf_counter, sleep=time.sleep):
+        self.step = step
+        self.render = render
+        self.tickPeriod = 1 / tickRate
+        self.framePeriod = 1 / frameRate if frameRate else 0
+        self.maxStepsPerFrame = maxStepsPerFrame
+        self.clock = clock
+        self.sleep = sleep
+        self.lag = 0.0
+        self.lastTime = None
+        self.ticks = 0
+        self.frames = 0
+        self.droppedTime = 0.0
+
+    def run_frame(self):
+        """ does steps for the time passed since previous frame, draws the frame, sleeps till the next one
+        :return: number of steps done """
+        frameStart = self.clock()
+        if self.lastTime is None:
+            self.lastTime = frameStart - self.tickPeriod
+        self.lag += frameStart - self.lastTime
+        self.lastTime = frameStart
+        steps = 0
+        while self.lag >= self.tickPeriod and steps < self.maxStepsPerFrame:
+            self.step()
+            self.lag -= self.tickPeriod
+            steps += 1
+        if self.lag >= self.tickPeriod:
+            self.droppedTime += self.lag
+            self.lag = 0.0
+        self.ticks += steps
+        if steps:
+            self.render()
+            self.frames += 1
+        # next frame is worth to be drawn after the next tick, but not earlier than frame rate allows
+        timeLeft = max(self.framePeriod, self.tickPeriod - self.lag) - (self.clock() - frameStart)
+        if timeLeft > 0:
+            self.sleep(timeLeft)
+        return steps
+
+    def run(self, isFinished, maxTicks: int = 0):
+        """ runs frames while isFinished() returns False and maxTicks are not done, 0 - no ticks limit """
+        while not isFinished():
+            self.run_frame()
+            if maxTicks and self.ticks >= maxTicks:
+                break
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+#
+# display backends for Screen: simple_draw window or headless (no output at all)
+#
+# pip install simple_draw
+# pip install pywin32  (optional, windows only - used to limit window by screen size)
+
+import time
+
+import pygame
+import simple_draw as sd
+
+try:
+    from win32api import GetSystemMetrics
+except ImportError:
+    GetSystemMetrics = None
+
+NO_MOUSE_BUTTONS = (0, 0, 0)
+TEXT_SIZE = 20
+TEXT_MARGIN = 8
+TEXT_COLOR = (255, 255, 255)
+TEXT_BACKGROUND = (0, 0, 0)
+
+# window backends draw to the surface of simple_draw directly and set its background image, simple_draw has no
+# public interface for it - its private names below are used only by the functions of this section,
+# they are checked with simple_draw 2.9.0 (see requirements.txt)
+SD_INTERNALS = ('_init', '_screen', '_background_image', '_auto_flip')
+SD_CHECKED_VERSION = '2.9.0'
+
+
+class SimpleDrawError(Exception):
+    pass
+
+
+def check_simple_draw():
+    """ fails at once if simple_draw is not the one the window backends were checked with """
+    missing = [name for name in SD_INTERNALS if not hasattr(sd, name)]
+    if missing:
+        raise SimpleDrawError(f'simple_draw has no {", ".join(missing)}, '
+                              f'window backends are checked with simple_draw {SD_CHECKED_VERSION}')
+
+
+def sd_surface():
+    """ :return: pygame surface of simple_draw window, the window is opened if it is not yet """
+    sd._init()
+    return sd._screen
+
+
+def sd_background_image():
+    return sd._background_image
+
+
+def sd_set_background_image(surface):
+    sd._background_image = surface
+
+
+def sd_set_auto_flip(autoFlip: bool) -> bool:
+    """ simple_draw shows the window after every primitive if auto flip is on
+    :return: previous value """
+    previous, sd._auto_flip = sd._auto_flip, autoFlip
+    return previous
+
+
+class DrawList:
+    """ primitives of one frame grouped by color and width, drawn to pygame surface in one pass
+    coordinates are screen ones - y axis goes down; all rectangles are drawn under all circles """
+
+    def __init__(self):
+        self.rectangles = {}
+        self.circles = {}
+
+    def add_rectangle(self, rect, color, width: int):
+        self.rectangles.setdefault((color, width), []).append(rect)
+
+    def add_circle(self, x: int, y: int, radius: int, color, width: int):
+        self.circles.setdefault((color, width), []).append((x, y, radius))
+
+    def flush(self, surface):
+        """ draws and forgets all primitives
+        :return: list of changed areas """
+        changed = []
+        addChanged = changed.append
+        drawRect = pygame.draw.rect
+        for (color, width), rects in self.rectangles.items():
+            for rect in rects:
+                addChanged(drawRect(surface, color, rect, width))
+        drawCircle = pygame.draw.circle
+        for (color, width), circles in self.circles.items():
+            for x, y, radius in circles:
+                addChanged(drawCircle(surface, color, (x, y), radius, width))
+        self.rectangles = {}
+        self.circles = {}
+        return changed
+
+
+def screen_rect(leftBottom, rightTop):
+    """ pygame rectangle in screen coordinates for rectangle in simple_draw coordinates """
+    height = sd.resolution[1]
+    return pygame.Rect(int(leftBottom[0]), height - int(rightTop[1]),
+                       int(rightTop[0]) - int(leftBottom[0]), int(rightTop[1]) - int(leftBottom[1]))
+
+
+class HeadlessBackend:
+    """ no-op display: nothing is drawn, no window is opened, no pause between ticks
+    used for batch runs, benchmarks and machines without display"""
+    isRendering = False
+    frameDelay = 0
+
+    def get_screen_size(self):
+        """ :return: (width, height) of physical screen or None if unlimited """
+        return None
+
+    def setup(self, x_resolution: int, y_resolution: int):
+        pass
+
+    def set_background(self, surface):
+        """ surface - pygame surface of window size restored under the items every frame """
+        pass
+
+    def start_frame(self):
+        pass
+
+    def start_static_layer(self) -> bool:
+        """ :return: True if static items must be drawn now, they are drawn before finish_static_layer """
+        return False
+
+    def finish_static_layer(self):
+        pass
+
+    def invalidate_static_layer(self):
+        """ static item is added, removed or changed - static items must be drawn again """
+        pass
+
+    def finish_frame(self):
+        pass
+
+    def restore_background(self):
+        pass
+
+    def draw_circle(self, center, radius: int, color, width: int):
+        pass
+
+    def draw_rectangle(self, leftBottom, rightTop, color, width: int):
+        pass
+
+    def draw_snowflake(self, center, length: int):
+        pass
+
+    def draw_text(self, lines: list):
+        """ lines are shown over all items of the frame in the top left corner """
+        pass
+
+    def sleep(self, seconds: float):
+        pass
+
+    def get_mouse_state(self):
+        """ :return: cursor position [x, y] and pressed buttons (left, middle, right)"""
+        return [0, 0], NO_MOUSE_BUTTONS
+
+    def user_want_exit(self) -> bool:
+        return False
+
+    def quit(self):
+        pass
+
+
+class SdBackend(HeadlessBackend):
+    """ draws screen items in simple_draw window
+    frameDelay - pause after each frame in seconds, 0 - uncapped tick rate"""
+    isRendering = True
+
+    def __init__(self, frameDelay: float = 0.06):
+        self.frameDelay = frameDelay
+        self.drawList = DrawList()
+        self.textLines = []
+        self.font = None
+
+    def get_screen_size(self):
+        if GetSystemMetrics is None:
+            return None
+        return GetSystemMetrics(0), GetSystemMetrics(1)
+
+    def setup(self, x_resolution: int, y_resolution: int):
+        check_simple_draw()
+        sd.resolution = (x_resolution, y_resolution)
+        sd.take_background()
+
+    def set_background(self, surface):
+        # simple_draw can take background only from screen snapshot saved to file, so ready image is set directly
+        sd_set_background_image(surface)
+        sd.draw_background()
+
+    def start_frame(self):
+        sd.start_drawing()  # removes  blinking
+
+    def start_static_layer(self) -> bool:
+        return True
+
+    def finish_frame(self):
+        surface = sd_surface()
+        self.drawList.flush(surface)
+        self.flush_text(surface)
+        sd.finish_drawing()  # removes  blinking
+
+    def restore_background(self):
+        sd.draw_background()
+
+    def draw_circle(self, center, radius: int, color, width: int):
+        self.drawList.add_circle(int(center[0]), sd.resolution[1] - int(center[1]), radius, color, width)
+
+    def draw_rectangle(self, leftBottom, rightTop, color, width: int):
+        self.drawList.add_rectangle(screen_rect(leftBottom, rightTop), color, width)
+
+    def draw_snowflake(self, center, length: int):
+        sd.snowflake(sd.get_point(*center), length)
+
+    def draw_text(self, lines: list):
+        self.textLines = lines
+
+    def flush_text(self, surface):
+        """ draws and forgets text lines
+        :return: list of changed areas """
+        if not self.textLines:
+            return []
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, TEXT_SIZE)  # default font of pygame is always found
+        changed = []
+        top = TEXT_MARGIN
+        for line in self.textLines:
+            image = self.font.render(line, True, TEXT_COLOR, TEXT_BACKGROUND)
+            changed.append(surface.blit(image, (TEXT_MARGIN, top)))
+            top += image.get_height()
+        self.textLines = []
+        return changed
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def get_mouse_state(self):
+        return sd.get_mouse_state()
+
+    def user_want_exit(self) -> bool:
+        return sd.user_want_exit()
+
+    def quit(self):
+        sd.quit()
+
+
+class DirtyRectBackend(SdBackend):
+    """ updates only changed parts of the window
+    static items are drawn once into static layer - copy of background, and drawn again only when
+    one of them is changed; every frame only areas of balls and snowflakes of previous and current frames
+    are restored from static layer and shown"""
+
+    def __init__(self, frameDelay: float = 0.06):
+        super().__init__(frameDelay)
+        self.background = None
+        self.staticLayer = None
+        self.isStaticLayerValid = False
+        self.staticRectangles = []
+        self.previousRects = []
+        self.currentRects = []
+        self.snowflakes = []
+
+    def set_background(self, surface):
+        super().set_background(surface)
+        self.invalidate_static_layer()
+
+    def invalidate_static_layer(self):
+        self.isStaticLayerValid = False
+
+    def start_static_layer(self) -> bool:
+        # snowflakes drawn after the previous frame must be under static items as in full redraw
+        if self.isStaticLayerValid and not self.snowflakes:
+            return False
+        self.staticRectangles = []
+        return True
+
+    def finish_static_layer(self):
+        screen = sd_surface()
+        if not self.isStaticLayerValid:
+            self.background = sd_background_image()
+            if self.background is None:
+                self.background = pygame.Surface(screen.get_size())
+                self.background.fill(sd.background_color)
+            self.staticLayer = self.background.copy()
+            for rect, color, width in self.staticRectangles:
+                pygame.draw.rect(self.staticLayer, color, rect, width)
+            self.isStaticLayerValid = True
+            screen.blit(self.background, (0, 0))
+            self.currentRects.append(screen.get_rect())
+            snowflakes, self.snowflakes = self.snowflakes, []
+            for center, length in snowflakes:
+                self.draw_snowflake(center, length)
+        for rect, color, width in self.staticRectangles:
+            pygame.draw.rect(screen, color, rect, width)
+
+    def add_rect(self, left: int, top: int, width: int, height: int):
+        rect = pygame.Rect(left, top, width, height).clip(sd_surface().get_rect())
+        if rect.width and rect.height:
+            self.currentRects.append(rect)
+
+    def draw_rectangle(self, leftBottom, rightTop, color, width: int):
+        """ rectangles are static items - they are drawn in finish_static_layer """
+        self.staticRectangles.append((screen_rect(leftBottom, rightTop), color, width))
+
+    def draw_snowflake(self, center, length: int):
+        # snowflake is drawn without flip and is shown by the next frame update
+        self.snowflakes.append((center, length))
+        autoFlip = sd_set_auto_flip(False)
+        sd.snowflake(sd.get_point(*center), length)
+        sd_set_auto_flip(autoFlip)
+        x, y = int(center[0]), sd.resolution[1] - int(center[1])
+        self.add_rect(x - length - 2, y - length - 2, 2 * length + 5, 2 * length + 5)
+
+    def finish_frame(self):
+        surface = sd_surface()
+        self.currentRects.extend(self.drawList.flush(surface))
+        self.currentRects.extend(self.flush_text(surface))
+        pygame.display.update(self.previousRects + self.currentRects)
+
+    def restore_background(self):
+        """ erases items of the frame, the window is updated in these areas with the next frame """
+        if self.staticLayer is not None:
+            screen = sd_surface()
+            for rect in self.currentRects:
+                screen.blit(self.staticLayer, rect, rect)
+        self.previousRects = self.currentRects
+        self.currentRects = []
+        self.snowflakes = []
+
+
+MOUSE_LOG_HEADER = '# mouse log 1'
+
+
+class MouseRecorder:
+    """ wraps any backend and writes its mouse states to the log file to replay the run later
+    the state is asked once per tick, only ticks when it is changed are written:
+        tick x y left middle right
+    the last line is 'end ticks'; seed of the screen is kept in the header to repeat the run"""
+
+    def __init__(self, backend, fileName: str, seed=None):
+        self.backend = backend
+        self.logFile = open(fileName, 'w')
+        self.logFile.write(f'{MOUSE_LOG_HEADER} seed {seed}\n')
+        self.ticks = 0
+        self.lastState = None
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def get_mouse_state(self):
+        position, buttons = self.backend.get_mouse_state()
+        state = (int(position[0]), int(position[1]), *(int(bool(button)) for button in buttons))
+        if state != self.lastState:
+            self.logFile.write(' '.join(map(str, (self.ticks, *state))) + '\n')
+            self.lastState = state
+        self.ticks += 1
+        return position, buttons
+
+    def quit(self):
+        self.logFile.write(f'end {self.ticks}\n')
+        self.logFile.close()
+        self.backend.quit()
+
+
+def read_mouse_log(fileName: str):
+    """ :return: seed or None, ticks number, dict tick: ([x, y], (left, middle, right)) """
+    states = {}
+    with open(fileName) as logFile:
+        header = logFile.readline().split()
+        seed = None if header[-1] == 'None' else int(header[-1])
+        ticks = None
+        for line in logFile:
+            values = line.split()
+            if values[0] == 'end':
+                ticks = int(values[1])
+                continue
+            tick, x, y, *buttons = map(int, values)
+            states[tick] = ([x, y], tuple(buttons))
+    if ticks is None:
+        ticks = max(states, default=-1) + 1  # recording was interrupted
+    return seed, ticks, states
+
+
+class ReplayBackend(HeadlessBackend):
+    """ headless backend giving mouse states recorded by MouseRecorder tick by tick
+    user wants to exit when all recorded ticks are done """
+
+    def __init__(self, fileName: str):
+        self.seed, self.ticksNum, self.states = read_mouse_log(fileName)
+        self.ticks = 0
+        self.state = [0, 0], NO_MOUSE_BUTTONS
+
+    def get_mouse_state(self):
+        self.state = self.states.get(self.ticks, self.state)
+        self.ticks += 1
+        return self.state
+
+    def user_want_exit(self) -> bool:
+        return self.ticks >= self.ticksNum
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# snapshot of the whole screen state in compact binary file: save it at any tick and go on from it later
+#
+# file layout, little endian:
+#     header: magic, format version, resolution, birth place, last object id, blocks, balls and contacts numbers
+#     random generator state, stats as json
+#     blocks table: BLOCK_FIELDS int64 values for every block, objectId order
+#     balls table: BALL_FIELDS int64 values for every ball, mobile_objects order
+#     contacts table: CONTACT_FIELDS int64 values for every contacting pair of contact cache, its order
+
+import gc
+import json
+import struct
+import sys
+from array import array
+from operator import attrgetter
+
+import ball_store as bs
+import bubbles
+import events as ev
+
+MAGIC = b'BUBBLES\0'
+VERSION = 2
+HEADER = struct.Struct('<8sI2i4iq3I')
+RANDOM_HEADER = struct.Struct('<iI?d')  # generator version, state length, has gauss_next, gauss_next
+STATS_HEADER = struct.Struct('<I')
+BLOCK_FIELDS = ('objectId', 'objectType', 'xPosition', 'yPosition', 'xRelation', 'yRelation', 'xDimension',
+                'yDimension', 'red', 'green', 'blue', 'width', 'isRemovable', 'tillRemove')
+BALL_FIELDS = ('objectId', 'objectType', 'xPosition', 'yPosition', 'radius', 'speedValue', 'speedDirection',
+               'tillRemove', 'isRemovable', 'red', 'green', 'blue', 'width')
+CONTACT_FIELDS = ('firstId', 'secondId', 'ticks')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def block_row(block) -> tuple:
+    return (block.objectId, block.objectType, block.xPosition, block.yPosition, block.xRelation, block.yRelation,
+            block.xDimension, block.yDimension, *block.color, block.width, block.isRemovable, block.tillRemove)
+
+
+def ball_row(ball) -> tuple:
+    return (ball.objectId, ball.objectType, ball.xPosition, ball.yPosition, ball.xRelation, ball.speedValue,
+            ball.speedDirection, ball.tillRemove, ball.isRemovable, *ball.color, ball.width)
+
+
+def table_bytes(rows) -> bytes:
+    table = array('q')
+    for row in rows:
+        table.extend(row)
+    if sys.byteorder == 'big':
+        table.byteswap()
+    return table.tobytes()
+
+
+def read_table(snapshotFile, rowsNum: int, fieldsNum: int):
+    """ :return: flat sequence of int64 table values, the file data is not copied on little endian machines """
+    itemSize = array('q').itemsize
+    data = snapshotFile.read(rowsNum * fieldsNum * itemSize)
+    if len(data) != rowsNum * fieldsNum * itemSize:
+        raise SnapshotError('snapshot file is truncated')
+    if sys.byteorder == 'little':
+        return memoryview(data).cast('q')
+    table = array('q', data)
+    table.byteswap()
+    return table
+
+
+def save_snapshot(screen, fileName: str):
+    """ writes state of the screen, its items and random generator to the file """
+    (x0, y0), (x1, y1) = screen.get_birth_place()
+    randomVersion, randomState, gaussNext = screen.random.getstate()
+    stats = json.dumps(dict(screen.stats)).encode()
+    with open(fileName, 'wb') as snapshotFile:
+        snapshotFile.write(HEADER.pack(MAGIC, VERSION, screen.x_resolution, screen.y_resolution, x0, y0, x1, y1,
+                                       screen.lastObjectId, len(screen.static_objects), len(screen.mobile_objects),
+                                       len(screen.contacts)))
+        snapshotFile.write(RANDOM_HEADER.pack(randomVersion, len(randomState), gaussNext is not None,
+                                              gaussNext or 0.0))
+        snapshotFile.write(table_bytes([randomState]))
+        snapshotFile.write(STATS_HEADER.pack(len(stats)) + stats)
+        # blocks were added to the screen in objectId order, it is the order of block index candidates
+        snapshotFile.write(table_bytes(map(block_row, sorted(screen.static_objects, key=attrgetter('objectId')))))
+        snapshotFile.write(table_bytes(map(ball_row, screen.mobile_objects)))
+        snapshotFile.write(table_bytes((*pair, ticks) for pair, ticks in screen.contacts.pairs.items()))
+    screen.events.emit(ev.SnapshotExported(fileName, screen.stats['ticks']))
+
+
+def load_snapshot(fileName: str, **screenOptions):
+    """ creates screen with the state saved in the file
+    screenOptions - Screen arguments except resolution and seed: backend, broadPhase, useArrays ...
+    objects are restored without their init methods, so no random numbers are spent and nothing is printed
+    :return: Screen """
+    with open(fileName, 'rb') as snapshotFile:
+        header = snapshotFile.read(HEADER.size)
+        if len(header) != HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise SnapshotError(f'{fileName} is not a snapshot file')
+        (magic, version, x_size, y_size, x0, y0, x1, y1, lastObjectId, blocksNum, ballsNum,
+         contactsNum) = HEADER.unpack(header)
+        if version != VERSION:
+            raise SnapshotError(f'snapshot version {version} is not supported, expected {VERSION}')
+        randomVersion, stateLength, hasGauss, gaussNext = RANDOM_HEADER.unpack(snapshotFile.read(RANDOM_HEADER.size))
+        randomState = tuple(read_table(snapshotFile, 1, stateLength))
+        statsLength, = STATS_HEADER.unpack(snapshotFile.read(STATS_HEADER.size))
+        stats = json.loads(snapshotFile.read(statsLength))
+        blocks = read_table(snapshotFile, blocksNum, len(BLOCK_FIELDS))
+        balls = read_table(snapshotFile, ballsNum, len(BALL_FIELDS))
+        contacts = read_table(snapshotFile, contactsNum, len(CONTACT_FIELDS))
+    screen = bubbles.Screen(x_size=x_size, y_size=y_size, **screenOptions)
+    if screen.get_resolution() != (x_size, y_size):
+        raise SnapshotError(f'screen {screen.get_resolution()} is smaller than snapshot one {(x_size, y_size)}')
+    isGcEnabled = gc.isenabled()
+    gc.disable()  # many new objects make garbage collector run again and again, but they are not garbage
+    try:
+        restore_items(screen, blocks, balls)
+    finally:
+        if isGcEnabled:
+            gc.enable()
+    screen.contacts.restore(zip(*[iter(contacts)] * len(CONTACT_FIELDS)))
+    screen.random.setstate((randomVersion, randomState, gaussNext if hasGauss else None))
+    screen.stats.update(stats)
+    screen.set_birth_place([x0, y0], [x1, y1])
+    screen.lastObjectId = lastObjectId
+    return screen
+
+
+def restore_items(screen, blocks, balls):
+    screen.add_stationary_items([restore_block(screen, row) for row in zip(*[iter(blocks)] * len(BLOCK_FIELDS))])
+    if screen.ballStore is not None:
+        restore_array_balls(screen, balls)
+    else:
+        screen.add_mobile_items([restore_ball(screen, row) for row in zip(*[iter(balls)] * len(BALL_FIELDS))])
+
+
+def restore_block(screen, row):
+    block = bubbles.Block.__new__(bubbles.Block)
+    (block.objectId, block.objectType, block.xPosition, block.yPosition, block.xRelation, block.yRelation,
+     block.xDimension, block.yDimension, red, green, blue, block.width, isRemovable, block.tillRemove) = row
+    block.parent = screen
+    block.color = (red, green, blue)
+    block.isRemovable = bool(isRemovable)
+    block.init_points()
+    return block
+
+
+def restore_ball(screen, row):
+    ball = bubbles.Ball.__new__(bubbles.Ball)
+    (ball.objectId, ball.objectType, ball.xPosition, ball.yPosition, radius, ball.speedValue, ball.speedDirection,
+     ball.tillRemove, isRemovable, red, green, blue, ball.width) = row
+    ball.parent = screen
+    ball.xRelation = ball.yRelation = radius
+    ball.xDimension = ball.yDimension = 2 * radius
+    ball.color = (red, green, blue)
+    ball.isRemovable = bool(isRemovable)
+    return ball
+
+
+def restore_array_balls(screen, table):
+    """ balls of array mode: store arrays are filled from table columns at once, ball objects get only their
+    slot, objectId and type, all other fields are read from the store
+    the target of milliseconds for 100k balls is not met: they take about 0.1 s, objects mode takes 0.15 s,
+    nearly all of it is creation of 100k ball objects, mobile_objects list and registry need them """
+    columns = dict(zip(BALL_FIELDS, bs.np.frombuffer(table, dtype=bs.np.int64).reshape(-1, len(BALL_FIELDS)).T))
+    store = screen.ballStore
+    newBall = bubbles.ArrayBall.__new__
+    balls = [newBall(bubbles.ArrayBall) for ballsNum in range(len(columns['objectId']))]
+    fields = {name: columns[name] for name in ('radius', 'speedValue', 'speedDirection', 'tillRemove', 'red',
+                                                'green', 'blue', 'width', 'isRemovable')}
+    first = store.attach_many(balls, dict(fields, x=columns['xPosition'], y=columns['yPosition']))
+    for slot, ball, objectId, objectType in zip(range(first, first + len(balls)), balls,
+                                                columns['objectId'].tolist(), columns['objectType'].tolist()):
+        ball.parent = screen
+        ball.store = store
+        ball.slot = slot
+        ball.objectId = objectId
+        ball.objectType = objectType
+    screen.add_mobile_items(balls)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# continuous collision detection: time of impact of circles moving along straight line during one tick
+#
+# time of impact (toi) is a part of the tick movement 0..1 done when the circle touches an obstacle,
+# None if it does not touch the obstacle during the tick
+
+import math
+
+
+def circle_point_toi(center, move, radius, point):
+    """ circle moves from center by move vector, returns toi with the point
+    if the circle already covers the point toi is 0 when it moves closer to the point """
+    fx = center[0] - point[0]
+    fy = center[1] - point[1]
+    a = move[0] * move[0] + move[1] * move[1]
+    b = 2 * (fx * move[0] + fy * move[1])
+    c = fx * fx + fy * fy - radius * radius
+    if b >= 0:
+        return None  # moves away or does not move
+    if c <= 0:
+        return 0.0
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return None
+    toi = (-b - math.sqrt(discriminant)) / (2 * a)
+    return toi if toi <= 1 else None
+
+
+def circle_segment_toi(center, move, radius, linePoint1, linePoint2):
+    """ toi of moving circle with the segment linePoint1 - linePoint2 """
+    ex = linePoint2[0] - linePoint1[0]
+    ey = linePoint2[1] - linePoint1[1]
+    squareLength = ex * ex + ey * ey
+    result = None
+    if squareLength > 0:
+        length = math.sqrt(squareLength)
+        normalX, normalY = -ey / length, ex / length
+        distance = (center[0] - linePoint1[0]) * normalX + (center[1] - linePoint1[1]) * normalY
+        approach = move[0] * normalX + move[1] * normalY
+        side = radius if distance > 0 else -radius
+        if abs(distance) <= radius:
+            toi = 0.0 if distance * approach < 0 else None
+        elif distance * approach < 0:
+            toi = (side - distance) / approach
+            toi = toi if toi <= 1 else None
+        else:
+            toi = None
+        if toi is not None:
+            # circle touches the line inside the segment, not on its continuation
+            projection = ((center[0] + toi * move[0] - linePoint1[0]) * ex +
+                          (center[1] + toi * move[1] - linePoint1[1]) * ey) / squareLength
+            if 0 <= projection <= 1:
+                result = toi
+    for point in (linePoint1, linePoint2):
+        toi = circle_point_toi(center, move, radius, point)
+        if toi is not None and (result is None or toi < result):
+            result = toi
+    return result
+
+
+def circle_block_toi(center, move, radius, limits):
+    """ toi of moving circle with borders of rectangle given by limits [x1, y1], [x2, y2] """
+    (x1, y1), (x2, y2) = limits
+    vertexes = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+    result = None
+    for k in range(4):
+        toi = circle_segment_toi(center, move, radius, vertexes[k], vertexes[k - 1])
+        if toi is not None and (result is None or toi < result):
+            result = toi
+    return result
+
+
+def circle_circle_toi(center1, move1, radius1, center2, move2, radius2):
+    """ toi of two moving circles - circle with sum of radii moves relative to the point """
+    relativeCenter = (center1[0] - center2[0], center1[1] - center2[1])
+    relativeMove = (move1[0] - move2[0], move1[1] - move2[1])
+    return circle_point_toi(relativeCenter, relativeMove, radius1 + radius2, (0, 0))
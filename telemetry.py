@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+# continuous telemetry: balls state of every tick is written to files by background thread
+#
+# pip install numpy  (optional, for .npy format)
+
+import os
+import queue
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CSV = 'csv'
+NPY = 'npy'
+FORMATS = (CSV, NPY)
+FIELDS = ('tick', 'objectId', 'x', 'y', 'xRef', 'yRef', 'xSize', 'ySize', 'speedValue', 'speedDirection',
+          'wasContact')
+MAX_FILE_SIZE = 64 * 1024 * 1024
+QUEUE_SIZE = 16
+CLOSE_TIMEOUT = 10  # seconds close waits for the writer thread
+_STOP = None
+
+
+class TelemetryWriter:
+    """ writes batches of rows (one batch per tick) to files in the thread of its own
+    submit never waits: if writer is late and queue is full the batch is dropped and counted in droppedBatches
+    files are named prefix-0000.csv, prefix-0001.csv ... new file is started when the current one is bigger
+    than maxFileSize; npy file is a sequence of arrays saved one after another, see read_npy_chunks
+    write errors of any kind are printed once and stop writing, they never reach the simulation, the thread
+    keeps draining the queue after them so submit and close never wait for it"""
+
+    def __init__(self, directory: str = '.', prefix: str = 'telemetry', fileFormat: str = CSV,
+                 maxFileSize: int = MAX_FILE_SIZE, queueSize: int = QUEUE_SIZE):
+        if fileFormat not in FORMATS:
+            raise ValueError(f'unknown telemetry format {fileFormat}, expected one of {FORMATS}')
+        if fileFormat == NPY and np is None:
+            raise ImportError('numpy is required for npy telemetry: pip install numpy')
+        self.directory = directory
+        self.prefix = prefix
+        self.fileFormat = fileFormat
+        self.maxFileSize = maxFileSize
+        self.queue = queue.Queue(maxsize=queueSize)
+        self.fileNames = []
+        self.logFile = None
+        self.csvLine = ','.join(['%d'] * (len(FIELDS) - 1)) + '\n'  # all state fields are integer numbers
+        self.error = None
+        self.submittedBatches = 0
+        self.droppedBatches = 0
+        self.writtenRows = 0
+        self.thread = threading.Thread(target=self.write_batches, name='telemetry', daemon=True)
+        self.thread.start()
+
+    def submit(self, tick: int, rows):
+        """ rows - list of tuples or 2d numpy array with FIELDS columns except tick
+        rows must not be changed after submit, they are written later
+        :return: True if batch is queued """
+        try:
+            self.queue.put_nowait((tick, rows))
+        except queue.Full:
+            self.droppedBatches += 1
+            return False
+        self.submittedBatches += 1
+        return True
+
+    def close(self):
+        """ writes all queued batches and closes the file, it does not wait more than CLOSE_TIMEOUT seconds """
+        if self.thread.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=CLOSE_TIMEOUT)
+            except queue.Full:
+                print('telemetry writer does not answer, it is not closed')
+                return
+        self.thread.join(CLOSE_TIMEOUT)
+
+    def write_batches(self):
+        while True:
+            batch = self.queue.get()
+            if batch is _STOP:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self.write_batch(*batch)
+            except Exception as errorMessage:  # the thread must live to drain the queue till close
+                self.error = errorMessage
+                print(f'telemetry is stopped: {errorMessage!r}')
+        if self.logFile is not None:
+            try:
+                self.logFile.close()
+            except OSError as errorMessage:
+                self.error = self.error or errorMessage
+
+    def write_batch(self, tick: int, rows):
+        if self.logFile is None or self.logFile.tell() >= self.maxFileSize:
+            self.start_file()
+        if self.fileFormat == CSV:
+            # % formatting of whole batch is several times faster than csv writer
+            line = f'{tick},{self.csvLine}'
+            if np is not None and isinstance(rows, np.ndarray):
+                self.logFile.write((line * len(rows)) % tuple(rows.astype(np.int64).ravel().tolist()))
+            else:
+                self.logFile.write(''.join([line % row for row in rows]))
+        else:
+            table = np.empty((len(rows), len(FIELDS)), dtype=np.float64)
+            table[:, 0] = tick
+            if len(rows):
+                table[:, 1:] = rows
+            np.save(self.logFile, table)
+        self.writtenRows += len(rows)
+
+    def start_file(self):
+        if self.logFile is not None:
+            self.logFile.close()
+        fileName = os.path.join(self.directory, f'{self.prefix}-{len(self.fileNames):04}.{self.fileFormat}')
+        if self.fileFormat == CSV:
+            self.logFile = open(fileName, 'w', newline='')
+            self.logFile.write(','.join(FIELDS) + '\n')
+        else:
+            self.logFile = open(fileName, 'wb')
+        self.fileNames.append(fileName)
+        print(f'telemetry file {fileName} is started')
+
+
+def time_prefix(name: str = 'balls log') -> str:
+    """ file name prefix with local time the same way the old balls log was named """
+    logTimeTuple = time.localtime(time.time())
+    return f"{name} {logTimeTuple.tm_year}-{logTimeTuple.tm_mon:}-{logTimeTuple.tm_mday} {logTimeTuple.tm_hour}-" \
+           f"{logTimeTuple.tm_min}-{logTimeTuple.tm_sec}"
+
+
+def read_npy_chunks(fileName: str):
+    """ generates arrays of npy telemetry file one by one, each array is one tick with FIELDS columns """
+    with open(fileName, 'rb') as logFile:
+        size = os.fstat(logFile.fileno()).st_size
+        while logFile.tell() < size:
+            yield np.load(logFile)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# tests for parallel batch of headless simulations
+
+import json
+import os
+import tempfile
+import unittest
+
+import batch_runner as br
+
+
+class test_batch_runner(unittest.TestCase):
+    def test_jobs_of_parameter_sweep(self):
+        jobs = br.make_jobs(runs=2, ticks=10, seed=5, balls=(10, 20), blocks=(1,), scenes=['SCENE_01.csv'])
+        self.assertEqual([(job['balls'], job['scene'], job['seed']) for job in jobs],
+                         [(10, None, 5), (10, None, 6), (20, None, 5), (20, None, 6),
+                          (None, 'SCENE_01.csv', 5), (None, 'SCENE_01.csv', 6)])
+
+    def test_run_is_repeatable(self):
+        job = br.make_jobs(runs=1, ticks=100, seed=3, balls=(15,), blocks=(2,))[0]
+        first = br.run_simulation(job)
+        second = br.run_simulation(job)
+        for name in br.STATS:
+            self.assertEqual(first[name], second[name])
+        self.assertEqual(first['ticks'], 100)
+        self.assertGreater(first['blockCollisions'] + first['ballCollisions'], 0)
+
+    def test_parallel_results_are_the_same_as_serial(self):
+        jobs = br.make_jobs(runs=2, ticks=50, balls=(10,), blocks=(2,), scenes=['SCENE_02.csv'])
+        with tempfile.TemporaryDirectory() as tempDir:
+            resultFile = os.path.join(tempDir, 'results.json')
+            parallel = br.run_batch(jobs, workers=2, resultFile=resultFile)
+            with open(resultFile) as reportFile:
+                self.assertEqual(len(json.load(reportFile)['runs']), 4)
+        serial = br.run_batch(jobs, workers=1)
+        for parallelRun, serialRun in zip(parallel['runs'], serial['runs']):
+            self.assertEqual([parallelRun[name] for name in br.STATS], [serialRun[name] for name in br.STATS])
+        self.assertEqual([line['runs'] for line in parallel['summary']], [2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
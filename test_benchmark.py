@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+# tests for hot paths benchmarks
+
+import contextlib
+import io
+import tempfile
+import unittest
+
+import benchmark as bm
+import bubbles
+
+
+class test_benchmark(unittest.TestCase):
+    def test_every_case_runs(self):
+        report = bm.run_benchmarks(sizes=(5,), seed=2, repeat=1, minTime=0, verbose=False)
+        cases = {result['case'] for result in report['results']}
+        expected = {name for name, (setup, isSized, isNumpyRequired) in bm.CASES.items()
+                    if not isNumpyRequired or bm.tda.np is not None}
+        self.assertEqual(cases, expected)
+        for result in report['results']:
+            self.assertGreater(result['best'], 0)
+            self.assertEqual((result['number'], result['repeat']), (1, 1))
+
+    def test_results_are_compared(self):
+        report = bm.run_benchmarks(sizes=(5, 10), cases=['tda.vector_length', 'move'], repeat=2, minTime=0.001,
+                                   verbose=False)
+        self.assertEqual([(result['case'], result['size']) for result in report['results']][:2],
+                         [('move', 5), ('move', 10)])
+        self.assertEqual(report['results'][-1]['case'], 'tda.vector_length')
+        baseline = {'version': bm.RESULTS_VERSION,
+                    'results': [dict(result, best=result['best'] * 2) for result in report['results'][-2:]]}
+        comparison = bm.compare_results(baseline, report)
+        self.assertEqual(len(comparison), 2)
+        self.assertAlmostEqual(comparison[0][4], 0.5)
+        for version in (None, bm.RESULTS_VERSION - 1):
+            with self.subTest(version=version):
+                with self.assertRaisesRegex(bm.BenchmarkError, 'version'):
+                    bm.compare_results(dict(baseline, version=version), report)
+
+    def test_physics_case_times_the_same_ticks(self):
+        states = []
+        for run in range(2):
+            with tempfile.TemporaryDirectory() as workDir, contextlib.redirect_stdout(io.StringIO()):
+                function, reset = bm.physics_case('step')(20, 3, workDir)
+                for call in range(2):
+                    reset()
+                    function()
+                    window = function.windows[0]
+                    states.append((window.stats['ticks'], [(ball.objectId, ball.get_position(), ball.get_speed())
+                                                           for ball in window.mobile_objects]))
+        self.assertEqual(states[0][0], bm.PHYSICS_TICKS)
+        self.assertEqual(states, [states[0]] * 4)
+
+    def test_bench_subcommand(self):
+        args = bubbles.parserDefinition().parse_args(['bench', '--sizes', '10', '20', '--cases', 'tda.'])
+        self.assertEqual((args.mode, args.sizes, args.cases, args.seed), ('bench', [10, 20], ['tda.'], 1))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
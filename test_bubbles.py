@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+#
+# tests for screen simulation in headless mode
+
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import ball_store as bs
+import broad_phase as bp
+import bubbles
+import fractal_tree_draw as fd
+import narrow_phase as nph
+import profiler as pf
+import screen_backends as sb
+
+
+class test_headless_screen(unittest.TestCase):
+    def test_resolution_is_not_limited(self):
+        window = bubbles.Screen(x_size=3000, y_size=2000, backend=sb.HeadlessBackend())
+        self.assertEqual(window.get_resolution(), (3000, 2000))
+
+    def test_rnd_scene_runs(self):
+        window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=1)
+        window.screen_rnd_init(balls=10, blocks=2, wallWidth=4)
+        for tick in range(100):
+            window.do()
+        self.assertEqual(len(window.mobile_objects), 10)
+        self.assertEqual(len(window.static_objects), 6)
+
+    def test_items_have_slots_only(self):
+        window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=1)
+        window.screen_rnd_init(balls=3, blocks=1, wallWidth=4)
+        for item in window.mobile_objects + window.static_objects:
+            self.assertFalse(hasattr(item, '__dict__'))
+        ball, block = window.mobile_objects[0], window.static_objects[0]
+        ball.set_position(block.get_position())
+        self.assertTrue(ball.check_contact(block)[0])
+        block.set_obj_type(bubbles.VOIDTYPE)
+        self.assertFalse(ball.check_contact(block)[0])
+
+    def test_csv_scene_runs(self):
+        window = bubbles.Screen(x_size=1200, y_size=800, backend=sb.HeadlessBackend(), seed=1)
+        window.screen_scene_init('SCENE_01.csv')
+        for tick in range(100):
+            window.do()
+        self.assertEqual(len(window.mobile_objects), 30)
+
+
+class test_broad_phase(unittest.TestCase):
+    def setUp(self):
+        self.window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=2)
+        self.window.screen_balls_init(200)
+
+    def contacting_pairs(self, pairs):
+        balls = self.window.mobile_objects
+        return {(i, j) for i, j in pairs if balls[i].check_contact(balls[j])[0]}
+
+    def test_grid_finds_all_contacts(self):
+        balls = self.window.mobile_objects
+        brutePairs = bp.BruteForcePairs().pairs(balls)
+        gridPairs = bp.SpatialHash().pairs(balls)
+        self.assertLess(len(gridPairs), len(brutePairs))
+        self.assertEqual(self.contacting_pairs(brutePairs), self.contacting_pairs(gridPairs))
+
+    def test_sweep_and_prune_finds_all_contacts(self):
+        balls = self.window.mobile_objects
+        sweepAndPrune = bp.SweepAndPrune()
+        brutePairs = bp.BruteForcePairs().pairs(balls)
+        for tick in range(5):
+            sapPairs = sweepAndPrune.pairs(balls)
+            self.assertEqual(self.contacting_pairs(brutePairs), self.contacting_pairs(sapPairs))
+            self.window.move_mobile_items()
+        values = [(point[0], point[1]) for point in sweepAndPrune.endpoints]
+        self.assertEqual(values, sorted(values))
+
+    def test_sweep_and_prune_follows_balls(self):
+        balls = self.window.mobile_objects
+        blocks = [bubbles.Block([x, 100], [50, 50], parent=self.window) for x in (100, 300, 500)]
+        sweepAndPrune = bp.SweepAndPrune()
+        sweepAndPrune.add_many(blocks)
+        for ballsNum in (len(balls) // 2, len(balls), 3, len(balls)):
+            sweepAndPrune.prepare(balls[:ballsNum])
+            # pairs of the same tick come from the prepared sweep
+            self.assertEqual(sweepAndPrune.pairs(balls[:ballsNum]), bp.SweepAndPrune().pairs(balls[:ballsNum]))
+            self.assertEqual(len(sweepAndPrune.endpoints), 2 * (ballsNum + len(blocks)))
+            values = [(point[0], point[1]) for point in sweepAndPrune.endpoints]
+            self.assertEqual(values, sorted(values))
+        block = blocks[1]
+        sweepAndPrune.remove(block)
+        self.assertNotIn(block, [point[3] for point in sweepAndPrune.endpoints])
+
+    def assert_repeats_brute_force(self, broadPhase: str):
+        for seed in (3, 11):
+            bruteWindow = run_random(seed, broadPhase=bp.BRUTEFORCE)
+            for useArrays in (False, True):
+                if useArrays and bs.np is None:
+                    continue
+                with self.subTest(seed=seed, useArrays=useArrays):
+                    window = run_random(seed, broadPhase=broadPhase, useArrays=useArrays)
+                    self.assertEqual(balls_state(window), balls_state(bruteWindow))
+                    for key in ('ballCollisions', 'blockCollisions'):
+                        self.assertEqual(window.stats[key], bruteWindow.stats[key])
+
+    def test_grid_repeats_brute_force_simulation(self):
+        self.assert_repeats_brute_force(bp.SPATIALHASH)
+
+    def test_sweep_and_prune_repeats_brute_force_simulation(self):
+        self.assert_repeats_brute_force(bp.SWEEPANDPRUNE)
+
+    def test_sweep_and_prune_candidates_follow_moved_blocks(self):
+        balls = self.window.mobile_objects[:1]
+        block = bubbles.Block([700, 500], [50, 50], parent=self.window)
+        sweepAndPrune = bp.SweepAndPrune()
+        sweepAndPrune.add(block)
+        sweepAndPrune.prepare(balls)
+        self.assertEqual(sweepAndPrune.candidates(0, balls[0]), [])
+        block.set_position(balls[0].get_position())
+        sweepAndPrune.update(block)
+        self.assertEqual(sweepAndPrune.candidates(0, balls[0]), [block])
+
+    def test_grid_pairs_are_ordered(self):
+        gridPairs = bp.SpatialHash().pairs(self.window.mobile_objects)
+        self.assertEqual(gridPairs, sorted(set(gridPairs)))
+        self.assertTrue(all(i < j for i, j in gridPairs))
+
+
+class test_block_index(unittest.TestCase):
+    def setUp(self):
+        self.window = bubbles.Screen(x_size=1200, y_size=800, backend=sb.HeadlessBackend(), seed=3)
+        self.window.screen_scene_init('SCENE_02.csv')
+
+    def test_index_finds_all_contacts(self):
+        balls = self.window.mobile_objects
+        sweepAndPrune = bp.SweepAndPrune()
+        for block in self.window.static_objects:
+            sweepAndPrune.add(block)
+        sweepAndPrune.prepare(balls)
+        for blockIndex in (self.window.blockIndex, sweepAndPrune):
+            for index, ball in enumerate(balls):
+                nearBlocks = blockIndex.candidates(index, ball)
+                for block in self.window.static_objects:
+                    if ball.check_contact(block)[0] or ball.is_inside(block):
+                        self.assertIn(block, nearBlocks)
+
+    def test_grid_repeats_block_list_simulation(self):
+        runs = []
+        for blockIndex in (bp.BlockList(), bp.BlockGrid()):
+            window = bubbles.Screen(x_size=1200, y_size=800, backend=sb.HeadlessBackend(), seed=11,
+                                    broadPhase=bp.BRUTEFORCE)
+            window.blockIndex = blockIndex
+            window.screen_rnd_init(balls=80, blocks=6, wallWidth=4)
+            for tick in range(100):
+                window.step()
+            runs.append(window)
+        self.assertEqual(balls_state(runs[0]), balls_state(runs[1]))
+        self.assertEqual(runs[0].stats['blockCollisions'], runs[1].stats['blockCollisions'])
+
+    def test_removed_block_is_not_found(self):
+        block = self.window.static_objects[-1]
+        self.window.remove_stationary_item(block)
+        self.assertNotIn(block, self.window.blockIndex.query([[-10, -10], [2000, 2000]]))
+
+    def test_moved_block_is_found(self):
+        block = bubbles.Block(parent=self.window)
+        block.block_init(1200, 800)
+        self.window.add_stationary_item(block)
+        block.block_init(1200, 800)
+        self.assertIn(block, self.window.blockIndex.query(block.get_limits()))
+        self.assertEqual(self.window.blockIndex.query([[-10, -10], [2000, 2000]]), self.window.static_objects)
+
+
+def run_scene(ticks=200, **screenOptions):
+    window = bubbles.Screen(x_size=1200, y_size=800, backend=sb.HeadlessBackend(), seed=7, **screenOptions)
+    window.screen_scene_init('SCENE_02.csv')
+    for tick in range(ticks):
+        window.do()
+    return window
+
+
+def run_random(seed: int, ticks=100, **screenOptions):
+    window = bubbles.Screen(x_size=1200, y_size=800, backend=sb.HeadlessBackend(), seed=seed, **screenOptions)
+    window.screen_rnd_init(balls=80, blocks=6, wallWidth=4)
+    for tick in range(ticks):
+        window.step()
+    return window
+
+
+def balls_state(window):
+    return [(ball.get_position(), ball.get_speed(), ball.get_radius(), ball.tillRemove, ball.was_contact())
+            for ball in window.mobile_objects]
+
+
+@unittest.skipIf(bs.np is None, 'numpy is not installed')
+class test_ball_store(unittest.TestCase):
+    def test_arrays_repeat_objects_simulation(self):
+        self.assertEqual(balls_state(run_scene()), balls_state(run_scene(useArrays=True)))
+
+    def test_arrays_repeat_objects_random_scenes(self):
+        for seed in (3, 11):
+            with self.subTest(seed=seed):
+                objects = run_random(seed, broadPhase=bp.BRUTEFORCE)
+                arrays = run_random(seed, broadPhase=bp.BRUTEFORCE, useArrays=True)
+                self.assertEqual(balls_state(objects), balls_state(arrays))
+                self.assertEqual(objects.stats, arrays.stats)
+
+    def test_removed_ball_slot_is_reused(self):
+        window = run_scene(ticks=0, useArrays=True)
+        firstBall, lastBall = window.mobile_objects[0], window.mobile_objects[-1]
+        lastPosition = lastBall.get_position()
+        window.remove_mobile_item(firstBall)
+        self.assertEqual(len(window.ballStore), len(window.mobile_objects))
+        self.assertEqual(lastBall.slot, 0)
+        self.assertEqual(lastBall.get_position(), lastPosition)
+
+    def test_bulk_contacts(self):
+        x = bs.np.array([0.0, 30.0, 100.0])
+        y = bs.np.array([0.0, 40.0, 0.0])
+        radius = bs.np.array([20.0, 30.0, 10.0])
+        first, second = nph.pairs_to_arrays([(0, 1), (0, 2), (1, 2)])
+        contact, normalX, normalY, depth = nph.ball_ball_contacts(x, y, radius, first, second)
+        self.assertEqual(contact.tolist(), [True, False, False])
+        self.assertAlmostEqual(normalX[0], 0.6)
+        self.assertAlmostEqual(normalY[0], 0.8)
+        self.assertAlmostEqual(depth[0], 0.0)
+        self.assertAlmostEqual(depth[1], -70.0)
+
+
+class test_background(unittest.TestCase):
+    def test_tree_depth_is_bounded(self):
+        segments = fd.fractal_tree_segments((0, 0), length=100, scale=0.9, maxDepth=5)
+        self.assertEqual(len(segments), 2 + 4 + 8 + 16 + 32)
+
+    def test_tree_stops_at_min_length(self):
+        segments = fd.fractal_tree_segments((0, 0), length=20, scale=0.5, minLength=10)
+        self.assertEqual(len(segments), 2 + 4)
+
+    def test_background_is_rendered_once(self):
+        trees = [((100, 10), 50, 90, 30, 0.6, (0, 127, 0))]
+        background = fd.cached_background((200, 100), trees)
+        self.assertIs(fd.cached_background((200, 100), trees), background)
+        self.assertIsNot(fd.cached_background((200, 120), trees), background)
+
+
+class test_repeatable_runs(unittest.TestCase):
+    def test_seed_repeats_the_run(self):
+        random.seed(1)
+        first = run_scene(ticks=100)
+        random.seed(2)
+        second = run_scene(ticks=100)
+        self.assertEqual(balls_state(first), balls_state(second))
+        self.assertEqual(first.stats, second.stats)
+
+    def test_replay_repeats_recorded_run(self):
+        class MouseBackend(sb.HeadlessBackend):
+            """ left button is pressed from 10 to 20 tick while cursor moves """
+            ticks = 0
+
+            def get_mouse_state(self):
+                self.ticks += 1
+                return [self.ticks, 100], (10 <= self.ticks < 20, False, False)
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            logFileName = os.path.join(tempDir, 'mouse.log')
+            recorder = sb.MouseRecorder(MouseBackend(), logFileName, seed=5)
+            recorded = bubbles.Screen(x_size=1200, y_size=800, backend=recorder, seed=5)
+            recorded.screen_scene_init('SCENE_02.csv')
+            for tick in range(50):
+                recorded.step()
+            recorder.quit()
+            replay = sb.ReplayBackend(logFileName)
+            replayed = bubbles.Screen(x_size=1200, y_size=800, backend=replay, seed=replay.seed)
+            replayed.screen_scene_init('SCENE_02.csv')
+            replayedStates = []
+            while not replay.user_want_exit():
+                replayed.step()
+                replayedStates.append(replay.state)
+        self.assertEqual(replayedStates, [([tick, 100], (int(10 <= tick < 20), 0, 0)) for tick in range(1, 51)])
+        self.assertEqual(balls_state(recorded), balls_state(replayed))
+
+
+class test_dirty_rects(unittest.TestCase):
+    def frames(self, backendClass, ticks=150, profiler=None):
+        """ window contents of each frame as it is shown """
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        import pygame
+        import simple_draw as sd
+        sb.sd_surface().fill(sd.background_color)
+        shots = []
+
+        class Backend(backendClass):
+            def finish_frame(self):
+                super().finish_frame()
+                shots.append(pygame.image.tostring(sb.sd_surface(), 'RGB'))
+
+        window = bubbles.Screen(x_size=600, y_size=400, backend=Backend(frameDelay=0), seed=3)
+        window.screen_rnd_init(balls=20, blocks=3, wallWidth=2)
+        if profiler is not None:
+            window.start_profiler(profiler)
+        for tick in range(ticks):
+            window.draw_items()
+            window.step()
+        return shots
+
+    def test_frames_are_the_same_as_full_redraw(self):
+        fullFrames = self.frames(sb.SdBackend)
+        dirtyFrames = self.frames(sb.DirtyRectBackend)
+        self.assertEqual(len(fullFrames), len(dirtyFrames))
+        for frame, (full, dirty) in enumerate(zip(fullFrames, dirtyFrames)):
+            self.assertTrue(full == dirty, f'frame {frame} differs')
+
+    def test_hud_is_erased(self):
+        class Profiler(pf.PhaseProfiler):
+            """ lines of different length, but the same in every run """
+            def hud_lines(self):
+                return ['tick', str(self.calls['collisions']) * (self.calls['collisions'] % 7)]
+
+        fullFrames = self.frames(sb.SdBackend, ticks=30, profiler=Profiler(isHudShown=True))
+        dirtyFrames = self.frames(sb.DirtyRectBackend, ticks=30, profiler=Profiler(isHudShown=True))
+        self.assertNotEqual(fullFrames[7], self.frames(sb.SdBackend, ticks=30)[7])
+        for frame, (full, dirty) in enumerate(zip(fullFrames, dirtyFrames)):
+            self.assertTrue(full == dirty, f'frame {frame} differs')
+
+    def test_unknown_simple_draw_fails_at_setup(self):
+        sb.check_simple_draw()
+        with mock.patch.object(sb, 'SD_INTERNALS', sb.SD_INTERNALS + ('_missing_name',)):
+            with self.assertRaisesRegex(sb.SimpleDrawError, '_missing_name'):
+                sb.DirtyRectBackend(frameDelay=0).setup(600, 400)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# tests for contacts of items pairs kept from tick to tick
+
+import unittest
+
+import bubbles
+import contact_cache as cc
+import screen_backends as sb
+
+
+class test_contact_cache(unittest.TestCase):
+    def test_contact_begins_persists_and_ends(self):
+        contacts = cc.ContactCache()
+        self.assertEqual(contacts.touch(7, 3), cc.BEGIN)
+        self.assertEqual(contacts.touch(3, 5), cc.BEGIN)
+        self.assertEqual(contacts.contacts_of(3), 0)  # tick is not finished yet
+        self.assertEqual(contacts.end_tick(), [])
+        self.assertEqual(contacts.contacts_of(3), 2)
+        self.assertEqual(contacts.touch(3, 7), cc.PERSIST)
+        self.assertEqual(contacts.end_tick(), [(3, 5)])
+        self.assertEqual(contacts.pairs, {(3, 7): 2})
+        self.assertEqual(contacts.contact_ticks(7, 3), 2)
+        self.assertEqual(contacts.contacts_of(5), 0)
+        self.assertEqual(contacts.end_tick(), [(3, 7)])
+        self.assertEqual(len(contacts), 0)
+        self.assertEqual(contacts.touch(3, 7), cc.BEGIN)
+
+
+class test_screen_contacts(unittest.TestCase):
+    def test_overlapping_balls_disperse(self):
+        window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=1)
+        first = bubbles.Ball([400, 300], radius=20, parent=window)
+        second = bubbles.Ball([400, 330], radius=20, parent=window)
+        first.set_speed(1, 0)
+        second.set_speed(1, 180)
+        window.add_mobile_items([first, second])
+        window.step()
+        self.assertEqual(window.stats['ballCollisions'], 1)
+        self.assertEqual((first.was_contact(), second.was_contact()), (1, 1))
+        window.step()
+        # the balls still overlap - they go away from each other along the line of their centers
+        self.assertEqual(window.stats['ballCollisions'], 1)
+        self.assertEqual(window.contacts.contact_ticks(first.objectId, second.objectId), 2)
+        self.assertEqual((second.speedDirection - first.speedDirection) % 360, 180)
+        for tick in range(30):
+            window.step()
+        self.assertEqual(len(window.contacts), 0)
+        self.assertEqual(first.was_contact(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# tests for asyncio loop with control socket, commands are sent by local client
+
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import unittest
+
+import bubbles
+import control
+import screen_backends as sb
+import snapshot
+
+
+class test_control_server(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=3)
+        self.window.screen_rnd_init(balls=10, blocks=2, wallWidth=4)
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    def session(self, address: str, commands: list, **loopOptions) -> list:
+        """ runs the loop and sends commands one by one from client
+        :return: answers """
+        async def main():
+            server = control.ControlServer(self.window, **loopOptions)
+            serverAddress = await server.start(address)
+            loop = asyncio.create_task(server.run())
+            host, port = control.parse_address(serverAddress)
+            if host is None:
+                reader, writer = await asyncio.open_unix_connection(port)
+            else:
+                reader, writer = await asyncio.open_connection(host, port)
+            answers = []
+            for command in commands:
+                writer.write((command + '\n').encode())
+                await writer.drain()
+                answers.append(json.loads(await reader.readline()))
+                await asyncio.sleep(0.01)
+            writer.close()
+            await asyncio.wait_for(loop, timeout=10)
+            return answers
+
+        return asyncio.run(main())
+
+    def test_commands_over_tcp(self):
+        snapshotFile = os.path.join(self.tempDir.name, 'state.bin')
+        answers = self.session('127.0.0.1:0', ['pause', 'metrics', 'metrics', 'step 3', 'add_balls 2',
+                                               f'snapshot {snapshotFile}', 'step -1', 'jump', 'resume', 'quit'])
+        paused, first, second, stepped, added, saved, badStep, unknown, resumed, stopped = answers
+        self.assertEqual(paused, {'paused': True})
+        self.assertEqual(first['ticks'], second['ticks'])  # paused loop does not tick
+        self.assertTrue(second['paused'])
+        self.assertEqual(second['balls'], 10)
+        self.assertIn('collisions', second['phases'])
+        self.assertEqual(stepped, {'ticks': second['ticks'] + 3})
+        self.assertEqual(added, {'balls': 12})
+        self.assertEqual(saved['ticks'], stepped['ticks'])
+        self.assertEqual(snapshot.load_snapshot(snapshotFile, backend=sb.HeadlessBackend()).stats['ticks'],
+                         stepped['ticks'])
+        self.assertIn('error', badStep)
+        self.assertIn('error', unknown)
+        self.assertEqual(resumed, {'paused': False})
+        self.assertEqual(stopped, {'stopped': True})
+
+    def test_paced_loop_stops_after_max_ticks(self):
+        answers = self.session('127.0.0.1:0', ['metrics'], tickRate=200, frameRate=50, maxTicks=20)
+        self.assertFalse(answers[0]['paused'])
+        # like scheduler run does, the loop stops after the frame which did the last tick
+        self.assertGreaterEqual(self.window.stats['ticks'], 20)
+        self.assertLess(self.window.stats['ticks'], 20 + control.scheduler.MAX_STEPS_PER_FRAME)
+
+    def test_path_with_spaces_and_command_errors(self):
+        server = control.ControlServer(self.window)
+        snapshotFile = os.path.join(self.tempDir.name, 'saved state', 'state 1.bin')
+        os.mkdir(os.path.dirname(snapshotFile))
+        self.assertEqual(server.execute(f'snapshot {snapshotFile}\n'), {'snapshot': snapshotFile, 'ticks': 0})
+        self.assertTrue(os.path.exists(snapshotFile))
+
+        def broken():
+            raise RuntimeError('broken command')
+
+        server.commands['broken'] = broken
+        self.assertEqual(server.execute('broken'), {'error': 'broken: broken command'})
+        self.assertIn('error', server.execute('snapshot'))
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets are not supported')
+    def test_commands_over_unix_socket(self):
+        socketPath = os.path.join(self.tempDir.name, 'control.sock')
+        answers = self.session(socketPath, ['metrics', 'quit'])
+        self.assertEqual(answers[0]['blocks'], 6)
+        self.assertFalse(os.path.exists(socketPath))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# tests for events bus of the simulation and its consumers
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import bubbles
+import events as ev
+import screen_backends as sb
+import snapshot
+
+
+class test_event_bus(unittest.TestCase):
+    def test_events_are_batched_per_tick(self):
+        bus = ev.EventBus()
+        bus.emit(ev.BallRemoved(1))
+        self.assertEqual(bus.batch, [])  # nobody is subscribed
+        batches = []
+        bus.subscribe(lambda tick, events: batches.append((tick, events)))
+        collisions = bus.subscribe(ev.EventCounter(), eventTypes=[ev.Collision])
+        bus.emit(ev.BallRemoved(1))
+        bus.emit(ev.Collision(1, 2, 90))
+        bus.flush(5)
+        bus.flush(6)
+        self.assertEqual(batches, [(5, [ev.BallRemoved(1), ev.Collision(1, 2, 90)])])
+        self.assertEqual(collisions.counts, {'Collision': 1})
+
+    def test_console_is_rate_limited(self):
+        now = [0.0]
+        out = io.StringIO()
+        console = ev.ConsoleLog(maxPerSecond=3, out=out, clock=lambda: now[0])
+        console(1, [ev.BallRemoved(objectId) for objectId in range(5)])
+        now[0] = 0.5
+        console(2, [ev.BallRemoved(5)])
+        now[0] = 1.5
+        console(3, [ev.BallRemoved(6)])
+        self.assertEqual(out.getvalue().splitlines(),
+                         ['tick 1: BallRemoved(objectId=0)', 'tick 1: BallRemoved(objectId=1)',
+                          'tick 1: BallRemoved(objectId=2)', '3 events are not shown',
+                          'tick 3: BallRemoved(objectId=6)'])
+
+
+class test_screen_events(unittest.TestCase):
+    def test_events_do_not_change_the_run(self):
+        runs = []
+        for isSubscribed in (False, True):
+            window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=4)
+            counter = window.events.subscribe(ev.EventCounter()) if isSubscribed else None
+            window.screen_rnd_init(balls=30, blocks=3, wallWidth=4)
+            for tick in range(200):
+                window.step()
+            runs.append(window)
+        self.assertEqual([ball.get_position() for ball in runs[0].mobile_objects],
+                         [ball.get_position() for ball in runs[1].mobile_objects])
+        stats = runs[1].stats
+        self.assertEqual(counter.counts['Collision'], stats['blockCollisions'] + stats['ballCollisions'])
+        self.assertEqual(counter.counts['BallSpawned'], 30 + stats['ballsDied'] + stats['ballsReturned'])
+        self.assertEqual(runs[0].events.batch, [])
+
+    def test_events_log(self):
+        window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=4)
+        window.screen_rnd_init(balls=5, blocks=1, wallWidth=4)
+        with tempfile.TemporaryDirectory() as tempDir:
+            logFileName = os.path.join(tempDir, 'events.log')
+            window.events.subscribe(ev.EventLog(logFileName), eventTypes=[ev.SnapshotExported])
+            window.step()
+            snapshotFileName = os.path.join(tempDir, 'state.bin')
+            snapshot.save_snapshot(window, snapshotFileName)
+            window.flush_events()
+            window.events.close()
+            with open(logFileName) as logFile:
+                lines = [json.loads(line) for line in logFile]
+        self.assertEqual(lines, [{'tick': 1, 'event': 'SnapshotExported', 'fileName': snapshotFileName,
+                                  'ticks': 1}])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# tests for per-phase profiler of the screen
+
+import json
+import os
+import tempfile
+import unittest
+
+import bubbles
+import profiler as pf
+import screen_backends as sb
+
+
+def balls_state(window) -> list:
+    return [(ball.objectId, ball.xPosition, ball.yPosition, ball.speedValue, ball.speedDirection)
+            for ball in window.mobile_objects]
+
+
+class test_phase_profiler(unittest.TestCase):
+    def test_percentiles_of_last_samples(self):
+        profiler = pf.PhaseProfiler(samplesNum=100)
+        for sample in range(300):
+            profiler.add('move', sample / 1000)
+        self.assertEqual(profiler.percentiles('move'), {50: 0.25, 90: 0.29, 99: 0.299})
+        report = profiler.report()
+        self.assertEqual(report['phases']['move']['calls'], 300)
+        self.assertAlmostEqual(report['phases']['move']['mean'], 0.1495)
+        self.assertEqual(report['phases']['draw'], {'calls': 0, 'total': 0.0, 'mean': 0.0, 'max': 0.0,
+                                                    'p50': 0.0, 'p90': 0.0, 'p99': 0.0})
+
+    def test_screen_phases_and_counters(self):
+        runs = []
+        for isProfiled in (False, True):
+            window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=7)
+            window.screen_rnd_init(balls=30, blocks=3, wallWidth=4)
+            profiler = window.start_profiler() if isProfiled else None
+            for tick in range(100):
+                window.step()
+            runs.append(window)
+        self.assertEqual(balls_state(runs[0]), balls_state(runs[1]))
+        self.assertEqual(runs[0].stats, runs[1].stats)
+        self.assertGreater(runs[1].stats['ballPairTests'], 0)
+        self.assertGreater(runs[1].stats['blockPairTests'], 0)
+        for phase in ('collisions', 'move', 'window', 'immovable', 'mouse'):
+            self.assertEqual(profiler.calls[phase], 100)
+        self.assertEqual(profiler.calls['draw'], 0)
+        window = runs[1]
+        statsBefore = dict(window.stats)
+        window.step()
+        self.assertEqual(profiler.tickCounters,
+                         {name: window.stats[name] - statsBefore.get(name, 0) for name in pf.COUNTERS})
+        self.assertTrue(profiler.hud_lines()[-1].startswith('tests '))
+
+    def test_report_is_dumped(self):
+        window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=7)
+        window.screen_rnd_init(balls=10, blocks=1, wallWidth=4)
+        window.start_profiler()
+        for tick in range(10):
+            window.step()
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, 'profile.json')
+            window.stop_profiler(fileName)
+            with open(fileName) as reportFile:
+                report = json.load(reportFile)
+        self.assertIsNone(window.profiler)
+        self.assertEqual(report['phases']['collisions']['calls'], 10)
+        self.assertEqual(report['stats']['ticks'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# tests for items registry and deferred removal of screen items
+
+import unittest
+
+import ball_store as bs
+import broad_phase as bp
+import bubbles
+import registry as reg
+import screen_backends as sb
+
+
+class Item:
+    def __init__(self, objectId: int):
+        self.objectId = objectId
+
+
+class test_item_registry(unittest.TestCase):
+    def setUp(self):
+        self.registry = reg.ItemRegistry()
+        self.items = [Item(objectId) for objectId in range(1, 6)]
+        self.registry.add_many(self.items)
+
+    def test_last_item_takes_removed_place(self):
+        self.assertTrue(self.registry.remove(self.items[1]))
+        self.assertFalse(self.registry.remove(self.items[1]))
+        self.assertEqual([item.objectId for item in self.registry], [1, 5, 3, 4])
+        self.assertIs(self.registry.get(5), self.items[4])
+        self.assertNotIn(self.items[1], self.registry)
+        self.assertFalse(self.registry.add(self.items[0]))
+        self.assertEqual(len(self.registry), 4)
+
+    def test_deferred_changes(self):
+        items = self.registry.items
+        self.registry.defer()
+        newItem = Item(6)
+        self.registry.add(newItem)
+        self.registry.remove(self.items[0])
+        self.registry.remove(self.items[2])
+        self.registry.add(self.items[2])  # removal is cancelled
+        self.assertEqual([item.objectId for item in items], [1, 2, 3, 4, 5])
+        self.assertEqual(len(self.registry), 5)
+        self.assertNotIn(self.items[0], self.registry)
+        self.assertIn(newItem, self.registry)
+        self.assertEqual(self.registry.commit(), [self.items[0]])
+        self.assertIs(self.registry.items, items)
+        self.assertEqual([item.objectId for item in items], [5, 2, 3, 4, 6])
+        self.assertEqual(self.registry.places, {5: 0, 2: 1, 3: 2, 4: 3, 6: 4})
+
+
+class test_deferred_removal(unittest.TestCase):
+    def test_dead_blocks_are_removed_at_tick_end(self):
+        for broadPhase in bp.BROADPHASES:
+            with self.subTest(broadPhase=broadPhase):
+                window = bubbles.Screen(x_size=600, y_size=400, backend=sb.HeadlessBackend(), broadPhase=broadPhase,
+                                        seed=2)
+                window.screen_rnd_init(balls=0, blocks=0, wallWidth=4)
+                blocks = [bubbles.Block([100 + 40 * column, 100 + 40 * row], [30, 30], parent=window)
+                          for row in range(5) for column in range(10)]
+                for block in blocks:
+                    block.set_obj_type(bubbles.BLOCKMORTALTYPE)
+                    block.set_lifetime(1)
+                window.add_stationary_items(blocks)
+                window.screen_balls_init(40)
+                removedTicks = []
+                for tick in range(300):
+                    blocksNum = len(window.static_objects)
+                    window.step()
+                    self.assertEqual(len(window.static_objects), len(window.staticItems))
+                    if len(window.static_objects) < blocksNum:
+                        removedTicks.append(tick)
+                self.assertTrue(removedTicks)
+                self.assertEqual(len(window.static_objects), 4 + len(blocks) - window.stats['blocksRemoved'])
+                self.assertEqual({block.objectId for block in window.static_objects},
+                                 {block.objectId for block in window.blockIndex.query(((0, 0), (600, 400)))})
+
+    @unittest.skipIf(bs.np is None, 'numpy is not installed')
+    def test_balls_born_during_tick_keep_store_order(self):
+        window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), useArrays=True, seed=2)
+        window.screen_balls_init(10)
+        window.defer_items_changes()
+        window.remove_mobile_item(window.mobile_objects[2])
+        window.screen_balls_init(3)
+        window.remove_mobile_item(window.ballStore.balls[-1])  # born and removed in the same tick
+        states = {ball.objectId: (ball.get_position(), ball.get_speed(), ball.get_radius())
+                  for ball in window.ballStore.balls[:-1]}
+        window.commit_items_changes()
+        self.assertEqual(len(window.mobile_objects), 11)
+        self.assertEqual(window.ballStore.balls, window.mobile_objects)
+        self.assertEqual([ball.slot for ball in window.mobile_objects], list(range(11)))
+        self.assertEqual({ball.objectId: (ball.get_position(), ball.get_speed(), ball.get_radius())
+                          for ball in window.mobile_objects},
+                         {objectId: state for objectId, state in states.items()
+                          if objectId in {ball.objectId for ball in window.mobile_objects}})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# tests for compiled and cached scene files
+
+import os
+import tempfile
+import unittest
+
+import broad_phase as bp
+import bubbles
+import scene_loader as sl
+import screen_backends as sb
+
+
+def blocks_state(window) -> list:
+    return [(block.objectId, block.objectType, block.get_limits(), block.color, block.width, block.isRemovable,
+             block.tillRemove) for block in window.static_objects]
+
+
+class test_scene_loader(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.cacheDir = os.path.join(self.tempDir.name, 'cache')
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    def write_scene(self, rows: list) -> str:
+        fileName = os.path.join(self.tempDir.name, 'scene.csv')
+        with open(fileName, 'w') as sceneFile:
+            sceneFile.write(';'.join(sl.SCENE_COLUMNS) + '\n')
+            sceneFile.writelines(row + '\n' for row in rows)
+        return fileName
+
+    def test_compiled_scene_is_the_same(self):
+        parsed = [list(chunk) for chunk in sl.parse_scene('SCENE_02.csv', chunkRows=4)]
+        self.assertEqual(len(parsed), 5)
+        self.assertEqual(parsed[0][:9], [1, 40, 0.34, 0.12, 0.8, 0.32, 0, 0, 30])
+        compiled = [list(chunk) for chunk in sl.scene_chunks('SCENE_02.csv', self.cacheDir, chunkRows=4)]
+        self.assertEqual(os.listdir(self.cacheDir), [f"scene_{sl.scene_key('SCENE_02.csv')}.bin"])
+        cached = [list(chunk) for chunk in sl.scene_chunks('SCENE_02.csv', self.cacheDir, chunkRows=4)]
+        self.assertEqual(compiled, parsed)
+        self.assertEqual(cached, parsed)
+
+    def test_screen_blocks_from_cache(self):
+        windows = []
+        for run in range(2):
+            window = bubbles.Screen(x_size=1200, y_size=800, backend=sb.HeadlessBackend(),
+                                    sceneCache=self.cacheDir, seed=1)
+            window.screen_scene_init('SCENE_01.csv')
+            windows.append(window)
+        self.assertEqual(blocks_state(windows[0]), blocks_state(windows[1]))
+        self.assertEqual(len(windows[1].mobile_objects), 30)
+        wall = windows[1].static_objects[0]
+        self.assertEqual((wall.objectType, wall.color, wall.width, wall.isRemovable),
+                         (bubbles.WALLTYPE, bubbles.PALETTE[2], 1, False))
+
+    def test_wrong_rows_are_rejected(self):
+        for row in ('1;30;0.1;0.1;0.2', '1;30;0.1;0.1;0.2;0.2;1.5;1;0', '1;30;0.3;0.1;0.2;0.2;1;1;0',
+                    '1;30;0.1;0.1;0.2;1.2;1;1;0', '1;30;x;0.1;0.2;0.2;1;1;0'):
+            with self.subTest(row=row):
+                fileName = self.write_scene(['1;40;0.1;0.1;0.9;0.9;0;0;3', row])
+                with self.assertRaises(sl.SceneError):
+                    list(sl.scene_chunks(fileName, self.cacheDir))
+                self.assertFalse(os.listdir(self.cacheDir))
+
+    def test_truncated_cache_is_rebuilt(self):
+        parsed = [list(chunk) for chunk in sl.parse_scene('SCENE_02.csv')]
+        list(sl.scene_chunks('SCENE_02.csv', self.cacheDir))
+        compiledName = os.path.join(self.cacheDir, os.listdir(self.cacheDir)[0])
+        for size in (sl.HEADER.size - 3, sl.HEADER.size + 20):
+            with self.subTest(size=size):
+                with open(compiledName, 'r+b') as compiledFile:
+                    compiledFile.truncate(size)
+                with self.assertRaises(sl.SceneError):
+                    list(sl.read_compiled(compiledName))
+                self.assertEqual([list(chunk) for chunk in sl.scene_chunks('SCENE_02.csv', self.cacheDir)], parsed)
+                self.assertEqual([list(chunk) for chunk in sl.read_compiled(compiledName)], parsed)
+
+    def test_many_blocks_are_added_in_order(self):
+        fileName = self.write_scene([f'{n};25;{n % 7 / 10};{n % 5 / 10};{n % 7 / 10 + 0.05};{n % 5 / 10 + 0.05};1;1;5'
+                                     for n in range(50)])
+        for broadPhase in bp.BROADPHASES:
+            with self.subTest(broadPhase=broadPhase):
+                window = bubbles.Screen(x_size=1000, y_size=1000, backend=sb.HeadlessBackend(),
+                                        broadPhase=broadPhase, seed=1)
+                window.screen_scene_init(fileName)
+                blockIndex = bp.create_broad_phase(broadPhase)[1]
+                for block in window.static_objects:
+                    blockIndex.add(block)
+                limits = ((0, 0), (500, 500))
+                self.assertEqual(window.blockIndex.query(limits), blockIndex.query(limits))
+                if broadPhase == bp.SWEEPANDPRUNE:
+                    self.assertEqual(window.blockIndex.endpoints, blockIndex.endpoints)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# tests for fixed timestep scheduler with fake clock
+
+import unittest
+
+import scheduler
+
+
+class FakeClock:
+    """ time goes only when somebody sleeps or works """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class test_fixed_step(unittest.TestCase):
+    def make_scheduler(self, stepCost=0.0, renderCost=0.0, **options):
+        self.clock = FakeClock()
+        self.steps = 0
+        self.frames = 0
+
+        def step():
+            self.steps += 1
+            self.clock.now += stepCost
+
+        def render():
+            self.frames += 1
+            self.clock.now += renderCost
+
+        return scheduler.FixedStepScheduler(step, render, clock=self.clock, sleep=self.clock.sleep, **options)
+
+    def test_tick_rate_does_not_depend_on_frame_rate(self):
+        loop = self.make_scheduler(tickRate=20, frameRate=60)
+        while self.clock.now < 10:
+            loop.run_frame()
+        self.assertAlmostEqual(self.steps, 200, delta=1)
+        self.assertEqual(self.frames, self.steps)
+
+    def test_slow_render_makes_several_steps_per_frame(self):
+        loop = self.make_scheduler(renderCost=0.1, tickRate=50, frameRate=60)
+        while self.clock.now < 10:
+            loop.run_frame()
+        self.assertAlmostEqual(self.steps, 500, delta=5)
+        self.assertLessEqual(self.frames, 101)
+
+    def test_frame_rate_is_capped(self):
+        loop = self.make_scheduler(tickRate=1000, frameRate=50)
+        while self.clock.now < 2:
+            loop.run_frame()
+        self.assertAlmostEqual(self.frames, 100, delta=1)
+
+    def test_spiral_of_death_guard(self):
+        loop = self.make_scheduler(stepCost=0.05, tickRate=100, maxStepsPerFrame=4)
+        for frame in range(50):
+            self.assertLessEqual(loop.run_frame(), 4)
+        self.assertGreater(loop.droppedTime, 0)
+
+    def test_run_stops_after_ticks(self):
+        loop = self.make_scheduler(tickRate=100)
+        loop.run(isFinished=lambda: False, maxTicks=30)
+        self.assertEqual(self.steps, 30)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# tests for binary snapshots of the screen state
+
+import os
+import tempfile
+import unittest
+
+import ball_store as bs
+import bubbles
+import screen_backends as sb
+import snapshot
+
+
+def balls_state(window) -> list:
+    return [(ball.objectId, ball.xPosition, ball.yPosition, ball.speedValue, ball.speedDirection, ball.tillRemove)
+            for ball in window.mobile_objects]
+
+
+def blocks_state(window) -> list:
+    return [(block.objectId, block.xPosition, block.yPosition, block.color, block.tillRemove)
+            for block in window.static_objects]
+
+
+class test_snapshot(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.fileName = os.path.join(self.tempDir.name, 'state.bin')
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    def run_saved(self, saveArrays: bool, loadArrays: bool):
+        window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), useArrays=saveArrays, seed=5)
+        window.screen_rnd_init(balls=40, blocks=3, wallWidth=4)
+        for tick in range(40):
+            window.step()
+        snapshot.save_snapshot(window, self.fileName)
+        loaded = snapshot.load_snapshot(self.fileName, backend=sb.HeadlessBackend(), useArrays=loadArrays)
+        self.assertEqual(balls_state(loaded), balls_state(window))
+        self.assertEqual(blocks_state(loaded), blocks_state(window))
+        self.assertEqual(loaded.contacts.pairs, window.contacts.pairs)
+        for tick in range(60):
+            window.step()
+            loaded.step()
+        self.assertEqual(balls_state(loaded), balls_state(window))
+        self.assertEqual(blocks_state(loaded), blocks_state(window))
+        self.assertEqual(loaded.stats, window.stats)
+        self.assertEqual(loaded.random.getstate(), window.random.getstate())
+        self.assertEqual(loaded.lastObjectId, window.lastObjectId)
+
+    def test_loaded_run_goes_on_the_same_way(self):
+        self.run_saved(False, False)
+
+    @unittest.skipIf(bs.np is None, 'numpy is not installed')
+    def test_array_mode_snapshots(self):
+        for saveArrays, loadArrays in ((True, True), (False, True), (True, False)):
+            with self.subTest(saveArrays=saveArrays, loadArrays=loadArrays):
+                self.run_saved(saveArrays, loadArrays)
+
+    def test_wrong_files_are_rejected(self):
+        with open(self.fileName, 'wb') as snapshotFile:
+            snapshotFile.write(b'SCENE,1,2,3\n')
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.load_snapshot(self.fileName, backend=sb.HeadlessBackend())
+        window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=5)
+        window.screen_rnd_init(balls=5, blocks=1, wallWidth=4)
+        snapshot.save_snapshot(window, self.fileName)
+        with open(self.fileName, 'rb') as snapshotFile:
+            data = snapshotFile.read()
+        with open(self.fileName, 'wb') as snapshotFile:
+            snapshotFile.write(data[:len(snapshot.MAGIC)] + (snapshot.VERSION + 1).to_bytes(4, 'little')
+                               + data[len(snapshot.MAGIC) + 4:])
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.load_snapshot(self.fileName, backend=sb.HeadlessBackend())
+        with open(self.fileName, 'wb') as snapshotFile:
+            snapshotFile.write(data[:-8])
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.load_snapshot(self.fileName, backend=sb.HeadlessBackend())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# tests for continuous collision detection
+
+import unittest
+
+import bubbles
+import screen_backends as sb
+import swept_collision as swc
+
+
+class test_time_of_impact(unittest.TestCase):
+    def test_point_ahead(self):
+        result = swc.circle_point_toi(center=(0, 0), move=(10, 0), radius=2, point=(6, 0))
+        self.assertAlmostEqual(result, 0.4)
+
+    def test_point_behind(self):
+        result = swc.circle_point_toi(center=(0, 0), move=(-10, 0), radius=2, point=(6, 0))
+        self.assertIsNone(result)
+
+    def test_point_too_far(self):
+        result = swc.circle_point_toi(center=(0, 0), move=(10, 0), radius=2, point=(16, 0))
+        self.assertIsNone(result)
+
+    def test_segment_crossed(self):
+        result = swc.circle_segment_toi(center=(0, 5), move=(0, -20), radius=3, linePoint1=(-10, -5),
+                                        linePoint2=(10, -5))
+        self.assertAlmostEqual(result, 0.35)
+
+    def test_segment_missed(self):
+        result = swc.circle_segment_toi(center=(20, 5), move=(0, -20), radius=3, linePoint1=(-10, -5),
+                                        linePoint2=(10, -5))
+        self.assertIsNone(result)
+
+    def test_segment_end_touched(self):
+        result = swc.circle_segment_toi(center=(12, 5), move=(0, -20), radius=3, linePoint1=(-10, -5),
+                                        linePoint2=(10, -5))
+        self.assertGreater(result, 0.35)
+        self.assertLess(result, 0.5)
+
+    def test_thin_block_is_not_tunnelled(self):
+        result = swc.circle_block_toi(center=(0, 0), move=(100, 0), radius=5, limits=[[50, -100], [52, 100]])
+        self.assertAlmostEqual(result, 0.45)
+
+    def test_moving_away_from_touched_block(self):
+        result = swc.circle_block_toi(center=(47, 0), move=(-100, 0), radius=5, limits=[[50, -100], [52, 100]])
+        self.assertIsNone(result)
+
+    def test_circles(self):
+        result = swc.circle_circle_toi((0, 0), (10, 0), 2, (20, 0), (-10, 0), 3)
+        self.assertAlmostEqual(result, 0.75)
+
+
+class test_continuous_collision(unittest.TestCase):
+    def run_fast_balls(self, **screenOptions):
+        window = bubbles.Screen(x_size=1200, y_size=800, backend=sb.HeadlessBackend(), seed=4, **screenOptions)
+        window.screen_rnd_init(balls=30, blocks=2, wallWidth=2)
+        escaped = 0
+        for tick in range(150):
+            for ball in window.mobile_objects:
+                ball.set_speed(value=40, direction=ball.speedDirection)
+            window.step()
+            escaped += sum(not (0 < ball.xPosition < 1200 and 0 < ball.yPosition < 800)
+                           for ball in window.mobile_objects)
+        return escaped
+
+    def test_fast_balls_jump_through_walls(self):
+        self.assertGreater(self.run_fast_balls(), 0)
+
+    def test_fast_balls_stay_inside(self):
+        self.assertEqual(self.run_fast_balls(continuousCollision=True), 0)
+
+    def test_fast_balls_stay_inside_with_arrays(self):
+        self.assertEqual(self.run_fast_balls(continuousCollision=True, useArrays=True), 0)
+
+    def test_balls_are_not_born_in_crowded_blocks(self):
+        for useArrays in (False, True):
+            with self.subTest(useArrays=useArrays):
+                window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=5,
+                                        continuousCollision=True, useArrays=useArrays)
+                # blocks cover the birth place except a strip at its top, random places touch blocks mostly
+                (x0, y0), (x1, y1) = window.get_birth_place()
+                window.add_stationary_items([bubbles.Block([x0 - 100, y0 - 100], [x1 - x0 + 200, y1 - y0 - 30],
+                                                           parent=window)])
+                window.screen_balls_init(20)
+                self.assertEqual(len(window.mobile_objects), 20)
+                self.assertFalse(any(window.touches_block(ball) for ball in window.mobile_objects))
+                # nothing is free - balls are not added
+                window.add_stationary_items([bubbles.Block([x0 - 100, y1 - 150], [x1 - x0 + 200, 300],
+                                                           parent=window)])
+                window.screen_balls_init(3)
+                self.assertEqual(len(window.mobile_objects), 20)
+                if useArrays:
+                    self.assertEqual(len(window.ballStore), 20)
+
+    def test_moved_blocks_do_not_trap_balls(self):
+        for useArrays in (False, True):
+            with self.subTest(useArrays=useArrays):
+                window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=3,
+                                        continuousCollision=True, useArrays=useArrays)
+                window.screen_balls_init(40)
+                block = bubbles.Block([0, 0], [10, 10], parent=window)
+                window.add_stationary_items([block])
+                for place in range(30):
+                    block.die()
+                    self.assertFalse(any(window.ball_touches(ball, block) for ball in window.mobile_objects))
+                # big blocks land on balls often, the balls are returned to the birth place
+                self.assertGreater(window.stats['ballsReset'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
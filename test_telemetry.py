@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# tests for background telemetry writer
+
+import os
+import tempfile
+import threading
+import unittest
+
+import bubbles
+import screen_backends as sb
+import telemetry as tm
+
+
+class test_telemetry_writer(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.directory = self.tempDir.name
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    def test_csv_files_are_rotated(self):
+        writer = tm.TelemetryWriter(directory=self.directory, maxFileSize=1000, queueSize=100)
+        for tick in range(20):
+            writer.submit(tick, [(1, 10, 20, 5, 5, 10, 10, 3, 90, 0), (2, 30, 40, 5, 5, 10, 10, 3, 270, 1)])
+        writer.close()
+        self.assertGreater(len(writer.fileNames), 1)
+        lines = []
+        for fileName in writer.fileNames:
+            with open(fileName) as logFile:
+                self.assertEqual(logFile.readline().strip(), ','.join(tm.FIELDS))
+                lines += logFile.read().split()
+        self.assertEqual(len(lines), 40)
+        self.assertEqual(lines[-1], '19,2,30,40,5,5,10,10,3,270,1')
+
+    @unittest.skipIf(tm.np is None, 'numpy is not installed')
+    def test_npy_chunks_are_read_back(self):
+        writer = tm.TelemetryWriter(directory=self.directory, fileFormat=tm.NPY)
+        for tick in range(3):
+            writer.submit(tick, tm.np.full((4, len(tm.FIELDS) - 1), tick + 0.5))
+        writer.close()
+        chunks = list(tm.read_npy_chunks(writer.fileNames[0]))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[2].shape, (4, len(tm.FIELDS)))
+        self.assertEqual(chunks[2][0, 0], 2)
+        self.assertEqual(chunks[2][3, 1], 2.5)
+
+    def test_full_queue_drops_batches(self):
+        writer = tm.TelemetryWriter(directory=self.directory, queueSize=1)
+        started, release = threading.Event(), threading.Event()
+        writeBatch = writer.write_batch
+
+        def slow_write_batch(tick, rows):
+            started.set()
+            release.wait()
+            writeBatch(tick, rows)
+
+        writer.write_batch = slow_write_batch
+        writer.submit(0, [])
+        started.wait()
+        self.assertTrue(writer.submit(1, []))
+        self.assertFalse(writer.submit(2, []))
+        release.set()
+        writer.close()
+        self.assertEqual((writer.submittedBatches, writer.droppedBatches), (2, 1))
+
+    def test_write_error_does_not_stop_simulation(self):
+        writer = tm.TelemetryWriter(directory=os.path.join(self.directory, 'missing'))
+        writer.submit(0, [(1, 10, 20, 5, 5, 10, 10, 3, 90, 0)])
+        writer.close()
+        self.assertIsInstance(writer.error, OSError)
+
+    def test_any_write_error_does_not_block_close(self):
+        writer = tm.TelemetryWriter(directory=self.directory, queueSize=2)
+        writer.submit(0, [(1, 10, 20, 5)])  # rows are shorter than FIELDS, formatting raises TypeError
+        for tick in range(1, 10):
+            writer.submit(tick, [(1, 10, 20, 5, 5, 10, 10, 3, 90, 0)])
+        closing = threading.Thread(target=writer.close, daemon=True)
+        closing.start()
+        closing.join(5)
+        self.assertFalse(closing.is_alive())
+        self.assertFalse(writer.thread.is_alive())
+        self.assertIsInstance(writer.error, TypeError)
+
+    def test_screen_streams_every_tick(self):
+        window = bubbles.Screen(x_size=800, y_size=600, backend=sb.HeadlessBackend(), seed=1)
+        window.screen_rnd_init(balls=10, blocks=2, wallWidth=4)
+        writer = tm.TelemetryWriter(directory=self.directory, queueSize=100)
+        window.start_telemetry(writer)
+        for tick in range(30):
+            window.step()
+        window.stop_telemetry()
+        self.assertIsNone(window.telemetry)
+        self.assertEqual(writer.writtenRows, 300)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -5,6 +5,10 @@
 import transform_decart_ang as tda
 import unittest
 
+VECTORS = [(x, y) for x in range(-120, 121, 3) for y in range(-120, 121, 2)] + \
+          [(1000, 1), (1, 1000), (-999, 7), (5, -1000), (2.5, 1.0), (0, 3.5), (6.2, 0)]
+DISTANCES = [0, 1, 3, 7, 13, 20, 155, 220, 1000]
+
 
 class test_callculations(unittest.TestCase):
     def test_length1(self):
@@ -120,5 +124,43 @@ class test_callculations(unittest.TestCase):
         self.assertEqual(result, 3)
 
 
+class test_fast_math(unittest.TestCase):
+    def test_ang_dec_fast(self):
+        for angle in range(-30, 750):
+            for distance in DISTANCES:
+                self.assertEqual(tda.angular_to_decart_fast(distance=distance, angle=angle),
+                                 tda.angular_to_decart(distance=distance, angle=angle), (distance, angle))
+
+    def test_angle_fast(self):
+        for x, y in VECTORS:
+            self.assertEqual(tda.vector_angle_fast(x=x, y=y), tda.vector_angle(x=x, y=y), (x, y))
+
+    def test_angle_fast_on_axes(self):
+        self.assertEqual(tda.vector_angle_fast(x=0, y=0), 0)
+        self.assertEqual(tda.vector_angle_fast(x=0, y=-5), 270)
+        self.assertEqual(tda.vector_angle_fast(x=-10, y=0), 180)
+
+
+@unittest.skipIf(tda.np is None, 'numpy is not installed')
+class test_batch_math(unittest.TestCase):
+    def test_ang_dec_batch(self):
+        angles = [angle for angle in range(-30, 750) for distance in DISTANCES]
+        distances = [distance for angle in range(-30, 750) for distance in DISTANCES]
+        x, y = tda.angular_to_decart_batch(distances, angles)
+        expected = [tda.angular_to_decart(distance=d, angle=a) for d, a in zip(distances, angles)]
+        self.assertEqual(list(zip(x.tolist(), y.tolist())), expected)
+
+    def test_angle_batch(self):
+        result = tda.vector_angle_batch([x for x, y in VECTORS], [y for x, y in VECTORS])
+        self.assertEqual(result.tolist(), [tda.vector_angle(x=x, y=y) for x, y in VECTORS])
+
+    def test_refl_ang_batch(self):
+        normals = [normal for normal in range(0, 720, 7) for angle in range(0, 360, 11)]
+        angles = [angle for normal in range(0, 720, 7) for angle in range(0, 360, 11)]
+        result = tda.reflectance_angle_batch(normals, angles)
+        self.assertEqual(result.tolist(), [tda.reflectance_angle(normalToSurface=n, angle=a)
+                                           for n, a in zip(normals, angles)])
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -4,8 +4,16 @@
 
 
 import math
+import struct
+from bisect import bisect_left
+
 import simple_draw as sd
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 def angular_to_decart(distance: int, angle: int):
     x = int(distance * sd.cos(angle))
@@ -68,3 +76,103 @@ def distance_point_line(point, linePoint1, linePoint2):
         linePoint2[0] * linePoint1[1] - linePoint2[1] * linePoint1[0])
     denominator = ((linePoint2[1] - linePoint1[1]) ** 2 + (linePoint2[0] - linePoint1[0]) ** 2) ** 0.5
     return numerator / denominator
+
+
+# fast math ---------------------------------------------------------------------------------------------
+# angles are integer degrees, so trigonometry is replaced by tables counted once with the same functions
+# and the results are exactly the same as the functions above give
+
+ANGLES_NUM = 360
+COS_TABLE = [sd.cos(angle) for angle in range(ANGLES_NUM)]
+SIN_TABLE = [sd.sin(angle) for angle in range(ANGLES_NUM)]
+
+
+def _float_to_order(value: float) -> int:
+    """ integer with the same order as floats have, neighbour floats get neighbour integers """
+    bits = struct.unpack('<q', struct.pack('<d', value))[0]
+    return bits if bits >= 0 else -(bits & 0x7FFFFFFFFFFFFFFF)
+
+
+def _order_to_float(order: int) -> float:
+    bits = order if order >= 0 else (-order) | -0x8000000000000000
+    return struct.unpack('<d', struct.pack('<q', bits))[0]
+
+
+def _acos_degrees(cosine: float) -> int:
+    return int(math.degrees(math.acos(cosine)))
+
+
+def _acos_thresholds():
+    """ for every angle 1..180 finds the biggest cosine which acos in integer degrees is not less than the angle
+    :return: thresholds in ascending order
+    """
+    thresholds = []
+    for angle in range(1, 181):
+        low, high = _float_to_order(-1.0), _float_to_order(1.0)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if _acos_degrees(_order_to_float(middle)) >= angle:
+                low = middle
+            else:
+                high = middle - 1
+        thresholds.append(_order_to_float(low))
+    thresholds.reverse()
+    return thresholds
+
+
+ACOS_THRESHOLDS = _acos_thresholds()
+ACOS_ANGLES_NUM = len(ACOS_THRESHOLDS)
+
+
+def angular_to_decart_fast(distance: int, angle: int):
+    """ the same as angular_to_decart, but sin and cos are taken from tables """
+    if type(angle) is int and 0 <= angle < ANGLES_NUM:
+        return int(distance * COS_TABLE[angle]), int(distance * SIN_TABLE[angle])
+    return angular_to_decart(distance=distance, angle=angle)
+
+
+def vector_angle_fast(x: int, y: int):
+    """ the same as vector_angle, but acos in integer degrees is found in thresholds table """
+    if x == 0 and y == 0:
+        return 0
+    angle = ACOS_ANGLES_NUM - bisect_left(ACOS_THRESHOLDS, float(x) / (x * x + y * y) ** 0.5)
+    if y < 0:
+        return 360 - angle
+    return angle
+
+
+# batch versions: numpy arrays in, numpy arrays out, element results are the same as single value functions
+
+def angular_to_decart_batch(distance, angle):
+    distance = np.asarray(distance)
+    angle = np.asarray(angle, dtype=np.int64)
+    inTable = (angle >= 0) & (angle < ANGLES_NUM)
+    tableAngle = np.where(inTable, angle, 0)
+    x = (distance * COS_ARRAY[tableAngle]).astype(np.int64)
+    y = (distance * SIN_ARRAY[tableAngle]).astype(np.int64)
+    for k in np.flatnonzero(~inTable):
+        x[k], y[k] = angular_to_decart(distance=distance[k], angle=int(angle[k]))
+    return x, y
+
+
+def vector_angle_batch(x, y):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # power, not sqrt - to round the length exactly like ** 0.5 in vector_length does
+    length = np.power(x * x + y * y, 0.5)
+    isZero = length == 0
+    cosine = x / np.where(isZero, 1.0, length)
+    angle = ACOS_ANGLES_NUM - np.searchsorted(ACOS_THRESHOLDS_ARRAY, cosine, side='left')
+    angle = np.where(y < 0, 360 - angle, angle)
+    return np.where(isZero, 0, angle)
+
+
+def reflectance_angle_batch(normalToSurface, angle):
+    reflection = 2 * np.asarray(normalToSurface) - np.asarray(angle)
+    return np.where(reflection < 0, reflection + 360, np.where(reflection > 359, reflection - 360, reflection))
+
+
+if np is not None:
+    COS_ARRAY = np.array(COS_TABLE)
+    SIN_ARRAY = np.array(SIN_TABLE)
+    ACOS_THRESHOLDS_ARRAY = np.array(ACOS_THRESHOLDS)